@@ -1,16 +1,124 @@
-from transformers import AutoTokenizer, AutoModelForSequenceClassification, pipeline
-from typing import List
+from abc import ABC, abstractmethod
+from typing import List, Union
+from analyzing.aspect_index import AspectIndex
+from analyzing.backends import load_model, share_weights
+from analyzing.batching import length_bucketed_batches
+from analyzing.windowing import combine_window_scores, token_windows
+from utils.metrics import observe_batch, timed
 
 
-class AspectBasedSentimentAnalyzer:
+class AspectPairScorer(ABC):
+    """
+    An abstract base class for anything that scores (text, aspect) pairs.
 
-    def __init__(self, *args, **kwargs):
-        model_name = "yangheng/deberta-v3-base-absa-v1.1"
+    Subclasses only implement `score_pairs`; matching aspects against texts is shared.
+    """
+
+    def analyze_sentiments(
+        self,
+        prompts: List[str],
+        aspects: Union[List[str], AspectIndex],
+        batch_size: int = 32,
+        *args,
+        **kwargs
+    ) -> List[tuple[int, str, dict[str, float]]]:
+        """
+        Analyze the sentiment of many prompts for specific aspects using batched inference.
+
+        Every (prompt, aspect) pair in which the aspect is mentioned is collected up
+        front with an `AspectIndex` and scored with `score_pairs`.
+
+        Args:
+            prompts (List[str]): The texts to analyze.
+            aspects (Union[List[str], AspectIndex]): List of aspects to analyze in the texts,
+                or a prebuilt index of them.
+            batch_size (int): Number of pairs per forward pass. Defaults to 32.
+            *args: Additional arguments for the pipeline.
+            **kwargs: Additional keyword arguments for the pipeline.
+
+        Returns:
+            List[tuple[int, str, dict[str, float]]]: A list of tuples, ordered by prompt, where each tuple contains:
+                - index (int): Position of the prompt in `prompts`.
+                - aspect (str): The aspect being analyzed.
+                - sentiment (dict[str, float]): A dictionary with the sentiment label and score.
+        """
+        if not isinstance(aspects, AspectIndex):
+            aspects = AspectIndex(aspects)
+        with timed("aspect.match", len(prompts)):
+            matches = aspects.pairs(prompts)
+
+        sentiments = self.score_pairs(
+            [(prompts[index], aspect) for index, aspect in matches],
+            batch_size,
+            *args,
+            **kwargs,
+        )
+        return [
+            (index, aspect, sentiment)
+            for (index, aspect), sentiment in zip(matches, sentiments)
+        ]
+
+    @abstractmethod
+    def score_pairs(
+        self, pairs: List[tuple[str, str]], batch_size: int = 32, *args, **kwargs
+    ) -> List[dict[str, float]]:
+        """
+        Score (text, aspect) pairs.
+
+        Args:
+            pairs (List[tuple[str, str]]): The (text, aspect) pairs to score.
+            batch_size (int): Number of pairs per forward pass. Defaults to 32.
+            *args: Additional arguments for the pipeline.
+            **kwargs: Additional keyword arguments for the pipeline.
+
+        Returns:
+            List[dict[str, float]]: One dictionary per pair with the sentiment label and score.
+        """
+        pass
+
+
+class AspectBasedSentimentAnalyzer(AspectPairScorer):
+
+    def __init__(
+        self,
+        model_name: str = "yangheng/deberta-v3-base-absa-v1.1",
+        backend: str = "torch",
+        window_overlap: int = 64,
+        *args,
+        **kwargs
+    ):
+        from transformers import AutoTokenizer, pipeline
+
+        self.model_name = model_name
+        self.backend = backend
         tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=False)
-        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        model = load_model(model_name, "sequence-classification", backend)
         self._pipeline = pipeline(
             "text-classification", model=model, tokenizer=tokenizer, *args, **kwargs
         )
+        self._window_tokens = min(
+            tokenizer.model_max_length, 512
+        ) - tokenizer.num_special_tokens_to_add(pair=True)
+        self._window_overlap = window_overlap
+        self._aspect_tokens: dict[str, int] = {}
+        self._aspect_indexes: dict[str, AspectIndex] = {}
+
+    def warm_up(self, share: bool = False) -> None:
+        """
+        Run a short and a full-length pair through the model, so that the first real
+        request does not pay for lazy initialization and buffer allocation.
+
+        Args:
+            share (bool): Move the weights into shared memory first, for processes forked afterwards. Defaults to False.
+        """
+        if share:
+            share_weights(self._pipeline.model)
+        self.score_pairs(
+            [
+                ("The battery is great.", "battery"),
+                ("The battery is great. " * 500, "battery"),
+            ]
+        )
 
     def analyze_sentiment(
         self, prompt: str, aspects: List[str], *args, **kwargs
@@ -28,10 +136,84 @@ class AspectBasedSentimentAnalyzer:
                 - sentiment (dict[str, float]): A dictionary with sentiment labels as keys and their scores as values.
         """
         result = []
-        for aspect in aspects:
-            if aspect.casefold() not in prompt.casefold():
-                continue
+        for aspect in AspectIndex(aspects).find(prompt):
             result.append(
                 (aspect, *self._pipeline(prompt, text_pair=aspect, *args, **kwargs))
             )
         return result
+
+    def score_pairs(
+        self, pairs: List[tuple[str, str]], batch_size: int = 32, *args, **kwargs
+    ) -> List[dict[str, float]]:
+        """
+        Score (text, aspect) pairs in batched `text_pair` calls.
+
+        Pairs are bucketed by character length rather than token length, which avoids
+        running the slow DeBERTa tokenizer twice over every review.
+
+        Texts that may not fit the model's context next to their aspect are tokenized
+        and split into overlapping windows, of which only those mentioning the aspect
+        are scored (all of them if the aspect is only mentioned through a synonym).
+        Windows of all pairs share batches, and their scores are combined as in
+        `SentimentAnalyzer.analyze_sentiments`.
+        See base class for full documentation.
+        """
+        windows = []
+        with timed("aspect.window", len(pairs)):
+            for position, (text, aspect) in enumerate(pairs):
+                windows.extend(
+                    (position, window, aspect, weight)
+                    for window, weight in self._windows(text, aspect)
+                )
+        lengths = [len(window) + len(aspect) for _, window, aspect, _ in windows]
+
+        scores = [None] * len(windows)
+        for indices in length_bucketed_batches(lengths, batch_size):
+            batch = [
+                {"text": windows[index][1], "text_pair": windows[index][2]}
+                for index in indices
+            ]
+            with timed("aspect.forward", len(batch)):
+                outputs = self._pipeline(
+                    batch,
+                    batch_size=batch_size,
+                    top_k=None,
+                    truncation=True,
+                    *args,
+                    **kwargs,
+                )
+            observe_batch("aspect", len(batch))
+            for index, output in zip(indices, outputs):
+                scores[index] = output
+
+        pair_windows = [[] for _ in pairs]
+        for (position, _, _, weight), score in zip(windows, scores):
+            pair_windows[position].append((score, weight))
+        return [
+            combine_window_scores(
+                [score for score, _ in window_scores],
+                [weight for _, weight in window_scores],
+            )
+            for window_scores in pair_windows
+        ]
+
+    def _windows(self, text: str, aspect: str) -> List[tuple[str, int]]:
+        tokenizer = self._pipeline.tokenizer
+        if aspect not in self._aspect_tokens:
+            self._aspect_tokens[aspect] = len(
+                tokenizer(aspect, add_special_tokens=False)["input_ids"]
+            )
+            self._aspect_indexes[aspect] = AspectIndex([aspect])
+        limit = max(self._window_tokens - self._aspect_tokens[aspect], 16)
+
+        # A token spans at least one character, plus at most a word-boundary marker,
+        # so texts this short always fit and need not be tokenized.
+        if 2 * len(text) <= limit:
+            return [(text, 1)]
+        windows = token_windows(tokenizer, text, limit, self._window_overlap)
+        if len(windows) == 1:
+            return windows
+        mentioning = [
+            window for window in windows if self._aspect_indexes[aspect].find(window[0])
+        ]
+        return mentioning or windows
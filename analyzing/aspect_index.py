@@ -0,0 +1,101 @@
+import re
+from typing import Dict, Iterable, List, Optional
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def _lemmatize(word: str) -> str:
+    """
+    Reduce a casefolded word to a crude singular form ("batteries" -> "battery").
+    """
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith(("ses", "xes", "zes", "ches", "shes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+class AspectIndex:
+    """
+    A prebuilt index that finds every aspect mentioned in a text in a single pass.
+
+    Aspects and their synonyms are split into words and stored in a word-level trie,
+    so a text is tokenized once and every term, including overlapping multi-word
+    terms, is matched on word boundaries ("button" does not match "buttonhole").
+    """
+
+    def __init__(
+        self,
+        aspects: Iterable[str],
+        synonyms: Optional[Dict[str, List[str]]] = None,
+        lemmatize: bool = True,
+    ):
+        """
+        Args:
+            aspects (Iterable[str]): The aspects to look for.
+            synonyms (Optional[Dict[str, List[str]]]): Alternative terms for each aspect,
+                e.g. {"battery": ["charge"]}. A match on a synonym is reported as its aspect.
+            lemmatize (bool): Whether to match singular and plural word forms alike. Defaults to True.
+        """
+        self.aspects = list(dict.fromkeys(aspects))
+        self._lemmatize = lemmatize
+        self._order = {aspect: position for position, aspect in enumerate(self.aspects)}
+        self._trie: dict = {}
+
+        synonyms = synonyms or {}
+        for aspect in self.aspects:
+            for term in [aspect, *synonyms.get(aspect, [])]:
+                words = self._words(term)
+                if not words:
+                    continue
+                node = self._trie
+                for word in words:
+                    node = node.setdefault(word, {})
+                node.setdefault(None, set()).add(aspect)
+
+    def _words(self, text: str) -> List[str]:
+        words = _WORD_PATTERN.findall(text.casefold())
+        if self._lemmatize:
+            words = [_lemmatize(word) for word in words]
+        return words
+
+    def find(self, text: str) -> List[str]:
+        """
+        Find the aspects mentioned in a text.
+
+        Args:
+            text (str): The text to search.
+
+        Returns:
+            List[str]: The aspects mentioned in the text, in the order they were given.
+        """
+        words = self._words(text)
+        found = set()
+        for start in range(len(words)):
+            node = self._trie
+            for word in words[start:]:
+                node = node.get(word)
+                if node is None:
+                    break
+                found.update(node.get(None, ()))
+            if len(found) == len(self.aspects):
+                break
+        return sorted(found, key=self._order.__getitem__)
+
+    def pairs(self, texts: Iterable[str]) -> List[tuple[int, str]]:
+        """
+        List the (text, aspect) pairs that need to be scored.
+
+        Args:
+            texts (Iterable[str]): The texts to search.
+
+        Returns:
+            List[tuple[int, str]]: Pairs of text index and mentioned aspect, ordered by text.
+        """
+        return [
+            (index, aspect)
+            for index, text in enumerate(texts)
+            for aspect in self.find(text)
+        ]
@@ -0,0 +1,154 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Callable
+
+BACKENDS = ("torch", "quantized", "onnx")
+DEFAULT_MODEL_CACHE = Path.home() / ".cache" / "review-analyzer" / "models"
+
+_TASKS = {
+    "sequence-classification": (
+        "AutoModelForSequenceClassification",
+        "ORTModelForSequenceClassification",
+    ),
+    "seq2seq": ("AutoModelForSeq2SeqLM", "ORTModelForSeq2SeqLM"),
+}
+
+
+def model_cache_dir() -> Path:
+    """
+    Returns:
+        Path: Directory where exported and quantized models are cached, MODEL_CACHE_PATH if set.
+    """
+    return Path(os.getenv("MODEL_CACHE_PATH", str(DEFAULT_MODEL_CACHE)))
+
+
+def load_model(model_name: str, task: str, backend: str = "torch") -> Any:
+    """
+    Load a model for the given inference backend.
+
+    - "torch": the eager full-precision PyTorch model.
+    - "quantized": the PyTorch model with int8 dynamically quantized linear layers.
+    - "onnx": the model exported to an ONNX Runtime graph (requires `optimum[onnxruntime]`).
+
+    Quantized and exported models are cached on local disk, per version of torch,
+    transformers and optimum, so the conversion only happens the first time.
+
+    Args:
+        model_name (str): Name of the model on the Hugging Face Hub.
+        task (str): "sequence-classification" or "seq2seq".
+        backend (str): One of `BACKENDS`. Defaults to "torch".
+
+    Returns:
+        Any: A model that can be passed to a `transformers` pipeline.
+
+    Raises:
+        ValueError: If the task or backend is unknown.
+        ImportError: If the ONNX backend is requested without `optimum[onnxruntime]` installed.
+    """
+    if task not in _TASKS:
+        raise ValueError(f"Unknown task '{task}'.")
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Unknown backend '{backend}'. Choose one of: {', '.join(BACKENDS)}."
+        )
+    torch_class, onnx_class = _TASKS[task]
+    cache_dir = _versioned_cache_dir(backend, model_name)
+
+    if backend == "onnx":
+        try:
+            import optimum.onnxruntime as onnxruntime
+        except ImportError as e:
+            raise ImportError(
+                "The ONNX backend requires `pip install optimum[onnxruntime]`."
+            ) from e
+        model_class = getattr(onnxruntime, onnx_class)
+        if cache_dir.exists():
+            return model_class.from_pretrained(cache_dir)
+        model = model_class.from_pretrained(model_name, export=True)
+        _publish(cache_dir, model.save_pretrained)
+        return model
+
+    import torch
+    import transformers
+
+    model_class = getattr(transformers, torch_class)
+    if backend == "torch":
+        return model_class.from_pretrained(model_name)
+
+    path = cache_dir / "state_dict.pt"
+    if path.exists():
+        # Only the weights are cached, never a pickled module: rebuild the quantized
+        # architecture from the config and load them into it.
+        config = transformers.AutoConfig.from_pretrained(model_name)
+        model = _quantize(torch, model_class.from_config(config).eval())
+        model.load_state_dict(torch.load(path, weights_only=True))
+        return model
+
+    model = _quantize(torch, model_class.from_pretrained(model_name))
+    state_dict = model.state_dict()
+    _publish(
+        cache_dir,
+        lambda directory: torch.save(state_dict, Path(directory) / path.name),
+    )
+    return model
+
+
+def _quantize(torch: Any, model: Any) -> Any:
+    return torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+def _publish(cache_dir: Path, write: Callable[[str], None]) -> None:
+    # Written to a temporary directory next to the cache and renamed into place, so
+    # that an interrupted write, or another process converting the same model at the
+    # same time (e.g. `--workers`), never leaves a partial cache that later loads fail on.
+    cache_dir.parent.mkdir(parents=True, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=cache_dir.parent, prefix=f".{cache_dir.name}-")
+    try:
+        write(staging)
+        os.replace(staging, cache_dir)
+    except OSError:
+        # Another process published the same model first.
+        if not cache_dir.exists():
+            raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def _versioned_cache_dir(backend: str, model_name: str) -> Path:
+    # Converted models are tied to the library versions that produced them, so an
+    # upgrade converts again instead of loading an incompatible cache.
+    from importlib.metadata import PackageNotFoundError, version
+
+    versions = []
+    for package in ("torch", "transformers", "optimum"):
+        try:
+            versions.append(f"{package}-{version(package)}")
+        except PackageNotFoundError:
+            continue
+    return (
+        model_cache_dir() / backend / "_".join(versions) / model_name.replace("/", "--")
+    )
+
+
+def share_weights(model: Any) -> None:
+    """
+    Move a PyTorch model's weights into shared memory, so that processes forked
+    afterwards all map the same pages instead of each ending up with a private copy.
+
+    ONNX Runtime models, and quantized weights that cannot be moved, are left alone;
+    forked processes still share them copy-on-write.
+
+    Args:
+        model (Any): A model as returned by `load_model`.
+    """
+    share_memory = getattr(model, "share_memory", None)
+    if share_memory is None:
+        return
+    try:
+        share_memory()
+    except RuntimeError:
+        pass
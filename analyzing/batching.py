@@ -0,0 +1,27 @@
+from typing import Iterator, List, Sequence
+from utils.deadline import check_deadline
+
+
+def length_bucketed_batches(
+    lengths: Sequence[int], batch_size: int
+) -> Iterator[List[int]]:
+    """
+    Group item indices into batches of similar length.
+
+    Sorting by length before batching keeps the padding inside every batch
+    small, so each forward pass does little wasted work. The current deadline (see
+    `utils.deadline`) is checked before every batch, so abandoned work stops early.
+
+    Args:
+        lengths (Sequence[int]): Length (e.g. token count) of each item.
+        batch_size (int): Maximum number of items per batch.
+
+    Yields:
+        List[int]: Indices of the items in the next batch, shortest first.
+    """
+    if batch_size < 1:
+        raise ValueError("`batch_size` must be a positive integer.")
+    order = sorted(range(len(lengths)), key=lambda index: lengths[index])
+    for start in range(0, len(order), batch_size):
+        check_deadline()
+        yield order[start : start + batch_size]
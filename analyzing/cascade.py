@@ -0,0 +1,64 @@
+from typing import Any, List, Optional
+from analyzing.lexicon import LexiconSentimentClassifier
+from utils.metrics import count_items, timed
+
+FAST_TIER = "lexicon"
+MODEL_TIER = "transformer"
+
+
+class CascadeSentimentAnalyzer:
+    """
+    Wraps a sentiment analyzer with a cheap first stage.
+
+    Every prompt is first labeled by a `LexiconSentimentClassifier`. Prompts it labels
+    with at least `threshold` confidence keep that label; only the rest go through the
+    wrapped analyzer, in batches. Every result records the "tier" that labeled it.
+    """
+
+    def __init__(
+        self,
+        analyzer,
+        threshold: float = 0.9,
+        fast: Optional[LexiconSentimentClassifier] = None,
+    ):
+        """
+        Args:
+            analyzer: The analyzer for the prompts the first stage is not confident about.
+            threshold (float): Minimum first-stage confidence, between 0.5 and 1, to skip the analyzer. Defaults to 0.9.
+            fast (Optional[LexiconSentimentClassifier]): The first stage. Defaults to a classifier with the built-in lexicon.
+        """
+        self._analyzer = analyzer
+        self._threshold = threshold
+        self._fast = fast if fast is not None else LexiconSentimentClassifier()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._analyzer, name)
+
+    def analyze_sentiments(
+        self, prompts: List[str], batch_size: int = 32, *args, **kwargs
+    ) -> List[dict]:
+        """
+        See `SentimentAnalyzer.analyze_sentiments`.
+
+        Returns:
+            List[dict]: One dictionary per prompt containing the sentiment label and
+                score, and the "tier" that labeled it, `FAST_TIER` or `MODEL_TIER`.
+        """
+        with timed("cascade.fast", len(prompts)):
+            results = self._fast.classify(prompts)
+
+        hard = []
+        for position, result in enumerate(results):
+            if result["score"] >= self._threshold:
+                result["tier"] = FAST_TIER
+            else:
+                hard.append(position)
+        count_items("cascade.transformer", len(hard))
+
+        if hard:
+            sentiments = self._analyzer.analyze_sentiments(
+                [prompts[position] for position in hard], batch_size, *args, **kwargs
+            )
+            for position, sentiment in zip(hard, sentiments):
+                results[position] = {**sentiment, "tier": MODEL_TIER}
+        return results
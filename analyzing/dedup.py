@@ -0,0 +1,203 @@
+import os
+import re
+import threading
+import zlib
+from typing import TYPE_CHECKING, Dict, List, Optional
+from utils.metrics import count_items, timed
+from utils.utils import normalize_text
+
+if TYPE_CHECKING:
+    import numpy as np
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_WORD = re.compile(r"\w+")
+
+
+class ReviewDeduplicator:
+    """
+    Groups identical and nearly identical reviews so that only one review per group has
+    to go through a model.
+
+    Exact duplicates are found by hashing the normalized text. Near duplicates are found
+    with MinHash signatures over word shingles and locality-sensitive hashing (LSH) on
+    bands of the signature. A review only joins a group if its shingle Jaccard similarity
+    with the group's representative reaches `threshold`, so LSH false positives are
+    rejected and groups do not chain into loosely related reviews.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 3,
+        seed: int = 1,
+    ):
+        """
+        Args:
+            threshold (float): Minimum Jaccard similarity of near duplicates. Only exact duplicates are grouped if 1 or more. Defaults to 0.9.
+            num_perm (int): Number of MinHash permutations. Defaults to 64.
+            bands (int): Number of LSH bands, must divide `num_perm`. Defaults to 16.
+            shingle_size (int): Number of words per shingle. Defaults to 3.
+            seed (int): Seed of the MinHash permutations. Defaults to 1.
+        """
+        import numpy as np
+
+        if num_perm % bands:
+            raise ValueError("`bands` must divide `num_perm`.")
+        self._threshold = threshold
+        self._bands = bands
+        self._rows = num_perm // bands
+        self._shingle_size = shingle_size
+        generator = np.random.default_rng(seed)
+        self._a = generator.integers(1, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self._b = generator.integers(0, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self._lock = threading.Lock()
+        self._reviews = 0
+        self._collapsed = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["ReviewDeduplicator"]:
+        """
+        Build a deduplicator from the DEDUP_* environment variables.
+
+        DEDUP_DISABLED turns deduplication off and DEDUP_THRESHOLD sets the minimum
+        similarity of near duplicates (1 to only collapse exact duplicates).
+
+        Returns:
+            Optional[ReviewDeduplicator]: The deduplicator, or None if deduplication is disabled.
+        """
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        if os.getenv("DEDUP_DISABLED", "").lower() in ("1", "true", "yes"):
+            return None
+        return cls(threshold=float(os.getenv("DEDUP_THRESHOLD", 0.9)))
+
+    def representatives(self, texts: List[str]) -> List[int]:
+        """
+        Assign every text to a group of duplicates.
+
+        Args:
+            texts (List[str]): The texts to group.
+
+        Returns:
+            List[int]: For every text, the position in `texts` of its group's representative,
+                which is the first text of the group. Representatives map to themselves.
+        """
+        with timed("dedup", len(texts)):
+            representatives = self._group(texts)
+        collapsed = sum(
+            position != representative
+            for position, representative in enumerate(representatives)
+        )
+        count_items("dedup.collapsed", collapsed)
+        with self._lock:
+            self._reviews += len(texts)
+            self._collapsed += collapsed
+        return representatives
+
+    def _group(self, texts: List[str]) -> List[int]:
+        exact: Dict[str, int] = {}
+        representatives = []
+        for position, text in enumerate(texts):
+            representatives.append(exact.setdefault(normalize_text(text), position))
+        if self._threshold >= 1:
+            return representatives
+
+        unique = list(exact.values())
+        shingles = [self._shingles(texts[position]) for position in unique]
+        signatures = self._signatures(shingles)
+
+        # Bands are keyed by their raw bytes, with the band number as the first byte.
+        band_keys = [
+            [
+                bytes([band])
+                + row[band * self._rows : (band + 1) * self._rows].tobytes()
+                for band in range(self._bands)
+            ]
+            for row in signatures
+        ]
+        buckets: Dict[bytes, List[int]] = {}
+        near: Dict[int, int] = {}
+        for number, position in enumerate(unique):
+            candidates = list(
+                dict.fromkeys(
+                    candidate
+                    for key in band_keys[number]
+                    for candidate in buckets.get(key, [])
+                )
+            )
+            match = None
+            if candidates:
+                # The share of equal MinHash values estimates the Jaccard similarity;
+                # only check the exact similarity of plausible candidates, best first.
+                estimates = (signatures[candidates] == signatures[number]).mean(axis=1)
+                for candidate_number in estimates.argsort()[::-1]:
+                    if estimates[candidate_number] < self._threshold - 0.2:
+                        break
+                    candidate = candidates[candidate_number]
+                    if (
+                        _jaccard(shingles[number], shingles[candidate])
+                        >= self._threshold
+                    ):
+                        match = candidate
+                        break
+            if match is not None:
+                near[position] = unique[match]
+                continue
+            for key in band_keys[number]:
+                buckets.setdefault(key, []).append(number)
+
+        return [
+            near.get(representative, representative)
+            for representative in representatives
+        ]
+
+    def _shingles(self, text: str) -> frozenset:
+        words = _WORD.findall(text.casefold())
+        if len(words) <= self._shingle_size:
+            return frozenset([" ".join(words)])
+        return frozenset(
+            " ".join(words[start : start + self._shingle_size])
+            for start in range(len(words) - self._shingle_size + 1)
+        )
+
+    def _signatures(self, shingles: List[frozenset], block: int = 4096) -> "np.ndarray":
+        import numpy as np
+
+        signatures = np.empty((len(shingles), len(self._a)), dtype=np.uint64)
+        for start in range(0, len(shingles), block):
+            sets = shingles[start : start + block]
+            hashes = np.fromiter(
+                (
+                    zlib.crc32(shingle.encode("utf-8"))
+                    for text_shingles in sets
+                    for shingle in text_shingles
+                ),
+                dtype=np.uint64,
+            )
+            offsets = np.cumsum(
+                [0] + [len(text_shingles) for text_shingles in sets[:-1]]
+            )
+            # With 31-bit a and b and 32-bit h, a * h + b fits in 64 bits.
+            permuted = (
+                self._a[:, None] * hashes[None, :] + self._b[:, None]
+            ) % _MERSENNE_PRIME
+            signatures[start : start + len(sets)] = np.minimum.reduceat(
+                permuted, offsets, axis=1
+            ).T
+        return signatures
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: Number of "reviews" grouped and of reviews "collapsed" into
+                another one since the deduplicator was created.
+        """
+        with self._lock:
+            return {"reviews": self._reviews, "collapsed": self._collapsed}
+
+
+def _jaccard(first: frozenset, second: frozenset) -> float:
+    return len(first & second) / len(first | second)
@@ -0,0 +1,202 @@
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Callable, Dict, List
+from utils.utils import normalize_text
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD = re.compile(r"\w+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be been but by for from had has have i if in is it its me my "
+    "of on or our so that the their them they this to too was we were what when which "
+    "with you your".split()
+)
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Args:
+        text (str): The text to split.
+
+    Returns:
+        List[str]: The text's non-empty sentences, split after ".", "!" and "?" and at line breaks.
+    """
+    return [
+        sentence.strip() for sentence in _SENTENCE_END.split(text) if sentence.strip()
+    ]
+
+
+def _tf_idf(sentences: List[str]) -> List[Dict[str, float]]:
+    terms = [
+        Counter(
+            word for word in _WORD.findall(sentence.casefold()) if word not in STOPWORDS
+        )
+        for sentence in sentences
+    ]
+    frequency = Counter(term for sentence_terms in terms for term in sentence_terms)
+    idf = {
+        term: math.log((1 + len(sentences)) / (1 + count)) + 1
+        for term, count in frequency.items()
+    }
+    vectors = []
+    for sentence_terms in terms:
+        vector = {
+            term: (1 + math.log(count)) * idf[term]
+            for term, count in sentence_terms.items()
+        }
+        norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+        vectors.append({term: weight / norm for term, weight in vector.items()})
+    return vectors
+
+
+def select_sentences(
+    texts: List[str],
+    budget: int,
+    count_tokens: Callable[[List[str]], List[int]],
+    diversity: float = 0.3,
+    min_words: int = 3,
+) -> List[str]:
+    """
+    Pick a representative, non-redundant subset of the sentences of many texts that
+    fits in a token budget.
+
+    Sentences are ranked by the cosine similarity of their TF-IDF vector to the centroid
+    of all sentences, so sentences about what many reviews say rank first. They are then
+    picked greedily by maximal marginal relevance (MMR): centrality minus `diversity`
+    times the similarity to the most similar sentence picked so far, skipping sentences
+    that no longer fit in the budget. Exact duplicate sentences are only considered once.
+
+    Args:
+        texts (List[str]): The texts, e.g. reviews.
+        budget (int): Maximum number of tokens of the picked sentences, counting one separator token per sentence.
+        count_tokens (Callable[[List[str]], List[int]]): Counts the tokens of each of several texts.
+        diversity (float): Weight of redundancy against centrality, between 0 and 1. Defaults to 0.3.
+        min_words (int): Sentences with fewer words are not picked. Defaults to 3.
+
+    Returns:
+        List[str]: The picked sentences in the order of `texts`, or `texts` itself if it
+            fits in the budget already. If no sentence with `min_words` words fits,
+            shorter sentences are picked too, and if no sentence fits at all, the most
+            central one is cut to the budget, so the result is never empty.
+    """
+    sentences = []
+    seen = set()
+    for text in texts:
+        for sentence in split_sentences(text):
+            key = normalize_text(sentence).casefold()
+            if key not in seen:
+                seen.add(key)
+                sentences.append(sentence)
+    if not sentences:
+        return texts
+    tokens = count_tokens(sentences)
+    if sum(tokens) + len(tokens) <= budget:
+        return texts
+
+    vectors = _tf_idf(sentences)
+    centroid: Dict[str, float] = Counter()
+    for vector in vectors:
+        centroid.update(vector)
+    norm = math.sqrt(sum(weight * weight for weight in centroid.values())) or 1.0
+    centrality = [
+        sum(weight * centroid[term] for term, weight in vector.items()) / norm
+        for vector in vectors
+    ]
+
+    postings: Dict[str, List[tuple[int, float]]] = {}
+    for position, vector in enumerate(vectors):
+        for term, weight in vector.items():
+            postings.setdefault(term, []).append((position, weight))
+
+    picked = _pick(
+        [
+            position
+            for position, sentence in enumerate(sentences)
+            if len(_WORD.findall(sentence)) >= min_words
+        ],
+        centrality,
+        vectors,
+        postings,
+        tokens,
+        budget,
+        diversity,
+    )
+    if not picked:
+        # Every long enough sentence is over the budget, or there are none, e.g. many
+        # "Love it!" reviews: allow short sentences too.
+        picked = _pick(
+            list(range(len(sentences))),
+            centrality,
+            vectors,
+            postings,
+            tokens,
+            budget,
+            diversity,
+        )
+    if not picked:
+        # Even the shortest sentence is over the budget: keep the most central one,
+        # cut to the budget.
+        best = max(range(len(sentences)), key=centrality.__getitem__)
+        return [_truncate(sentences[best], budget - 1, count_tokens)]
+    return [sentences[position] for position in sorted(picked)]
+
+
+def _pick(
+    candidates: List[int],
+    centrality: List[float],
+    vectors: List[Dict[str, float]],
+    postings: Dict[str, List[tuple[int, float]]],
+    tokens: List[int],
+    budget: int,
+    diversity: float,
+) -> List[int]:
+    # Lazy greedy MMR: a sentence's score only drops as more sentences are picked, so
+    # a stale score at the top of the heap is recomputed and pushed back, and a fresh
+    # one is the best remaining sentence.
+    redundancy = [0.0] * len(vectors)
+    heap = [
+        (-(1 - diversity) * centrality[position], position, 0.0)
+        for position in candidates
+    ]
+    heapq.heapify(heap)
+    smallest = min((tokens[position] for position in candidates), default=0) + 1
+    remaining = budget
+    picked = []
+    while heap and remaining >= smallest:
+        _, position, known = heapq.heappop(heap)
+        if redundancy[position] != known:
+            score = (1 - diversity) * centrality[position] - (
+                diversity * redundancy[position]
+            )
+            heapq.heappush(heap, (-score, position, redundancy[position]))
+            continue
+        if tokens[position] + 1 > remaining:
+            continue
+        picked.append(position)
+        remaining -= tokens[position] + 1
+
+        similarities: Dict[int, float] = Counter()
+        for term, weight in vectors[position].items():
+            for other, other_weight in postings[term]:
+                similarities[other] += weight * other_weight
+        for other, similarity in similarities.items():
+            if similarity > redundancy[other]:
+                redundancy[other] = similarity
+    return picked
+
+
+def _truncate(
+    sentence: str, budget: int, count_tokens: Callable[[List[str]], List[int]]
+) -> str:
+    # The longest prefix of whole words that fits in the budget, by binary search.
+    words = sentence.split()
+    low, high = 0, len(words)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens([" ".join(words[:middle])])[0] <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    return " ".join(words[: max(1, low)])
@@ -0,0 +1,222 @@
+import math
+import re
+from typing import Dict, List, Optional
+
+# Polarity of common review words. Strong words weigh 2, ambiguous ones less than 1.
+LEXICON: Dict[str, float] = {
+    **dict.fromkeys(
+        [
+            "amazing",
+            "awesome",
+            "best",
+            "brilliant",
+            "excellent",
+            "exceptional",
+            "fantastic",
+            "flawless",
+            "incredible",
+            "love",
+            "loved",
+            "loves",
+            "outstanding",
+            "perfect",
+            "perfectly",
+            "phenomenal",
+            "superb",
+            "wonderful",
+        ],
+        2.0,
+    ),
+    **dict.fromkeys(["great", "delighted", "impressed", "recommend"], 1.5),
+    **dict.fromkeys(
+        [
+            "affordable",
+            "beautiful",
+            "comfortable",
+            "convenient",
+            "cute",
+            "durable",
+            "easy",
+            "enjoy",
+            "enjoyed",
+            "favorite",
+            "glad",
+            "good",
+            "happy",
+            "helpful",
+            "nice",
+            "pleased",
+            "recommended",
+            "reliable",
+            "satisfied",
+            "smooth",
+            "solid",
+            "sturdy",
+            "worth",
+        ],
+        1.0,
+    ),
+    **dict.fromkeys(["fast", "fine", "quick", "soft", "well", "works"], 0.5),
+    **dict.fromkeys(
+        [
+            "awful",
+            "garbage",
+            "hate",
+            "hated",
+            "horrible",
+            "junk",
+            "scam",
+            "terrible",
+            "unusable",
+            "useless",
+            "waste",
+            "worst",
+        ],
+        -2.0,
+    ),
+    **dict.fromkeys(
+        [
+            "annoying",
+            "bad",
+            "broke",
+            "broken",
+            "cracked",
+            "damaged",
+            "defective",
+            "died",
+            "disappointed",
+            "disappointing",
+            "disappointment",
+            "failed",
+            "fails",
+            "flimsy",
+            "frustrating",
+            "poor",
+            "poorly",
+            "refund",
+            "uncomfortable",
+        ],
+        -1.5,
+    ),
+    **dict.fromkeys(
+        [
+            "dead",
+            "difficult",
+            "fake",
+            "issue",
+            "issues",
+            "leaked",
+            "leaking",
+            "leaks",
+            "missing",
+            "noisy",
+            "problem",
+            "problems",
+            "return",
+            "returned",
+            "returning",
+            "ripped",
+            "slow",
+            "sticky",
+            "stopped",
+            "wrong",
+        ],
+        -1.0,
+    ),
+    **dict.fromkeys(["cheap", "hard", "loud"], -0.5),
+}
+
+NEGATORS = frozenset(
+    ["not", "no", "never", "nothing", "none", "neither", "nor", "without"]
+    + ["dont", "doesnt", "didnt", "isnt", "wasnt", "wont", "cant", "couldnt"]
+)
+INTENSIFIERS = frozenset(
+    ["very", "really", "extremely", "super", "so", "absolutely", "totally", "highly"]
+)
+CONTRASTS = frozenset(["but", "however", "although", "though", "yet"])
+
+# Words, and the punctuation that ends a clause.
+_TOKEN = re.compile(r"[a-z']+|[.!?;,]")
+
+
+class LexiconSentimentClassifier:
+    """
+    A model-free sentiment classifier that adds up the polarity of known words.
+
+    Negators ("not good") flip and damp the polarity of the next sentiment word within
+    three words and the same clause, intensifiers ("very good") amplify the next word,
+    and after a contrast ("good, but...") what follows counts more than what came
+    before. The summed polarity is turned into a probability with a logistic function,
+    so a review with several strong words in one direction gets a confident label, and
+    one with few or mixed words gets a score close to 0.5.
+    """
+
+    def __init__(self, lexicon: Optional[Dict[str, float]] = None, scale: float = 1.5):
+        """
+        Args:
+            lexicon (Optional[Dict[str, float]]): Polarity of every word. Defaults to `LEXICON`.
+            scale (float): Slope of the logistic function, i.e. how quickly confidence grows with polarity. Defaults to 1.5.
+        """
+        self._lexicon = LEXICON if lexicon is None else lexicon
+        self._scale = scale
+
+    def polarity(self, text: str) -> float:
+        """
+        Args:
+            text (str): The text to score.
+
+        Returns:
+            float: The summed polarity of the text's words, positive for positive sentiment.
+        """
+        total = 0.0
+        negated = 0
+        boost = 1.0
+        clause = 1.0
+        for token in _TOKEN.findall(text.casefold()):
+            if token in ".!?;,":
+                negated = 0
+                boost = 1.0
+                continue
+            token = token.strip("'")
+            if token in CONTRASTS:
+                # What comes after the contrast outweighs what came before it.
+                total *= 0.5
+                clause = 1.5
+                boost = 1.0
+                negated = 0
+                continue
+            if token in NEGATORS or token.endswith("n't"):
+                negated = 3
+                continue
+            if token in INTENSIFIERS:
+                boost = 1.3
+                continue
+            weight = self._lexicon.get(token)
+            if weight is not None:
+                total += weight * boost * clause * (-0.75 if negated else 1.0)
+                boost = 1.0
+                negated = 0
+            negated = max(0, negated - 1)
+        return total
+
+    def classify(self, texts: List[str]) -> List[dict]:
+        """
+        Classify texts as positive or negative.
+
+        Args:
+            texts (List[str]): The texts to classify.
+
+        Returns:
+            List[dict]: One dictionary per text with the "label" (POSITIVE or NEGATIVE)
+                and its probability as "score", between 0.5 and 1.
+        """
+        results = []
+        for text in texts:
+            # Clamped so that very long reviews cannot overflow the exponential.
+            logit = max(-30.0, min(30.0, self._scale * self.polarity(text)))
+            probability = 1 / (1 + math.exp(-logit))
+            if probability >= 0.5:
+                results.append({"label": "POSITIVE", "score": probability})
+            else:
+                results.append({"label": "NEGATIVE", "score": 1 - probability})
+        return results
@@ -0,0 +1,55 @@
+from typing import List, Optional
+from analyzing.aspect_based_sentiment_analyzer import AspectBasedSentimentAnalyzer
+from analyzing.sentiment_analyzer import SentimentAnalyzer
+
+
+def _compare(baseline: List[dict], candidate: List[dict]) -> dict:
+    drifts = [
+        abs(expected["score"] - actual["score"])
+        for expected, actual in zip(baseline, candidate)
+        if expected["label"] == actual["label"]
+    ]
+    agreeing = len(drifts)
+    return {
+        "count": len(baseline),
+        "label_agreement": agreeing / len(baseline) if baseline else 1.0,
+        "mean_score_drift": sum(drifts) / agreeing if agreeing else 0.0,
+        "max_score_drift": max(drifts, default=0.0),
+    }
+
+
+def parity_report(
+    reviews: List[str], backend: str, aspects: Optional[List[str]] = None
+) -> dict:
+    """
+    Measure how far a backend's results drift from the eager torch baseline.
+
+    Args:
+        reviews (List[str]): Sample reviews to compare on.
+        backend (str): The backend to check, see `analyzing.backends.BACKENDS`.
+        aspects (Optional[List[str]]): Aspects to compare aspect-based results on. General sentiment is compared if not provided.
+
+    Returns:
+        dict: A dictionary with:
+            - count (int): Number of compared results.
+            - label_agreement (float): Share of results whose label matches the baseline.
+            - mean_score_drift (float): Mean absolute score difference where labels match.
+            - max_score_drift (float): Largest absolute score difference where labels match.
+    """
+    if aspects:
+        baseline, candidate = (
+            AspectBasedSentimentAnalyzer(backend=name).analyze_sentiments(
+                reviews, aspects
+            )
+            for name in ("torch", backend)
+        )
+        return _compare(
+            [sentiment for _, _, sentiment in baseline],
+            [sentiment for _, _, sentiment in candidate],
+        )
+
+    baseline, candidate = (
+        SentimentAnalyzer(backend=name).analyze_sentiments(reviews)
+        for name in ("torch", backend)
+    )
+    return _compare(baseline, candidate)
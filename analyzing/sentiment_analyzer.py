@@ -1,16 +1,48 @@
-from transformers import pipeline
 from typing import List
+from analyzing.backends import load_model, share_weights
+from analyzing.batching import length_bucketed_batches
+from analyzing.windowing import combine_window_scores, token_windows
+from utils.metrics import observe_batch, timed
 
 
 class SentimentAnalyzer:
 
-    def __init__(self, *args, **kwargs):
+    def __init__(
+        self,
+        model_name: str = "distilbert-base-uncased-finetuned-sst-2-english",
+        backend: str = "torch",
+        window_overlap: int = 64,
+        *args,
+        **kwargs
+    ):
+        from transformers import AutoTokenizer, pipeline
+
+        self.model_name = model_name
+        self.backend = backend
         self._pipeline = pipeline(
             "sentiment-analysis",
-            model="distilbert-base-uncased-finetuned-sst-2-english",
+            model=load_model(model_name, "sequence-classification", backend),
+            tokenizer=AutoTokenizer.from_pretrained(model_name),
             *args,
             **kwargs
         )
+        tokenizer = self._pipeline.tokenizer
+        self._window_tokens = min(
+            tokenizer.model_max_length, 512
+        ) - tokenizer.num_special_tokens_to_add(pair=False)
+        self._window_overlap = window_overlap
+
+    def warm_up(self, share: bool = False) -> None:
+        """
+        Run a short and a full-length input through the model, so that the first real
+        request does not pay for lazy initialization and buffer allocation.
+
+        Args:
+            share (bool): Move the weights into shared memory first, for processes forked afterwards. Defaults to False.
+        """
+        if share:
+            share_weights(self._pipeline.model)
+        self.analyze_sentiments(["Great product.", "Great product. " * 1000])
 
     def analyze_sentiment(self, prompt: str, *args, **kwargs) -> List[dict]:
         """
@@ -25,3 +57,82 @@ class SentimentAnalyzer:
             List[dict]: A dictionary in a list containing the sentiment label and score.
         """
         return self._pipeline(prompt, *args, **kwargs)
+
+    def analyze_sentiments(
+        self, prompts: List[str], batch_size: int = 32, *args, **kwargs
+    ) -> List[dict]:
+        """
+        Analyze the sentiment of many prompts using batched inference.
+
+        Prompts are sorted by token length and split into buckets of `batch_size`
+        so that every forward pass pads as little as possible. Results are
+        returned in the original order of `prompts`.
+
+        Prompts longer than the model's context are split into overlapping token
+        windows, which are batched together with all other windows and prompts. The
+        window scores of every label are averaged, weighted by window length, and the
+        best label is returned with its averaged score.
+
+        Args:
+            prompts (List[str]): The texts to analyze.
+            batch_size (int): Number of prompts per forward pass. Defaults to 32.
+            *args: Additional arguments for the pipeline.
+            **kwargs: Additional keyword arguments for the pipeline.
+
+        Returns:
+            List[dict]: One dictionary per prompt containing the sentiment label and score.
+        """
+        tokenizer = self._pipeline.tokenizer
+        windows = []
+        with timed("sentiment.tokenize", len(prompts)):
+            encodings = (
+                tokenizer(
+                    prompts,
+                    add_special_tokens=False,
+                    return_offsets_mapping=tokenizer.is_fast,
+                )
+                if prompts
+                else {}
+            )
+            for position, prompt in enumerate(prompts):
+                encoding = {key: values[position] for key, values in encodings.items()}
+                windows.extend(
+                    (position, text, tokens)
+                    for text, tokens in token_windows(
+                        tokenizer,
+                        prompt,
+                        self._window_tokens,
+                        self._window_overlap,
+                        encoding,
+                    )
+                )
+
+        lengths = [tokens for _, _, tokens in windows]
+        scores = [None] * len(windows)
+        for indices in length_bucketed_batches(lengths, batch_size):
+            batch = [windows[index][1] for index in indices]
+            with timed("sentiment.forward", len(batch)):
+                outputs = self._pipeline(
+                    batch,
+                    batch_size=batch_size,
+                    top_k=None,
+                    truncation=True,
+                    *args,
+                    **kwargs
+                )
+            observe_batch(
+                "sentiment", len(batch), sum(lengths[index] for index in indices)
+            )
+            for index, output in zip(indices, outputs):
+                scores[index] = output
+
+        prompt_windows = [[] for _ in prompts]
+        for (position, _, tokens), score in zip(windows, scores):
+            prompt_windows[position].append((score, tokens))
+        return [
+            combine_window_scores(
+                [score for score, _ in window_scores],
+                [tokens for _, tokens in window_scores],
+            )
+            for window_scores in prompt_windows
+        ]
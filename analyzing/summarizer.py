@@ -1,28 +1,178 @@
-from transformers import pipeline
 from typing import List, Union
+from analyzing.backends import load_model, share_weights
+from analyzing.extractive import select_sentences
+from utils.deadline import check_deadline
+from utils.metrics import observe_batch, timed
 
 
 class Summarizer:
 
-    def __init__(self, *args, **kwargs):
+    def __init__(
+        self,
+        model_name: str = "facebook/bart-large-cnn",
+        backend: str = "torch",
+        *args,
+        **kwargs
+    ):
+        from transformers import AutoTokenizer, pipeline
+
+        self.model_name = model_name
+        self.backend = backend
         self._pipeline = pipeline(
-            "summarization", model="facebook/bart-large-cnn", *args, **kwargs
+            "summarization",
+            model=load_model(model_name, "seq2seq", backend),
+            tokenizer=AutoTokenizer.from_pretrained(model_name),
+            *args,
+            **kwargs,
+        )
+        # Leave room for the special tokens the pipeline adds around every input.
+        self._max_chunk_tokens = (
+            min(self._pipeline.tokenizer.model_max_length, 1024) - 4
         )
 
-    def summarize(self, prompt: Union[str, List[str]], *args, **kwargs) -> str:
+    def warm_up(self, share: bool = False) -> None:
+        """
+        Run a short input through the model, so that the first real request does not
+        pay for lazy initialization.
+
+        Args:
+            share (bool): Move the weights into shared memory first, for processes forked afterwards. Defaults to False.
+        """
+        if share:
+            share_weights(self._pipeline.model)
+        self._pipeline("Great product.", max_length=8, min_length=1)
+
+    def select(self, reviews: List[str], budget: int) -> List[str]:
+        """
+        Pick a representative subset of the reviews' sentences that fits in `budget`
+        tokens, see `analyzing.extractive.select_sentences`. Summarizing the subset costs
+        about the same however many reviews there are.
+
+        Args:
+            reviews (List[str]): The reviews to select from.
+            budget (int): Maximum number of tokens of the selected sentences.
+
+        Returns:
+            List[str]: The selected sentences, or `reviews` itself if it fits in the budget.
+        """
+        tokenizer = self._pipeline.tokenizer
+
+        def count_tokens(texts: List[str]) -> List[int]:
+            return [
+                len(ids)
+                for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]
+            ]
+
+        with timed("summarizer.select", len(reviews)):
+            return select_sentences(reviews, budget, count_tokens)
+
+    def summarize(
+        self, prompt: Union[str, List[str]], batch_size: int = 8, *args, **kwargs
+    ) -> str:
         """
         Summarize the given text using a summarization pipeline.
 
+        Text that does not fit in the model's context is summarized hierarchically,
+        see `summarize_batch`.
+
         Args:
             prompt (Union[str, List[str]]): The text to summarize. Can be a single string or a list of strings.
+            batch_size (int): Number of chunks summarized per forward pass. Defaults to 8.
             *args: Additional arguments for the pipeline.
             **kwargs: Additional keyword arguments for the pipeline.
 
         Returns:
             str: The summarized text.
         """
-        if isinstance(prompt, list):
-            prompt = "".join(prompt)
-        return self._pipeline(prompt, min_length=100, *args, **kwargs)[0][
-            "summary_text"
+        return self.summarize_batch([prompt], batch_size, *args, **kwargs)[0]
+
+    def summarize_batch(
+        self, prompts: List[Union[str, List[str]]], batch_size: int = 8, *args, **kwargs
+    ) -> List[str]:
+        """
+        Summarize several texts, sharing batched forward passes between them.
+
+        Every text is split on review boundaries into chunks that fit the model. The
+        chunks of all texts are summarized together in batches, the chunk summaries
+        are chunked and summarized again, and so on until each text is down to a single
+        chunk, which gets the final summary. Long texts are therefore covered in full
+        instead of being truncated at the model's context length.
+
+        Args:
+            prompts (List[Union[str, List[str]]]): The texts to summarize. Each can be a single string or a list of strings.
+            batch_size (int): Number of chunks summarized per forward pass. Defaults to 8.
+            *args: Additional arguments for the pipeline.
+            **kwargs: Additional keyword arguments for the final summarization pass.
+
+        Returns:
+            List[str]: One summary per prompt, in the same order.
+        """
+        chunks = [
+            self._chunk(prompt if isinstance(prompt, list) else [prompt])
+            for prompt in prompts
         ]
+
+        while any(len(prompt_chunks) > 1 for prompt_chunks in chunks):
+            check_deadline()
+            pending = [
+                (position, chunk)
+                for position, prompt_chunks in enumerate(chunks)
+                if len(prompt_chunks) > 1
+                for chunk in prompt_chunks
+            ]
+            with timed("summarizer.forward", len(pending)):
+                outputs = self._pipeline(
+                    [chunk for _, chunk in pending],
+                    batch_size=batch_size,
+                    truncation=True,
+                )
+            observe_batch("summarizer", len(pending))
+            summaries = {}
+            for (position, _), output in zip(pending, outputs):
+                summaries.setdefault(position, []).append(output["summary_text"])
+            for position, prompt_summaries in summaries.items():
+                chunks[position] = self._chunk(prompt_summaries)
+
+        check_deadline()
+        with timed("summarizer.forward", len(chunks)):
+            outputs = self._pipeline(
+                [prompt_chunks[0] for prompt_chunks in chunks],
+                min_length=100,
+                batch_size=batch_size,
+                *args,
+                **kwargs,
+            )
+        observe_batch("summarizer", len(chunks))
+        return [output["summary_text"] for output in outputs]
+
+    def _chunk(self, texts: List[str]) -> List[str]:
+        """
+        Pack texts, separated by newlines, into as few chunks that fit the model as possible.
+
+        A single text longer than the model's context is split into token windows.
+        """
+        tokenizer = self._pipeline.tokenizer
+        with timed("summarizer.tokenize", len(texts)):
+            token_ids = tokenizer(texts, add_special_tokens=False)["input_ids"]
+
+        pieces = []
+        for text, ids in zip(texts, token_ids):
+            if len(ids) <= self._max_chunk_tokens:
+                pieces.append((text, len(ids)))
+                continue
+            for start in range(0, len(ids), self._max_chunk_tokens):
+                window = ids[start : start + self._max_chunk_tokens]
+                pieces.append((tokenizer.decode(window), len(window)))
+
+        chunks = []
+        current, current_tokens = [], 0
+        for text, tokens in pieces:
+            # One extra token for the newline separating texts within a chunk.
+            if current and current_tokens + tokens + 1 > self._max_chunk_tokens:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+            current.append(text)
+            current_tokens += tokens + 1
+        if current or not chunks:
+            chunks.append("\n".join(current))
+        return chunks
@@ -0,0 +1,79 @@
+from typing import List, Optional, Sequence
+
+
+def token_windows(
+    tokenizer,
+    text: str,
+    max_tokens: int,
+    overlap: int,
+    encoding: Optional[dict] = None,
+) -> List[tuple[str, int]]:
+    """
+    Split a text into overlapping windows of at most `max_tokens` tokens.
+
+    With a fast tokenizer the windows are slices of the original text, cut at token
+    offsets. Slow tokenizers have no offsets, so their windows are decoded from the
+    token ids instead.
+
+    Args:
+        tokenizer: The model's tokenizer.
+        text (str): The text to split.
+        max_tokens (int): Maximum number of tokens per window, not counting special tokens.
+        overlap (int): Number of tokens shared by consecutive windows.
+        encoding (Optional[dict]): The text's "input_ids" (and, for fast tokenizers,
+            "offset_mapping") without special tokens, if it has already been tokenized.
+
+    Returns:
+        List[tuple[str, int]]: The windows with their token counts. A text that fits is
+            returned whole, as its only window.
+    """
+    if encoding is None:
+        encoding = tokenizer(
+            text,
+            add_special_tokens=False,
+            return_offsets_mapping=tokenizer.is_fast,
+        )
+    ids = encoding["input_ids"]
+    if len(ids) <= max_tokens:
+        return [(text, len(ids))]
+
+    offsets = encoding.get("offset_mapping")
+    step = max(1, max_tokens - overlap)
+    windows = []
+    for start in range(0, len(ids), step):
+        end = min(start + max_tokens, len(ids))
+        if offsets is not None:
+            window = text[offsets[start][0] : offsets[end - 1][1]]
+        else:
+            window = tokenizer.decode(ids[start:end])
+        windows.append((window, end - start))
+        if end == len(ids):
+            break
+    return windows
+
+
+def combine_window_scores(scores: Sequence[List[dict]], weights: Sequence[int]) -> dict:
+    """
+    Combine the label scores of a text's windows into one result.
+
+    Args:
+        scores (Sequence[List[dict]]): For every window, the score of every label, as
+            returned by a classification pipeline with `top_k=None`.
+        weights (Sequence[int]): Weight of every window, e.g. its token count.
+
+    Returns:
+        dict: The label with the highest weighted mean score, and that score.
+    """
+    if len(scores) == 1:
+        best = max(scores[0], key=lambda entry: entry["score"])
+        return {"label": best["label"], "score": best["score"]}
+
+    totals = {}
+    for window_scores, weight in zip(scores, weights):
+        for entry in window_scores:
+            totals[entry["label"]] = totals.get(entry["label"], 0.0) + (
+                entry["score"] * weight
+            )
+    total_weight = sum(weights)
+    label = max(totals, key=totals.__getitem__)
+    return {"label": label, "score": totals[label] / total_weight}
@@ -0,0 +1,302 @@
+"""
+Admission control for the API's expensive endpoints.
+
+Every endpoint has its own limits: how many of its requests run at once, how many
+reviews and (estimated) tokens one request may carry, and how long a request may take.
+Requests over the size limits are rejected with 413 before any work starts, since
+retrying them cannot help. Requests that arrive while the endpoint is saturated are
+rejected at once with 503 and a `Retry-After` estimated from recent request durations,
+instead of queueing behind the model. Admitted work runs under a `Deadline` (see
+`utils.deadline`): past the timeout the request fails with 504, and when the client
+disconnects the deadline is cancelled, so that the work stops at its next batch instead
+of computing a result nobody reads.
+
+Limits apply per worker process; with several workers (see `api.server`) the server as
+a whole admits up to `workers` times as many requests.
+"""
+
+import asyncio
+import math
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from utils.deadline import Deadline, DeadlineExceeded
+from utils.metrics import QUEUE_DEPTH, REJECTIONS
+
+# Rough number of characters per token of English text, to estimate the size of a
+# request without running a tokenizer.
+CHARS_PER_TOKEN = 4
+
+# Seconds between checks whether the client of a running request has disconnected.
+DISCONNECT_POLL_INTERVAL = 0.5
+
+# Weight of the newest request duration in the running average behind `Retry-After`.
+_LATENCY_SMOOTHING = 0.2
+
+DEFAULT_LIMITS: Dict[str, dict] = {
+    "analyze": {
+        "max_in_flight": 8,
+        "max_reviews": 5000,
+        "max_tokens": 2_000_000,
+        "timeout": 120,
+    },
+    "summarize": {
+        "max_in_flight": 2,
+        "max_reviews": 5000,
+        "max_tokens": 1_000_000,
+        "timeout": 300,
+    },
+    "scrape": {"max_in_flight": 4, "timeout": 300},
+    "batch": {"max_in_flight": 2, "timeout": 900},
+}
+
+
+@dataclass(frozen=True)
+class EndpointLimits:
+    """
+    Limits of one endpoint. None means unlimited.
+    """
+
+    max_in_flight: Optional[int] = None
+    max_reviews: Optional[int] = None
+    max_tokens: Optional[int] = None
+    timeout: Optional[float] = None
+
+    @classmethod
+    def from_env(cls, endpoint: str, **defaults) -> "EndpointLimits":
+        """
+        Read the limits of an endpoint from the API_<ENDPOINT>_MAX_IN_FLIGHT,
+        API_<ENDPOINT>_MAX_REVIEWS, API_<ENDPOINT>_MAX_TOKENS and API_<ENDPOINT>_TIMEOUT
+        (seconds) environment variables, e.g. API_ANALYZE_TIMEOUT. 0 means unlimited.
+
+        Args:
+            endpoint (str): Name of the endpoint, e.g. "analyze".
+            **defaults: Limits for the variables that are not set.
+
+        Returns:
+            EndpointLimits: The limits.
+        """
+        load_dotenv()
+
+        def read(name: str, cast: Callable[[str], Any]) -> Any:
+            value = os.getenv(f"API_{endpoint.upper()}_{name.upper()}")
+            return (cast(value) if value else defaults.get(name)) or None
+
+        return cls(
+            max_in_flight=read("max_in_flight", int),
+            max_reviews=read("max_reviews", int),
+            max_tokens=read("max_tokens", int),
+            timeout=read("timeout", float),
+        )
+
+
+def estimate_tokens(texts: List[str]) -> int:
+    """
+    Args:
+        texts (List[str]): The texts to measure.
+
+    Returns:
+        int: Approximate total number of model tokens of the texts.
+    """
+    return sum(len(text) for text in texts) // CHARS_PER_TOKEN
+
+
+class AdmissionController:
+    """
+    Admits, bounds and times out the work of API requests, per endpoint.
+
+    All bookkeeping happens on the event loop, so it needs no locks.
+    """
+
+    def __init__(self, limits: Dict[str, EndpointLimits]):
+        """
+        Args:
+            limits (Dict[str, EndpointLimits]): The limits of every endpoint by name.
+        """
+        self._limits = limits
+        self._in_flight = {endpoint: 0 for endpoint in limits}
+        self._latency: Dict[str, float] = {}
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        """
+        Build a controller with `DEFAULT_LIMITS`, overridden by environment variables
+        (see `EndpointLimits.from_env`).
+
+        Returns:
+            AdmissionController: The controller.
+        """
+        return cls(
+            {
+                endpoint: EndpointLimits.from_env(endpoint, **defaults)
+                for endpoint, defaults in DEFAULT_LIMITS.items()
+            }
+        )
+
+    def limits(self, endpoint: str) -> EndpointLimits:
+        """
+        Args:
+            endpoint (str): Name of the endpoint.
+
+        Returns:
+            EndpointLimits: The endpoint's limits.
+        """
+        return self._limits[endpoint]
+
+    def in_flight(self, endpoint: str) -> int:
+        """
+        Args:
+            endpoint (str): Name of the endpoint.
+
+        Returns:
+            int: Number of the endpoint's requests whose work is still running,
+                including work that is winding down after its request timed out.
+        """
+        return self._in_flight[endpoint]
+
+    def retry_after(self, endpoint: str) -> int:
+        """
+        Args:
+            endpoint (str): Name of the endpoint.
+
+        Returns:
+            int: Seconds until a request to the saturated endpoint is likely to be
+                admitted, i.e. until the next running request is expected to finish.
+        """
+        latency = self._latency.get(endpoint, 1.0)
+        running = max(1, self._in_flight[endpoint])
+        return max(1, math.ceil(latency / running))
+
+    def check_size(self, endpoint: str, reviews: List[str]) -> None:
+        """
+        Reject a request with more reviews or tokens than its endpoint allows.
+
+        Args:
+            endpoint (str): Name of the endpoint.
+            reviews (List[str]): The reviews of the request.
+
+        Raises:
+            HTTPException: 413 if the request is too large.
+        """
+        limits = self._limits[endpoint]
+        if limits.max_reviews is not None and len(reviews) > limits.max_reviews:
+            REJECTIONS.labels(endpoint, "reviews").inc()
+            raise HTTPException(
+                status_code=413,
+                detail=f"At most {limits.max_reviews} reviews per request, got "
+                f"{len(reviews)}. Split the reviews or submit a job instead.",
+            )
+        if limits.max_tokens is not None:
+            tokens = estimate_tokens(reviews)
+            if tokens > limits.max_tokens:
+                REJECTIONS.labels(endpoint, "tokens").inc()
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"At most about {limits.max_tokens} tokens per request, "
+                    f"got about {tokens}. Split the reviews or submit a job instead.",
+                )
+
+    async def run(
+        self,
+        request: Request,
+        endpoint: str,
+        func: Callable[..., Any],
+        *args,
+        reviews: Optional[List[str]] = None,
+        **kwargs,
+    ) -> Any:
+        """
+        Run a blocking function on a worker thread if the endpoint admits the request.
+
+        Args:
+            request (Request): The request, to notice when its client disconnects.
+            endpoint (str): Name of the endpoint.
+            func (Callable[..., Any]): The function to run.
+            *args: Positional arguments of the function.
+            reviews (Optional[List[str]]): The request's reviews, checked against the size limits.
+            **kwargs: Keyword arguments of the function.
+
+        Returns:
+            Any: What the function returns.
+
+        Raises:
+            HTTPException: 413 if the request is too large, 503 with `Retry-After` if
+                the endpoint is saturated, 504 if the work exceeds the timeout, and 499
+                if the client disconnected before the work finished.
+        """
+        limits = self._limits[endpoint]
+        if reviews is not None:
+            self.check_size(endpoint, reviews)
+        if (
+            limits.max_in_flight is not None
+            and self._in_flight[endpoint] >= limits.max_in_flight
+        ):
+            REJECTIONS.labels(endpoint, "busy").inc()
+            raise HTTPException(
+                status_code=503,
+                detail=f"Too many concurrent {endpoint} requests, try again later.",
+                headers={"Retry-After": str(self.retry_after(endpoint))},
+            )
+
+        deadline = Deadline(limits.timeout)
+        self._acquire(endpoint)
+        start = time.monotonic()
+        work = asyncio.ensure_future(
+            run_in_threadpool(deadline.run, func, *args, **kwargs)
+        )
+        # The slot is only released when the work itself ends, not when the request
+        # does, so that abandoned work still counts until it reaches a checkpoint.
+        work.add_done_callback(lambda future: self._release(endpoint, start, future))
+        watcher = asyncio.ensure_future(self._watch_disconnect(request, deadline))
+        try:
+            return await asyncio.wait_for(asyncio.shield(work), limits.timeout)
+        except (asyncio.TimeoutError, DeadlineExceeded):
+            # The work can notice the expired deadline before `wait_for` times out,
+            # so only the watcher tells a disconnect from a timeout.
+            deadline.cancel()
+            if watcher.done() and not watcher.cancelled() and watcher.result():
+                REJECTIONS.labels(endpoint, "disconnected").inc()
+                raise HTTPException(status_code=499, detail="The client disconnected.")
+            REJECTIONS.labels(endpoint, "deadline").inc()
+            raise HTTPException(
+                status_code=504,
+                detail=f"The request did not finish within {limits.timeout:g} seconds.",
+            )
+        except asyncio.CancelledError:
+            deadline.cancel()
+            raise
+        finally:
+            watcher.cancel()
+
+    def _acquire(self, endpoint: str) -> None:
+        self._in_flight[endpoint] += 1
+        QUEUE_DEPTH.labels(f"api {endpoint}").set(self._in_flight[endpoint])
+
+    def _release(self, endpoint: str, start: float, future: asyncio.Future) -> None:
+        self._in_flight[endpoint] -= 1
+        QUEUE_DEPTH.labels(f"api {endpoint}").set(self._in_flight[endpoint])
+        duration = time.monotonic() - start
+        latency = self._latency.get(endpoint)
+        self._latency[endpoint] = (
+            duration
+            if latency is None
+            else latency + _LATENCY_SMOOTHING * (duration - latency)
+        )
+        # Retrieve the outcome of work whose request already failed, so that asyncio
+        # does not log it as an exception that was never retrieved.
+        if not future.cancelled():
+            future.exception()
+
+    @staticmethod
+    async def _watch_disconnect(request: Request, deadline: Deadline) -> bool:
+        # Returns whether the client disconnected before the deadline expired.
+        while not deadline.expired():
+            if await request.is_disconnected():
+                deadline.cancel()
+                return True
+            await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+        return False
@@ -1,25 +1,66 @@
-from typing import List
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from enum import Enum
+from typing import List, Optional
 import pandas as pd
 from typing_extensions import Annotated
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from pydantic import BaseModel, HttpUrl, Field
-from pathlib import Path
-from model.model import Order
+from api.admission import AdmissionController
+from model.model import JobKind, JobStatus, Order
+from utils.metrics import (
+    STAGE_SECONDS,
+    cache_lookups,
+    exposed_registry,
+    multiprocess_enabled,
+)
+from utils.utils import parse_synonyms
+from service.batch import analyze_products
+from service.pipeline import stream_analysis
+from service.registry import registry
+from service.scheduler import install_batching
+from service.warmup import is_ready, warm_up_in_background
 from service.service import (
-    aspect_based_sentiment_analysis,
-    general_sentiment_analysis,
+    analyze_aspect_based_sentiment,
+    analyze_general_sentiment,
+    group_aspect_results,
     reviews_to_csv,
-    summarize_reviews,
+    summarize as summarize_review_list,
 )
 from fastapi.middleware.cors import CORSMiddleware
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Endpoints run inference on worker threads; batching lets concurrent
+    # requests share forward passes instead of queueing for the model.
+    install_batching(registry)
+    # Preforked workers inherit warm models from their parent (see `api.server`);
+    # a single process warms up while it already accepts requests.
+    if not is_ready():
+        warm_up_in_background(registry)
+    jobs = registry.get("job_queue")
+    jobs.start()
+    yield
+    # Jobs that do not finish in time are rerun on the next start.
+    await run_in_threadpool(jobs.stop, 5)
+
+
 app = FastAPI(
     title="Review Analysis API",
     description="API for scraping and analyzing product reviews",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+# Limits on concurrent, oversized and slow requests, see `api.admission`.
+admission = AdmissionController.from_env()
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173"],
@@ -29,6 +70,17 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    # Streaming responses are timed until their first byte.
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    if route is not None:
+        STAGE_SECONDS.labels(f"api {route.path}").observe(time.perf_counter() - start)
+    return response
+
+
 class Url(BaseModel):
     url: HttpUrl = Field(
         examples=["https://www.walmart.com/reviews/product/837853339"],
@@ -49,8 +101,28 @@ class ReviewList(BaseModel):
     )
 
 
+class UrlList(BaseModel):
+    urls: List[HttpUrl] = Field(
+        min_length=1,
+        max_length=100,
+        examples=[
+            [
+                "https://www.walmart.com/reviews/product/837853339",
+                "https://www.walmart.com/ip/5074872077",
+            ]
+        ],
+        description="The Walmart product URLs to scrape reviews from",
+    )
+
+
+class StreamFormat(str, Enum):
+    ndjson = "ndjson"
+    sse = "sse"
+
+
 @app.post("/scrape/")
 async def scrape(
+    request: Request,
     url: Url,
     count: Annotated[
         int, Query(gt=0, le=1000, description="Number of reviews to scrape")
@@ -58,24 +130,35 @@ async def scrape(
     sort: Annotated[
         Order, Query(description="Sorting method for the reviews")
     ] = Order.relevancy,
+    incremental: Annotated[
+        bool,
+        Query(description="Only scrape reviews newer than the locally stored ones"),
+    ] = False,
 ):
     """
     Scrape reviews from a product URL.
     """
     try:
-        reviews = reviews_to_csv(
+        reviews = await admission.run(
+            request,
+            "scrape",
+            reviews_to_csv,
             str(url.url),
             count=count,
             sort=sort,
+            incremental=incremental,
         )
         return {"status": "success", "reviews": reviews["review"].tolist()}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.post("/analyze/")
 async def analyze(
+    request: Request,
     reviews: ReviewList,
     aspects: Annotated[
         List[str],
@@ -84,76 +167,431 @@ async def analyze(
             example=["battery", "buttons"],
         ),
     ] = None,
+    synonyms: Annotated[
+        List[str],
+        Query(
+            description="Alternative terms for aspects in the form aspect=term.",
+            example=["battery=charge"],
+        ),
+    ] = None,
 ):
     """
     Analyze sentiment from a list of reviews.
     """
     try:
-        temp_review_file = Path("temp.csv")
-        temp_result_file = Path("temp_result.csv")
-        pd.DataFrame(reviews.reviews, columns=["review"]).to_csv(
-            temp_review_file, index=False
-        )
+        reviews_df = pd.DataFrame(reviews.reviews, columns=["review"])
 
         if aspects:
-            aspect_based_sentiment_analysis(temp_review_file, temp_result_file, aspects)
-            result_df = pd.read_csv(temp_result_file)
-
-            grouped_df = result_df.groupby("review").apply(
-                lambda group: group[["aspect", "label", "score"]].to_dict("records")
+            result_df, _ = await admission.run(
+                request,
+                "analyze",
+                analyze_aspect_based_sentiment,
+                reviews_df,
+                aspects,
+                synonyms=parse_synonyms(synonyms or []),
+                reviews=reviews.reviews,
             )
 
-            grouped_results = [
-                {"review": review, "details": details}
-                for review, details in grouped_df.items()
-            ]
-
             return {
                 "status": "success",
                 "analysis_type": "aspect-based",
                 "aspects_analyzed": aspects,
-                "results": grouped_results,
+                "collapsed": result_df.attrs.get("collapsed", 0),
+                "results": group_aspect_results(reviews_df, result_df),
             }
 
         else:
-            general_sentiment_analysis(temp_review_file, temp_result_file)
-            result_df = pd.read_csv(temp_result_file)
-
-            grouped_df = result_df.groupby("review").apply(
-                lambda group: group[["label", "score"]].to_dict("records")
+            result_df, _ = await admission.run(
+                request,
+                "analyze",
+                analyze_general_sentiment,
+                reviews_df,
+                reviews=reviews.reviews,
             )
 
-            grouped_results = [
-                {
-                    "review": review,
-                    "label": details[0]["label"],
-                    "score": details[0]["score"],
-                }
-                for review, details in grouped_df.items()
+            columns = ["review", "label", "score"]
+            if "tier" in result_df:
+                columns.append("tier")
+            results = [
+                dict(zip(columns, row))
+                for row in result_df[columns].itertuples(index=False)
             ]
 
             return {
                 "status": "success",
                 "analysis_type": "general",
-                "results": grouped_results,
+                "collapsed": result_df.attrs.get("collapsed", 0),
+                "results": results,
             }
 
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/scrape-and-analyze/")
+async def scrape_and_analyze(
+    url: Url,
+    count: Annotated[
+        int, Query(gt=0, le=1000, description="Number of reviews to scrape")
+    ] = 100,
+    sort: Annotated[
+        Order, Query(description="Sorting method for the reviews")
+    ] = Order.relevancy,
+    aspects: Annotated[
+        List[str],
+        Query(
+            description="List of aspects to analyze. Performs general sentiment analysis if not provided.",
+            example=["battery", "buttons"],
+        ),
+    ] = None,
+    synonyms: Annotated[
+        List[str],
+        Query(
+            description="Alternative terms for aspects in the form aspect=term.",
+            example=["battery=charge"],
+        ),
+    ] = None,
+    format: Annotated[
+        StreamFormat,
+        Query(description="Stream as newline-delimited JSON or server-sent events"),
+    ] = StreamFormat.ndjson,
+):
+    """
+    Scrape reviews from a product URL and stream analysis results as reviews arrive.
+    """
+    try:
+        synonyms = parse_synonyms(synonyms or [])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def events():
+        try:
+            for result in stream_analysis(str(url.url), count, sort, aspects, synonyms):
+                if format == StreamFormat.sse:
+                    yield f"event: result\ndata: {json.dumps(result)}\n\n"
+                else:
+                    yield json.dumps(result) + "\n"
+            if format == StreamFormat.sse:
+                yield "event: done\ndata: {}\n\n"
+        except Exception as e:
+            error = {"status": "error", "detail": str(e)}
+            if format == StreamFormat.sse:
+                yield f"event: error\ndata: {json.dumps(error)}\n\n"
+            else:
+                yield json.dumps(error) + "\n"
+
+    media_type = (
+        "text/event-stream" if format == StreamFormat.sse else "application/x-ndjson"
+    )
+    return StreamingResponse(events(), media_type=media_type)
+
+
+@app.post("/batch/")
+async def batch(
+    request: Request,
+    urls: UrlList,
+    count: Annotated[
+        int, Query(gt=0, le=1000, description="Number of reviews to scrape per product")
+    ] = 100,
+    sort: Annotated[
+        Order, Query(description="Sorting method for the reviews")
+    ] = Order.relevancy,
+    aspects: Annotated[
+        List[str],
+        Query(
+            description="List of aspects to analyze. Performs general sentiment analysis if not provided.",
+            example=["battery", "buttons"],
+        ),
+    ] = None,
+    synonyms: Annotated[
+        List[str],
+        Query(
+            description="Alternative terms for aspects in the form aspect=term.",
+            example=["battery=charge"],
+        ),
+    ] = None,
+    concurrency: Annotated[
+        int, Query(gt=0, le=16, description="Number of products scraped at once")
+    ] = 4,
+):
+    """
+    Scrape and analyze several products at once and compare them.
+    """
+    try:
+        results, comparison = await admission.run(
+            request,
+            "batch",
+            analyze_products,
+            [str(url) for url in urls.urls],
+            count,
+            sort,
+            aspects,
+            parse_synonyms(synonyms or []),
+            concurrency=concurrency,
+        )
+
+        products = []
+        for product_id, product in results.items():
+            if aspects:
+                product_results = group_aspect_results(
+                    product["reviews"], product["results"]
+                )
+            else:
+                product_results = [
+                    {"review": review, "label": label, "score": score}
+                    for review, label, score in product["results"][
+                        ["review", "label", "score"]
+                    ].itertuples(index=False)
+                ]
+            products.append(
+                {
+                    "product_id": product_id,
+                    "url": product["url"],
+                    "error": product["error"],
+                    "results": product_results,
+                    "stats": product["stats"],
+                }
+            )
+
+        return {
+            "status": "success",
+            "analysis_type": "aspect-based" if aspects else "general",
+            "products": products,
+            "comparison": comparison.astype(object)
+            .where(comparison.notna(), None)
+            .to_dict("records"),
+        }
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.get("/cache/")
+async def cache_stats():
+    """
+    Report result cache hit and miss counters, of all workers together.
+    """
+    cache = registry.get("result_cache")
+    if cache is None:
+        return {"status": "success", "enabled": False}
+    # Every preforked worker has its own cache counters; the shared metrics add them up.
+    stats = cache_lookups() if multiprocess_enabled() else cache.stats()
+    return {"status": "success", "enabled": True, **stats}
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Expose stage timings, batch sizes, queue depths, cache lookups and token counts in the Prometheus text format, of all workers together.
+    """
+    return Response(generate_latest(exposed_registry()), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/ready")
+async def ready():
+    """
+    Report whether every model has been loaded and warmed up. Returns 503 until then.
+    """
+    if not is_ready():
+        return JSONResponse(
+            {"status": "warming up"}, status_code=503, headers={"Retry-After": "5"}
+        )
+    return {"status": "ready"}
+
+
 @app.post("/summarize/")
 async def summarize(
+    request: Request,
     reviews: ReviewList,
+    budget: Annotated[
+        Optional[int],
+        Query(
+            ge=64,
+            description="Only summarize a representative subset of the review sentences of at most this many tokens.",
+        ),
+    ] = None,
 ):
     """
     Summarize reviews.
     """
     try:
-        temp_file = "temp.csv"
-        pd.DataFrame(reviews.reviews, columns=["review"]).to_csv(temp_file, index=False)
-        summary = summarize_reviews(temp_file)
+        summary = await admission.run(
+            request,
+            "summarize",
+            summarize_review_list,
+            reviews.reviews,
+            budget,
+            reviews=reviews.reviews,
+        )
         return {"status": "success", "summary": summary}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _get_job(job_id: str) -> dict:
+    job = await run_in_threadpool(registry.get("job_queue").get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No job with id '{job_id}'.")
+    return job
+
+
+@app.post("/jobs/scrape/")
+async def submit_scrape_job(
+    url: Url,
+    count: Annotated[
+        int, Query(gt=0, le=1000, description="Number of reviews to scrape")
+    ] = 100,
+    sort: Annotated[
+        Order, Query(description="Sorting method for the reviews")
+    ] = Order.relevancy,
+    incremental: Annotated[
+        bool,
+        Query(description="Only scrape reviews newer than the locally stored ones"),
+    ] = False,
+):
+    """
+    Queue a scrape in the background. Its result has the same "reviews" as `/scrape/`.
+    """
+    job = await run_in_threadpool(
+        registry.get("job_queue").submit,
+        JobKind.scrape,
+        {
+            "url": str(url.url),
+            "count": count,
+            "sort": sort.value,
+            "incremental": incremental,
+        },
+    )
+    return {"status": "success", "job": job}
+
+
+@app.post("/jobs/analyze/")
+async def submit_analyze_job(
+    reviews: ReviewList,
+    aspects: Annotated[
+        List[str],
+        Query(
+            description="List of aspects to analyze. Performs general sentiment analysis if not provided.",
+            example=["battery", "buttons"],
+        ),
+    ] = None,
+    synonyms: Annotated[
+        List[str],
+        Query(
+            description="Alternative terms for aspects in the form aspect=term.",
+            example=["battery=charge"],
+        ),
+    ] = None,
+):
+    """
+    Queue an analysis in the background. Its result has the same "results" as `/analyze/`, plus "stats".
+    """
+    try:
+        synonyms = parse_synonyms(synonyms or [])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    job = await run_in_threadpool(
+        registry.get("job_queue").submit,
+        JobKind.analyze,
+        {"reviews": reviews.reviews, "aspects": aspects, "synonyms": synonyms},
+    )
+    return {"status": "success", "job": job}
+
+
+@app.post("/jobs/summarize/")
+async def submit_summarize_job(
+    reviews: ReviewList,
+    budget: Annotated[
+        Optional[int],
+        Query(
+            ge=64,
+            description="Only summarize a representative subset of the review sentences of at most this many tokens.",
+        ),
+    ] = None,
+):
+    """
+    Queue a summary in the background. Its result has the same "summary" as `/summarize/`.
+    """
+    job = await run_in_threadpool(
+        registry.get("job_queue").submit,
+        JobKind.summarize,
+        {"reviews": reviews.reviews, "budget": budget},
+    )
+    return {"status": "success", "job": job}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Report the status and progress of a job.
+    """
+    return {"status": "success", "job": await _get_job(job_id)}
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(
+    job_id: str,
+    format: Annotated[
+        StreamFormat,
+        Query(description="Stream as newline-delimited JSON or server-sent events"),
+    ] = StreamFormat.ndjson,
+):
+    """
+    Stream a job's status and progress every time they change, until it finishes.
+    """
+    job = await _get_job(job_id)
+
+    async def events():
+        nonlocal job
+        last = None
+        while True:
+            update = (job["status"], job["progress"])
+            if update != last:
+                last = update
+                if format == StreamFormat.sse:
+                    yield f"event: progress\ndata: {json.dumps(job)}\n\n"
+                else:
+                    yield json.dumps(job) + "\n"
+            if job["status"] not in (JobStatus.queued, JobStatus.running):
+                return
+            await asyncio.sleep(0.5)
+            job = await _get_job(job_id)
+
+    media_type = (
+        "text/event-stream" if format == StreamFormat.sse else "application/x-ndjson"
+    )
+    return StreamingResponse(events(), media_type=media_type)
+
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """
+    Fetch the result of a succeeded job.
+    """
+    job = await _get_job(job_id)
+    if job["status"] != JobStatus.succeeded:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Job '{job_id}' is {job['status']}"
+            + (f": {job['error']}" if job["error"] else "."),
+        )
+    result = await run_in_threadpool(registry.get("job_queue").result, job_id)
+    return {"status": "success", "job": job, "result": result}
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """
+    Cancel a queued or running job.
+    """
+    await _get_job(job_id)
+    if not await run_in_threadpool(registry.get("job_queue").cancel, job_id):
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' already finished.")
+    return {"status": "success", "job": await _get_job(job_id)}
@@ -0,0 +1,105 @@
+import gc
+import os
+import signal
+import time
+import traceback
+from typing import Dict
+from service.parallel import _init_worker
+from service.registry import registry
+from service.warmup import warm_up
+from utils.metrics import multiprocess_enabled
+
+# Seconds to wait before replacing a worker that exited, so a crashing worker does not spin.
+RESTART_DELAY = 1.0
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000, workers: int = 1) -> None:
+    """
+    Run the API, optionally in several preforked worker processes.
+
+    With more than one worker, every model is loaded and warmed up once in this
+    process, its weights are moved to shared memory and the heap is frozen so that
+    garbage collection in the workers does not touch (and so copy) the parent's
+    objects. The listening socket is bound here, then `workers` processes are forked
+    that all accept on it. Each worker runs its own event loop, micro-batchers and job
+    threads, and uses its share of the CPU cores. Workers that die are replaced by a
+    fresh fork, which is ready at once. SIGINT and SIGTERM are passed on to the workers.
+
+    The workers' metrics are only added up if PROMETHEUS_MULTIPROC_DIR was set before
+    `utils.metrics` was imported (see `main.py`); otherwise every worker reports its own.
+
+    Args:
+        host (str): Address to listen on. Defaults to "127.0.0.1".
+        port (int): Port to listen on. Defaults to 8000.
+        workers (int): Number of worker processes. Serves from this process if 1. Defaults to 1.
+    """
+    import uvicorn
+    from api.api import app
+
+    if workers <= 1:
+        uvicorn.run(app, host=host, port=port)
+        return
+
+    # The parent must not start an intra-op thread pool before forking: OpenMP's
+    # threads do not survive a fork and a child that uses them can hang.
+    _init_worker(1)
+    warm_up(registry, share=True)
+    sock = uvicorn.Config(app, host=host, port=port).bind_socket()
+    gc.collect()
+    gc.freeze()
+
+    threads = max(1, (os.cpu_count() or workers) // workers)
+    children: Dict[int, None] = {}
+    stopping = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            code = 1
+            try:
+                _init_worker(threads)
+                uvicorn.Server(uvicorn.Config(app, host=host, port=port)).run(
+                    sockets=[sock]
+                )
+                code = 0
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 1
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                # Skip the parent's atexit handlers and buffered state.
+                os._exit(code)
+        children[pid] = None
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        children.pop(pid, None)
+        if multiprocess_enabled():
+            from prometheus_client import multiprocess
+
+            # Drop the dead worker's queue depths from the shared metrics.
+            multiprocess.mark_process_dead(pid)
+        if not stopping:
+            time.sleep(RESTART_DELAY)
+            if not stopping:
+                spawn()
+    sock.close()
@@ -0,0 +1,186 @@
+"""
+Agreement and speedup of the confidence cascade (see `analyzing.cascade`) on a sample.
+
+The sample is a CSV file with a "review" column and, optionally, a "label" column of
+gold labels (POSITIVE or NEGATIVE). Every review is labeled by the transformer alone
+and by the cascade at every threshold; the report says how many reviews the lexicon
+labeled, how often the cascade agrees with the transformer (overall and on the
+lexicon's share), the accuracy of both against the gold labels, and the speedup.
+The models are used directly, without the result cache or deduplication.
+
+    python -m benchmarks.cascade sample.csv --threshold 0.85 --threshold 0.9 --output cascade.json
+"""
+
+import json
+import time
+from pathlib import Path
+from typing import List, Optional
+import typer
+from rich import print
+from rich.table import Table
+from typing_extensions import Annotated
+from model.model import Backend
+
+app = typer.Typer(pretty_exceptions_show_locals=False)
+
+
+def _share(matches: List[bool]) -> Optional[float]:
+    return round(sum(matches) / len(matches), 4) if matches else None
+
+
+def evaluate(
+    reviews: List[str],
+    analyzer,
+    thresholds: List[float],
+    gold: Optional[List[str]] = None,
+    batch_size: int = 32,
+) -> dict:
+    """
+    Compare the cascade at several thresholds with the analyzer alone.
+
+    Args:
+        reviews (List[str]): The reviews to label.
+        analyzer: The sentiment analyzer behind the cascade.
+        thresholds (List[float]): The cascade thresholds to try.
+        gold (Optional[List[str]]): The correct label of every review, if known.
+        batch_size (int): Number of reviews per forward pass. Defaults to 32.
+
+    Returns:
+        dict: The analyzer's "seconds" and "accuracy", and one entry per threshold in
+            "cascade" with its "fast_share", "agreement", "fast_agreement",
+            "accuracy", "seconds" and "speedup". Accuracies are None without `gold`.
+    """
+    from analyzing.cascade import FAST_TIER, CascadeSentimentAnalyzer
+
+    def accuracy(results: List[dict]) -> Optional[float]:
+        if gold is None:
+            return None
+        return _share(
+            [
+                result["label"].upper() == label.upper()
+                for result, label in zip(results, gold)
+            ]
+        )
+
+    # Warm up, so that the first timed run does not pay for initialization.
+    analyzer.analyze_sentiments(reviews[:batch_size], batch_size=batch_size)
+    start = time.perf_counter()
+    reference = analyzer.analyze_sentiments(reviews, batch_size=batch_size)
+    baseline = time.perf_counter() - start
+
+    rows = []
+    for threshold in thresholds:
+        cascade = CascadeSentimentAnalyzer(analyzer, threshold)
+        start = time.perf_counter()
+        results = cascade.analyze_sentiments(reviews, batch_size=batch_size)
+        seconds = time.perf_counter() - start
+
+        agreement = [
+            result["label"].upper() == expected["label"].upper()
+            for result, expected in zip(results, reference)
+        ]
+        fast = [result["tier"] == FAST_TIER for result in results]
+        rows.append(
+            {
+                "threshold": threshold,
+                "fast_share": _share(fast),
+                "agreement": _share(agreement),
+                "fast_agreement": _share(
+                    [agrees for agrees, is_fast in zip(agreement, fast) if is_fast]
+                ),
+                "accuracy": accuracy(results),
+                "seconds": round(seconds, 4),
+                "speedup": round(baseline / seconds, 2) if seconds else None,
+            }
+        )
+    return {
+        "reviews": len(reviews),
+        "seconds": round(baseline, 4),
+        "accuracy": accuracy(reference),
+        "cascade": rows,
+    }
+
+
+@app.command()
+def main(
+    source: Annotated[
+        Path,
+        typer.Argument(
+            dir_okay=False, exists=True, help="CSV file with a review column"
+        ),
+    ],
+    thresholds: Annotated[
+        List[float],
+        typer.Option("--threshold", "-t", min=0.5, max=1.0, help="Cascade threshold"),
+    ] = [0.8, 0.9, 0.95],
+    sample: Annotated[
+        Optional[int],
+        typer.Option("--sample", min=1, help="Only use the first this many reviews"),
+    ] = None,
+    batch_size: Annotated[
+        int, typer.Option("--batch-size", "-b", min=1, help="Reviews per forward pass")
+    ] = 32,
+    backend: Annotated[
+        Backend,
+        typer.Option("--backend", case_sensitive=False, help="Inference backend"),
+    ] = Backend.torch,
+    output: Annotated[
+        Path, typer.Option("--output", "-o", help="JSON report destination")
+    ] = Path("cascade_results.json"),
+):
+    """
+    Measure the agreement and speedup of the confidence cascade on a sample.
+    """
+    import pandas as pd
+    from analyzing.sentiment_analyzer import SentimentAnalyzer
+
+    sample_df = pd.read_csv(source, nrows=sample).dropna(subset=["review"])
+    reviews = sample_df["review"].astype(str).tolist()
+    gold = sample_df["label"].astype(str).tolist() if "label" in sample_df else None
+
+    analyzer = SentimentAnalyzer(backend=backend.value)
+    report = evaluate(reviews, analyzer, sorted(thresholds), gold, batch_size)
+    output.write_text(json.dumps(report, indent=2))
+
+    def show(value) -> str:
+        return "-" if value is None else str(value)
+
+    table = Table(
+        "threshold",
+        "lexicon share",
+        "agreement",
+        "lexicon agreement",
+        "accuracy",
+        "seconds",
+        "speedup",
+    )
+    table.add_row(
+        "transformer",
+        "0",
+        "1",
+        "-",
+        show(report["accuracy"]),
+        show(report["seconds"]),
+        "1",
+    )
+    for row in report["cascade"]:
+        table.add_row(
+            str(row["threshold"]),
+            *(
+                show(row[key])
+                for key in (
+                    "fast_share",
+                    "agreement",
+                    "fast_agreement",
+                    "accuracy",
+                    "seconds",
+                    "speedup",
+                )
+            ),
+        )
+    print(table)
+    print(f"[bold green]Results written to [italic]{output}[/italic][/bold green]")
+
+
+if __name__ == "__main__":
+    app()
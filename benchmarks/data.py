@@ -0,0 +1,48 @@
+import random
+from typing import List
+
+_OPENERS = ["The", "This", "My", "Our", "Honestly, the"]
+_ASPECTS = ["battery", "screen", "buttons", "price", "sound", "design"]
+_OPINIONS = [
+    "is great",
+    "is excellent",
+    "feels comfortable",
+    "is bad",
+    "is poor",
+    "is sticky and difficult to use",
+    "works as expected",
+    "broke after a week",
+]
+_FILLER = [
+    "I bought it for my son.",
+    "Shipping was fast.",
+    "Would buy again.",
+    "Not sure it is worth it.",
+    "Great product!",
+]
+
+ASPECTS = _ASPECTS[:3]
+
+
+def make_reviews(count: int, seed: int = 0) -> List[str]:
+    """
+    Generate deterministic synthetic reviews of varied length that mention common aspects.
+
+    Args:
+        count (int): Number of reviews.
+        seed (int): Random seed. Defaults to 0.
+
+    Returns:
+        List[str]: The reviews.
+    """
+    rng = random.Random(seed)
+    reviews = []
+    for _ in range(count):
+        sentences = [
+            f"{rng.choice(_OPENERS)} {rng.choice(_ASPECTS)} {rng.choice(_OPINIONS)}."
+            for _ in range(rng.randint(1, 4))
+        ]
+        sentences += rng.sample(_FILLER, rng.randint(0, 2))
+        rng.shuffle(sentences)
+        reviews.append(" ".join(sentences))
+    return reviews
@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.data import make_reviews
+
+
+class FakeProvider:
+    """
+    A local HTTP stand-in for the SerpApi and ZenRows Walmart review endpoints.
+
+    SerpApi is served at `/serpapi/search.json` and ZenRows at `/zenrows/<product_id>`.
+    Every product has `total` deterministic reviews, served `page_size` per page after
+    `latency` seconds.
+    """
+
+    def __init__(self, total: int = 1000, page_size: int = 10, latency: float = 0.05):
+        self.total = total
+        self.page_size = page_size
+        self.latency = latency
+        self.requests = 0
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                provider.requests += 1
+                time.sleep(provider.latency)
+                url = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                if url.path.startswith("/serpapi"):
+                    body = provider._serpapi_page(int(query.get("page", 1)))
+                else:
+                    page = int(query["url"]) if "url" in query else 1
+                    body = provider._zenrows_page(page)
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._reviews = make_reviews(total)
+
+    @property
+    def serpapi_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/serpapi/search.json"
+
+    @property
+    def zenrows_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/zenrows/"
+
+    def _page(self, page: int) -> list[tuple[int, str]]:
+        start = (page - 1) * self.page_size
+        return list(enumerate(self._reviews))[start : start + self.page_size]
+
+    def _serpapi_page(self, page: int) -> dict:
+        reviews = [
+            {
+                "review_id": str(position),
+                "text": text,
+                "rating": 1 + position % 5,
+                "review_submission_time": f"{position:08d}",
+            }
+            for position, text in self._page(page)
+        ]
+        has_next = page * self.page_size < self.total
+        return {
+            "reviews": reviews,
+            "serpapi_pagination": {"next": str(page + 1)} if has_next else {},
+        }
+
+    def _zenrows_page(self, page: int) -> dict:
+        reviews = [
+            {
+                "review_id": str(position),
+                "review_content": text,
+                "rating": 1 + position % 5,
+                "review_date": f"{position:08d}",
+            }
+            for position, text in self._page(page)
+        ]
+        has_next = page * self.page_size < self.total
+        return {
+            "review_count": self.total,
+            "product_reviews_list": reviews,
+            "pagination": {"next_page": str(page + 1)} if has_next else {},
+        }
+
+    def __enter__(self) -> "FakeProvider":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,264 @@
+"""
+Offline benchmarks for the scrape, analyze and summarize paths of the service and the API.
+
+Scraping always runs against a local fake SerpApi server. Models are stubbed unless
+--real-models is given, in which case the Hugging Face models must already be cached.
+
+    python -m benchmarks.run --size 100 --size 1000 --output bench.json
+"""
+
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import typer
+from rich import print
+from rich.table import Table
+from typing_extensions import Annotated
+
+ROOT = Path(__file__).resolve().parent.parent
+PRODUCT_URL = "https://www.walmart.com/ip/123456789"
+
+app = typer.Typer(pretty_exceptions_show_locals=False)
+
+
+def _setup(workdir: Path, size: int, real_models: bool, stub_latency: float):
+    os.environ["RESULT_CACHE_DISABLED"] = "1"
+    os.environ["REVIEW_STORE_PATH"] = str(workdir / "reviews.sqlite")
+    if real_models:
+        os.environ["HF_HUB_OFFLINE"] = "1"
+
+    import pandas as pd
+    from benchmarks.data import make_reviews
+    from benchmarks.fake_provider import FakeProvider
+    from benchmarks.stubs import install_stubs
+    from scraping.fetcher import PageFetcher
+    from scraping.serpapi_scraper import SerpapiScraper
+    from service.registry import registry
+
+    provider = FakeProvider(total=max(size, 10), latency=0.05).__enter__()
+    registry.register(
+        "scraper",
+        lambda: SerpapiScraper(provider.serpapi_url, PageFetcher(max_workers=4)),
+    )
+    if not real_models:
+        install_stubs(registry, batch_latency=stub_latency)
+
+    reviews = make_reviews(size)
+    source = workdir / "reviews.csv"
+    pd.DataFrame(reviews, columns=["review"]).to_csv(source, index=False)
+    return reviews, source
+
+
+def _service_cases(
+    workdir: Path, reviews: List[str], source: Path
+) -> Dict[str, Callable]:
+    from benchmarks.data import ASPECTS
+    from service.service import (
+        aspect_based_sentiment_analysis,
+        general_sentiment_analysis,
+        reviews_to_csv,
+        summarize_reviews,
+    )
+
+    destination = workdir / "result.csv"
+    return {
+        "scrape": lambda: reviews_to_csv(PRODUCT_URL, len(reviews)),
+        "analyze": lambda: general_sentiment_analysis(source, destination),
+        "analyze-aspects": lambda: aspect_based_sentiment_analysis(
+            source, destination, ASPECTS
+        ),
+        "summarize": lambda: summarize_reviews(source),
+    }
+
+
+def _api_cases(client, reviews: List[str]) -> Dict[str, Callable]:
+    from benchmarks.data import ASPECTS
+
+    def post(path: str, **kwargs) -> None:
+        response = client.post(path, **kwargs)
+        response.raise_for_status()
+
+    body = {"reviews": reviews}
+    return {
+        "api-scrape": lambda: post(
+            "/scrape/",
+            params={"count": min(len(reviews), 1000)},
+            json={"url": PRODUCT_URL},
+        ),
+        "api-analyze": lambda: post("/analyze/", json=body),
+        "api-analyze-aspects": lambda: post(
+            "/analyze/", params={"aspects": ASPECTS}, json=body
+        ),
+        "api-summarize": lambda: post("/summarize/", json=body),
+    }
+
+
+def _run_case(
+    case: str, size: int, repeats: int, real_models: bool, stub_latency: float
+) -> dict:
+    """
+    Run one benchmark case in the current (fresh) process and return its measurements.
+    """
+    sys.path.insert(0, str(ROOT))
+    with tempfile.TemporaryDirectory() as workdir:
+        workdir = Path(workdir)
+        reviews, source = _setup(workdir, size, real_models, stub_latency)
+
+        if case.startswith("api-"):
+            from fastapi.testclient import TestClient
+            from api.api import app as api_app
+
+            with TestClient(api_app) as client:
+                return _measure(_api_cases(client, reviews)[case], size, repeats)
+        return _measure(_service_cases(workdir, reviews, source)[case], size, repeats)
+
+
+def _measure(run: Callable, size: int, repeats: int) -> dict:
+    start = time.perf_counter()
+    run()
+    warmup = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, round(0.95 * (len(latencies) - 1)))]
+    median = statistics.median(latencies)
+    return {
+        "warmup_seconds": round(warmup, 6),
+        "p50_seconds": round(median, 6),
+        "p95_seconds": round(p95, 6),
+        "reviews_per_second": round(size / median, 2) if median else None,
+        # ru_maxrss is reported in kilobytes on Linux.
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    }
+
+
+def _startup(repeats: int) -> dict:
+    commands = {
+        "cli": [sys.executable, "main.py"],
+        "cli-help": [sys.executable, "main.py", "analyze", "--help"],
+        "api-import": [sys.executable, "-c", "import api.api"],
+    }
+    timings = {}
+    for name, command in commands.items():
+        durations = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            subprocess.run(command, cwd=ROOT, capture_output=True)
+            durations.append(time.perf_counter() - start)
+        timings[name] = round(statistics.median(durations), 6)
+    return timings
+
+
+CASES = [
+    "scrape",
+    "analyze",
+    "analyze-aspects",
+    "summarize",
+    "api-scrape",
+    "api-analyze",
+    "api-analyze-aspects",
+    "api-summarize",
+]
+
+
+@app.command()
+def run(
+    sizes: Annotated[
+        Optional[List[int]],
+        typer.Option("--size", "-n", min=1, help="Number of reviews per run"),
+    ] = None,
+    cases: Annotated[
+        Optional[List[str]],
+        typer.Option("--case", "-c", help=f"Cases to run: {', '.join(CASES)}"),
+    ] = None,
+    repeats: Annotated[
+        int, typer.Option("--repeats", "-r", min=1, help="Timed runs per case")
+    ] = 5,
+    real_models: Annotated[
+        bool,
+        typer.Option(
+            "--real-models", help="Use the cached Hugging Face models instead of stubs"
+        ),
+    ] = False,
+    stub_latency: Annotated[
+        float,
+        typer.Option(help="Simulated seconds per stub forward pass"),
+    ] = 0.0,
+    output: Annotated[
+        Path, typer.Option("--output", "-o", dir_okay=False, help="JSON results file")
+    ] = Path("bench_results.json"),
+):
+    """
+    Run the benchmarks and write the results as JSON.
+    """
+    sizes = sizes or [10, 100, 1000]
+    cases = cases or CASES
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        raise typer.BadParameter(f"Unknown case(s): {', '.join(sorted(unknown))}")
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for case in cases:
+        for size in sizes:
+            # A fresh process per case keeps peak RSS and model loading independent.
+            with context.Pool(1) as pool:
+                try:
+                    measurement = pool.apply(
+                        _run_case, (case, size, repeats, real_models, stub_latency)
+                    )
+                except Exception as e:
+                    measurement = {"error": str(e)}
+            results.append({"case": case, "size": size, **measurement})
+            print(f"[bold blue]{case}[/bold blue] x {size}: {measurement}")
+
+    report = {
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "models": "real" if real_models else "stub",
+        "repeats": repeats,
+        "startup_seconds": _startup(repeats),
+        "results": results,
+    }
+    output.write_text(json.dumps(report, indent=2))
+
+    table = Table("case", "size", "reviews/s", "p50 s", "p95 s", "peak RSS MB")
+    for result in results:
+        table.add_row(
+            result["case"],
+            str(result["size"]),
+            *(
+                str(result.get(key, "error"))
+                for key in (
+                    "reviews_per_second",
+                    "p50_seconds",
+                    "p95_seconds",
+                    "peak_rss_mb",
+                )
+            ),
+        )
+    print(table)
+    print(f"Startup: {report['startup_seconds']}")
+    print(f"[bold green]Results written to [italic]{output}[/italic][/bold green]")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,108 @@
+import time
+import zlib
+from typing import List, Union
+from analyzing.aspect_based_sentiment_analyzer import AspectPairScorer
+from service.registry import ModelRegistry
+
+_POSITIVE_WORDS = {"good", "great", "excellent", "love", "comfortable", "perfect"}
+_NEGATIVE_WORDS = {"bad", "poor", "broken", "sticky", "terrible", "difficult"}
+
+
+def _score(text: str) -> dict:
+    words = text.casefold().split()
+    balance = sum(word in _POSITIVE_WORDS for word in words) - sum(
+        word in _NEGATIVE_WORDS for word in words
+    )
+    # A deterministic pseudo-confidence so that "most positive" picks are stable.
+    confidence = 0.5 + (zlib.crc32(text.encode("utf-8")) % 500) / 1000
+    return {"label": "POSITIVE" if balance >= 0 else "NEGATIVE", "score": confidence}
+
+
+class StubSentimentAnalyzer:
+    """
+    A model-free stand-in for `SentimentAnalyzer` with a configurable per-batch cost.
+    """
+
+    def __init__(self, batch_latency: float = 0.0, item_latency: float = 0.0):
+        self.model_name = "stub-sentiment"
+        self.backend = "stub"
+        self._batch_latency = batch_latency
+        self._item_latency = item_latency
+
+    def analyze_sentiments(
+        self, prompts: List[str], batch_size: int = 32, *args, **kwargs
+    ) -> List[dict]:
+        batches = -(-len(prompts) // batch_size)
+        time.sleep(batches * self._batch_latency + len(prompts) * self._item_latency)
+        return [_score(prompt) for prompt in prompts]
+
+
+class StubAspectBasedSentimentAnalyzer(AspectPairScorer):
+    """
+    A model-free stand-in for `AspectBasedSentimentAnalyzer` with a configurable per-batch cost.
+    """
+
+    def __init__(self, batch_latency: float = 0.0, item_latency: float = 0.0):
+        self.model_name = "stub-aspect"
+        self.backend = "stub"
+        self._batch_latency = batch_latency
+        self._item_latency = item_latency
+
+    def score_pairs(
+        self, pairs: List[tuple[str, str]], batch_size: int = 32, *args, **kwargs
+    ) -> List[dict]:
+        batches = -(-len(pairs) // batch_size)
+        time.sleep(batches * self._batch_latency + len(pairs) * self._item_latency)
+        results = []
+        for text, _ in pairs:
+            result = _score(text)
+            # The aspect model's labels are capitalized rather than upper case.
+            results.append(
+                {"label": result["label"].capitalize(), "score": result["score"]}
+            )
+        return results
+
+
+class StubSummarizer:
+    """
+    A model-free stand-in for `Summarizer` that returns the opening of its input.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.model_name = "stub-summarizer"
+        self.backend = "stub"
+        self._latency = latency
+
+    def summarize(self, prompt: Union[str, List[str]], *args, **kwargs) -> str:
+        return self.summarize_batch([prompt])[0]
+
+    def summarize_batch(
+        self, prompts: List[Union[str, List[str]]], *args, **kwargs
+    ) -> List[str]:
+        time.sleep(self._latency)
+        return [
+            ("\n".join(prompt) if isinstance(prompt, list) else prompt)[:200]
+            for prompt in prompts
+        ]
+
+
+def install_stubs(
+    registry: ModelRegistry, batch_latency: float = 0.0, item_latency: float = 0.0
+) -> None:
+    """
+    Replace the analyzers in a registry with stubs.
+
+    Args:
+        registry (ModelRegistry): The registry to modify.
+        batch_latency (float): Simulated seconds per forward pass. Defaults to 0.
+        item_latency (float): Simulated seconds per item. Defaults to 0.
+    """
+    registry.register(
+        "sentiment_analyzer",
+        lambda: StubSentimentAnalyzer(batch_latency, item_latency),
+    )
+    registry.register(
+        "aspect_based_sentiment_analyzer",
+        lambda: StubAspectBasedSentimentAnalyzer(batch_latency, item_latency),
+    )
+    registry.register("summarizer", lambda: StubSummarizer(batch_latency))
@@ -7,16 +7,34 @@ from service.service import (
     reviews_to_csv,
     summarize_reviews,
 )
-from utils.utils import get_analysis_stats
-from model.model import Order
+from service.batch import analyze_products
+from service.daemon import DaemonError, ReviewDaemon, request, start_daemon
+from service.pipeline import stream_analysis
+from service.registry import BACKEND_OVERRIDE, registry
+from utils.metrics import stage_summary, tokens_per_second
+from utils.utils import (
+    get_analysis_stats,
+    get_cache_stats,
+    get_dedup_stats,
+    get_stage_stats,
+    parse_synonyms,
+)
+from model.model import Backend, DaemonAction, Order
+import csv
+import os
 import typer
 from pathlib import Path
 from rich import print
+from rich.table import Table
 
 
 app = typer.Typer(pretty_exceptions_show_locals=False)
 
 
+def print_stage_stats() -> None:
+    print(get_stage_stats(stage_summary(), tokens_per_second()))
+
+
 @app.command("scrape")
 def scrape(
     url: Annotated[
@@ -44,6 +62,21 @@ def scrape(
             "--destination", "-d", dir_okay=False, help="Destination of the CSV file"
         ),
     ] = Path("reviews.csv"),
+    incremental: Annotated[
+        bool,
+        typer.Option(
+            "--incremental",
+            "-i",
+            help="Only scrape reviews newer than the locally stored ones",
+        ),
+    ] = False,
+    stats: Annotated[
+        bool,
+        typer.Option(
+            "--stats",
+            help="Print per-stage timings when done",
+        ),
+    ] = False,
 ):
     """
     Scrape reviews from a product URL and save them to a CSV file.
@@ -54,10 +87,12 @@ def scrape(
         f"[bold yellow]Scraping [italic][link={url}]reviews[/link][/italic][/bold yellow] :hourglass_not_done:"
     )
     with progress_bar("Scraping..."):
-        reviews_to_csv(url, count, sort, destination)
+        reviews_to_csv(url, count, sort, destination, incremental)
     print(
         f"[bold green]Reviews saved to [italic]{destination}[/italic]![/bold green] :white_heavy_check_mark:"
     )
+    if stats:
+        print_stage_stats()
 
 
 @app.command("analyze")
@@ -77,27 +112,129 @@ def analyze(
         Optional[List[str]],
         typer.Option("--aspect", "-a", help="List of aspects to analyze"),
     ] = None,
+    synonyms: Annotated[
+        Optional[List[str]],
+        typer.Option(
+            "--synonym",
+            "-s",
+            help="Alternative term for an aspect in the form aspect=term",
+        ),
+    ] = None,
+    batch_size: Annotated[
+        int,
+        typer.Option(
+            "--batch-size", "-b", min=1, help="Number of reviews per forward pass"
+        ),
+    ] = 32,
+    chunk_size: Annotated[
+        Optional[int],
+        typer.Option(
+            "--chunk-size",
+            min=1,
+            help="Process the source this many rows at a time to keep memory use flat",
+        ),
+    ] = None,
+    workers: Annotated[
+        int,
+        typer.Option(
+            "--workers",
+            "-w",
+            min=1,
+            help="Number of processes to shard the work across",
+        ),
+    ] = 1,
+    backend: Annotated[
+        Optional[Backend],
+        typer.Option(
+            "--backend",
+            case_sensitive=False,
+            help="Inference backend for the models",
+        ),
+    ] = None,
+    cascade: Annotated[
+        Optional[float],
+        typer.Option(
+            "--cascade",
+            min=0.5,
+            max=1.0,
+            help="Let a lexicon label the reviews it is at least this confident about, and only run the model on the rest (general analysis only)",
+        ),
+    ] = None,
+    stats: Annotated[
+        bool,
+        typer.Option(
+            "--stats",
+            help="Print per-stage timings when done (worker processes are not included)",
+        ),
+    ] = False,
 ):
     """
     Analyze sentiment from a CSV file.
     """
     if source.suffix != ".csv" or destination.suffix != ".csv":
         raise typer.BadParameter("Both `source` and `destination` must be CSV files.")
+    try:
+        synonyms = parse_synonyms(synonyms or [])
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+    if backend is not None:
+        os.environ[BACKEND_OVERRIDE] = backend.value
+    if cascade is not None:
+        os.environ["CASCADE_THRESHOLD"] = str(cascade)
 
     with progress_bar("Analyzing..."):
         if aspects is None:
             print(
                 "[bold yellow]No aspects provided. Performing general sentiment analysis.[/bold yellow] :hourglass_not_done:"
             )
-            result = general_sentiment_analysis(source, destination)
-            print(get_analysis_stats(*result))
         else:
             print(
                 f"[bold yellow]Analyzing sentiment for aspect(s): [italic]{', '.join(aspects)}[/italic][/bold yellow] :hourglass_not_done:"
             )
-            result = aspect_based_sentiment_analysis(source, destination, aspects)
+        # The daemon runs in a single process, and only if its settings match ours.
+        response = None
+        if workers == 1 and not stats:
+            try:
+                response = request(
+                    "analyze",
+                    {
+                        "source": str(source.resolve()),
+                        "destination": str(destination.resolve()),
+                        "aspects": aspects,
+                        "synonyms": synonyms,
+                        "batch_size": batch_size,
+                        "chunk_size": chunk_size,
+                    },
+                )
+            except DaemonError as e:
+                print(f"[bold red]{e}[/bold red]")
+                raise typer.Exit(1)
+
+        if aspects is None:
+            result = (
+                response["result"]
+                if response is not None
+                else general_sentiment_analysis(
+                    source, destination, batch_size, chunk_size, workers
+                )
+            )
+            print(get_analysis_stats(*result))
+        else:
+            result = (
+                response["result"]
+                if response is not None
+                else aspect_based_sentiment_analysis(
+                    source,
+                    destination,
+                    aspects,
+                    batch_size,
+                    synonyms,
+                    chunk_size,
+                    workers,
+                )
+            )
             for aspect, stats_dict in result.items():
-                stats = get_analysis_stats(
+                aspect_stats = get_analysis_stats(
                     **{
                         key: stats_dict[key]
                         for key in [
@@ -110,10 +247,255 @@ def analyze(
                     }
                 )
                 print(f"Aspect '{aspect}':")
-                print(stats)
+                print(aspect_stats)
+        if response is not None:
+            cache_stats, dedup_stats = response["cache"], response["dedup"]
+        else:
+            cache = registry.get("result_cache")
+            cache_stats = cache.stats() if cache is not None else None
+            deduplicator = registry.get("deduplicator")
+            dedup_stats = (
+                deduplicator.stats()
+                if deduplicator is not None and workers == 1
+                else None
+            )
+        if cache_stats is not None:
+            print(get_cache_stats(**cache_stats))
+        if dedup_stats is not None:
+            print(get_dedup_stats(**dedup_stats))
         print(
             f"[bold green]Analysis completed! Check out [italic]{destination}[/italic].[/bold green] :white_heavy_check_mark:"
         )
+    if stats:
+        print_stage_stats()
+
+
+@app.command("scrape-and-analyze")
+def scrape_and_analyze(
+    url: Annotated[
+        str,
+        typer.Argument(
+            help="The Walmart product URL to scrape reviews from",
+            metavar="URL",
+        ),
+    ],
+    destination: Annotated[
+        Path,
+        typer.Argument(
+            dir_okay=False,
+            help="Destination of the CSV file for analysis results",
+        ),
+    ],
+    count: Annotated[
+        int,
+        typer.Option(
+            "--count", "-c", min=1, max=1000, help="Number of reviews to scrape"
+        ),
+    ] = 100,
+    sort: Annotated[
+        Order,
+        typer.Option(
+            "--order", "-o", case_sensitive=False, help="Sorting method for the reviews"
+        ),
+    ] = Order.relevancy,
+    aspects: Annotated[
+        Optional[List[str]],
+        typer.Option("--aspect", "-a", help="List of aspects to analyze"),
+    ] = None,
+    synonyms: Annotated[
+        Optional[List[str]],
+        typer.Option(
+            "--synonym",
+            "-s",
+            help="Alternative term for an aspect in the form aspect=term",
+        ),
+    ] = None,
+    stats: Annotated[
+        bool,
+        typer.Option(
+            "--stats",
+            help="Print per-stage timings when done",
+        ),
+    ] = False,
+):
+    """
+    Scrape reviews and analyze them as they arrive, writing results to a CSV file as they finish.
+    """
+    if destination.suffix != ".csv":
+        raise typer.BadParameter("`destination` must be CSV file.")
+    try:
+        synonyms = parse_synonyms(synonyms or [])
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+
+    print(
+        f"[bold yellow]Scraping and analyzing [italic][link={url}]reviews[/link][/italic][/bold yellow] :hourglass_not_done:"
+    )
+    columns = (
+        ["review", "aspect", "label", "score"]
+        if aspects
+        else ["review", "label", "score"]
+    )
+    analyzed = 0
+    with progress_bar("Scraping and analyzing...") as progress, open(
+        destination, "w", newline=""
+    ) as file:
+        writer = csv.DictWriter(file, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        for result in stream_analysis(url, count, sort, aspects, synonyms):
+            rows = (
+                [{"review": result["review"], **detail} for detail in result["details"]]
+                if aspects
+                else [result]
+            )
+            writer.writerows(rows)
+            file.flush()
+            analyzed += 1
+            progress.update(
+                progress.task_ids[0], description=f"Analyzed {analyzed} reviews..."
+            )
+    print(
+        f"[bold green]Analysis completed! Check out [italic]{destination}[/italic].[/bold green] :white_heavy_check_mark:"
+    )
+    if stats:
+        print_stage_stats()
+
+
+@app.command("batch")
+def batch(
+    urls: Annotated[
+        Optional[List[str]],
+        typer.Argument(
+            help="The Walmart product URLs to scrape reviews from",
+            metavar="URL...",
+        ),
+    ] = None,
+    file: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--file",
+            "-f",
+            dir_okay=False,
+            exists=True,
+            help="Text file with one product URL per line",
+        ),
+    ] = None,
+    destination: Annotated[
+        Path,
+        typer.Option(
+            "--destination",
+            "-d",
+            dir_okay=False,
+            help="Destination of the CSV file for analysis results",
+        ),
+    ] = Path("batch.csv"),
+    comparison_destination: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--comparison",
+            dir_okay=False,
+            help="Destination of a CSV file for the comparison table",
+        ),
+    ] = None,
+    count: Annotated[
+        int,
+        typer.Option(
+            "--count",
+            "-c",
+            min=1,
+            max=1000,
+            help="Number of reviews to scrape per product",
+        ),
+    ] = 100,
+    sort: Annotated[
+        Order,
+        typer.Option(
+            "--order", "-o", case_sensitive=False, help="Sorting method for the reviews"
+        ),
+    ] = Order.relevancy,
+    aspects: Annotated[
+        Optional[List[str]],
+        typer.Option("--aspect", "-a", help="List of aspects to analyze"),
+    ] = None,
+    synonyms: Annotated[
+        Optional[List[str]],
+        typer.Option(
+            "--synonym",
+            "-s",
+            help="Alternative term for an aspect in the form aspect=term",
+        ),
+    ] = None,
+    concurrency: Annotated[
+        int,
+        typer.Option(
+            "--concurrency", min=1, max=16, help="Number of products scraped at once"
+        ),
+    ] = 4,
+    stats: Annotated[
+        bool,
+        typer.Option("--stats", help="Print per-stage timings when done"),
+    ] = False,
+):
+    """
+    Scrape and analyze several products at once and compare them.
+    """
+    urls = list(urls or [])
+    if file is not None:
+        urls += [line.strip() for line in file.read_text().splitlines() if line.strip()]
+    if not urls:
+        raise typer.BadParameter("Provide at least one URL or a --file of URLs.")
+    if destination.suffix != ".csv" or (
+        comparison_destination is not None and comparison_destination.suffix != ".csv"
+    ):
+        raise typer.BadParameter("Destinations must be CSV files.")
+    try:
+        synonyms = parse_synonyms(synonyms or [])
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+
+    import pandas as pd
+
+    print(
+        f"[bold yellow]Scraping and analyzing {len(urls)} product URL(s)[/bold yellow] :hourglass_not_done:"
+    )
+    with progress_bar("Scraping and analyzing..."):
+        try:
+            results, comparison = analyze_products(
+                urls, count, sort, aspects, synonyms, concurrency=concurrency
+            )
+        except ValueError as e:
+            raise typer.BadParameter(str(e))
+
+    results_df = pd.concat(
+        [
+            product["results"].assign(product_id=product_id)
+            for product_id, product in results.items()
+        ],
+        ignore_index=True,
+    )
+    columns = ["product_id", "review"] + (
+        ["aspect", "label", "score"] if aspects else ["label", "score"]
+    )
+    results_df[columns].to_csv(destination, index=False)
+    if comparison_destination is not None:
+        comparison.to_csv(comparison_destination, index=False)
+
+    for product_id, product in results.items():
+        if product["error"]:
+            print(
+                f"[bold red]Product {product_id} failed:[/bold red] {product['error']}"
+            )
+    table = Table(title="Comparison")
+    for column in comparison.columns:
+        table.add_column(str(column))
+    for row in comparison.itertuples(index=False):
+        table.add_row(*["" if pd.isna(value) else str(value) for value in row])
+    print(table)
+    print(
+        f"[bold green]Analysis completed! Check out [italic]{destination}[/italic].[/bold green] :white_heavy_check_mark:"
+    )
+    if stats:
+        print_stage_stats()
 
 
 @app.command("summarize")
@@ -122,19 +504,178 @@ def summarize(
         Path,
         typer.Argument(dir_okay=False, help="Source of the CSV file"),
     ],
+    workers: Annotated[
+        int,
+        typer.Option(
+            "--workers",
+            "-w",
+            min=1,
+            help="Number of processes to shard the work across",
+        ),
+    ] = 1,
+    backend: Annotated[
+        Optional[Backend],
+        typer.Option(
+            "--backend",
+            case_sensitive=False,
+            help="Inference backend for the models",
+        ),
+    ] = None,
+    budget: Annotated[
+        Optional[int],
+        typer.Option(
+            "--budget",
+            min=64,
+            help="Only summarize a representative subset of the review sentences of at most this many tokens",
+        ),
+    ] = None,
+    stats: Annotated[
+        bool,
+        typer.Option(
+            "--stats",
+            help="Print per-stage timings when done (worker processes are not included)",
+        ),
+    ] = False,
 ):
     """
     Summarize reviews from a CSV file.
     """
     if source.suffix != ".csv":
         raise typer.BadParameter("The source file must be a CSV file.")
+    if backend is not None:
+        os.environ[BACKEND_OVERRIDE] = backend.value
     print(
         f"[bold yellow]Summarizing the reviews from [italic]{source}[/italic][/bold yellow] :hourglass_not_done:"
     )
     with progress_bar("Summarizing..."):
-        summary = summarize_reviews(source)
+        response = None
+        if workers == 1 and not stats:
+            try:
+                response = request(
+                    "summarize", {"source": str(source.resolve()), "budget": budget}
+                )
+            except DaemonError as e:
+                print(f"[bold red]{e}[/bold red]")
+                raise typer.Exit(1)
+        summary = (
+            response["result"]
+            if response is not None
+            else summarize_reviews(source, workers, budget)
+        )
     print(f"[bold green]Summary completed![/bold green] :white_heavy_check_mark:")
     print(f"[dark_orange]{summary}[/dark_orange]")
+    if stats:
+        print_stage_stats()
+
+
+@app.command("parity")
+def parity(
+    source: Annotated[
+        Path,
+        typer.Argument(dir_okay=False, exists=True, help="Source of the CSV file"),
+    ],
+    backend: Annotated[
+        Backend,
+        typer.Option(
+            "--backend", case_sensitive=False, help="Inference backend to check"
+        ),
+    ],
+    aspects: Annotated[
+        Optional[List[str]],
+        typer.Option("--aspect", "-a", help="List of aspects to check"),
+    ] = None,
+    sample: Annotated[
+        int,
+        typer.Option("--sample", min=1, help="Number of reviews to compare on"),
+    ] = 200,
+):
+    """
+    Report how far a backend's labels and scores drift from eager torch.
+    """
+    import pandas as pd
+    from analyzing.parity import parity_report
+
+    if source.suffix != ".csv":
+        raise typer.BadParameter("The source file must be a CSV file.")
+    reviews = pd.read_csv(source, nrows=sample)["review"].tolist()
+    with progress_bar("Comparing..."):
+        report = parity_report(reviews, backend.value, aspects)
+    print(
+        f"[bold blue]Compared results:[/bold blue] {report['count']}\n"
+        f"[bold blue]Label agreement:[/bold blue] {report['label_agreement']:.2%}\n"
+        f"[bold blue]Mean score drift:[/bold blue] {report['mean_score_drift']:.5f}\n"
+        f"[bold blue]Max score drift:[/bold blue] {report['max_score_drift']:.5f}"
+    )
+
+
+@app.command("daemon")
+def daemon(
+    action: Annotated[
+        DaemonAction,
+        typer.Argument(case_sensitive=False, help="What to do with the daemon"),
+    ],
+    idle_timeout: Annotated[
+        Optional[float],
+        typer.Option(
+            "--idle-timeout",
+            min=0,
+            help="Seconds without a command after which the daemon exits, 0 to never exit",
+        ),
+    ] = None,
+    foreground: Annotated[
+        bool,
+        typer.Option("--foreground", help="Run the daemon in this process"),
+    ] = False,
+):
+    """
+    Start, stop or check a background daemon that keeps the models loaded for analyze and summarize.
+    """
+    try:
+        status = request("status", timeout=5)
+        if action == DaemonAction.status:
+            if status is None:
+                print("[bold yellow]The daemon is not running.[/bold yellow]")
+                return
+            timeout = (
+                f"{status['idle_timeout']:g}s" if status["idle_timeout"] else "never"
+            )
+            print(
+                f"[bold blue]PID:[/bold blue] {status['pid']}\n"
+                f"[bold blue]Socket:[/bold blue] {status['socket']}\n"
+                f"[bold blue]Uptime:[/bold blue] {status['uptime']:.0f}s\n"
+                f"[bold blue]Idle:[/bold blue] {status['idle']:.0f}s"
+                f" (exits when idle for {timeout})\n"
+                f"[bold blue]Commands run:[/bold blue] {status['requests']}\n"
+                f"[bold blue]Models loaded:[/bold blue] {', '.join(status['models'])}"
+            )
+        elif action == DaemonAction.stop:
+            if status is None:
+                print("[bold yellow]The daemon is not running.[/bold yellow]")
+                return
+            request("stop", timeout=5)
+            print(
+                f"[bold green]Daemon {status['pid']} stopped.[/bold green] :white_heavy_check_mark:"
+            )
+        elif status is not None:
+            print(
+                f"[bold yellow]The daemon is already running (PID {status['pid']}).[/bold yellow]"
+            )
+        elif foreground:
+            daemon = (
+                ReviewDaemon(idle_timeout=idle_timeout or None)
+                if idle_timeout is not None
+                else ReviewDaemon.from_env()
+            )
+            daemon.serve()
+        else:
+            with progress_bar("Loading models..."):
+                status = start_daemon(idle_timeout)
+            print(
+                f"[bold green]Daemon {status['pid']} listening on [italic]{status['socket']}[/italic]![/bold green] :white_heavy_check_mark:"
+            )
+    except DaemonError as e:
+        print(f"[bold red]{e}[/bold red]")
+        raise typer.Exit(1)
 
 
 @app.callback()
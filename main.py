@@ -1,20 +1,61 @@
+import atexit
+import os
+import shutil
 import sys
-import uvicorn
+import tempfile
+from pathlib import Path
 from rich import print
 
-from cli.cli import app as cli_app
-from api.api import app as api_app
+
+def _share_metrics() -> None:
+    # Preforked API workers write their metrics to files in a shared directory.
+    # prometheus_client picks where samples go when it is imported, so this must run
+    # before anything imports `utils.metrics`.
+    directory = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if directory is None:
+        directory = tempfile.mkdtemp(prefix="review-analyzer-metrics-")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = directory
+        atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    # Samples left behind by an earlier run would be added to this run's.
+    for path in Path(directory).glob("*.db"):
+        path.unlink()
+
+
+def _run_api(argv: list) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="main.py api")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of preforked worker processes sharing the warmed-up models. "
+        "Metrics and cache counters are added up across them.",
+    )
+    args = parser.parse_args(argv)
+    if args.workers > 1:
+        _share_metrics()
+
+    from api.server import serve
+
+    serve(args.host, args.port, args.workers)
 
 
 def main():
+    if sys.argv[1:2] == ["api"]:
+        _run_api(sys.argv[2:])
+        return
+
+    from cli.cli import app as cli_app
+
     commands = [command.name for command in cli_app.registered_commands]
 
     info = f"Please specify [bold yellow]{', '.join(commands)}[/bold yellow] to launch the CLI or [bold yellow]api[/bold yellow] to launch the API."
     if len(sys.argv) > 1:
         if sys.argv[1] in commands:
             cli_app()
-        elif sys.argv[1] == "api":
-            uvicorn.run(api_app, host="127.0.0.1", port=8000)
         else:
             print(f"[bold red]Invalid argument.[/bold red] {info}")
     else:
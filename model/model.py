@@ -1,4 +1,6 @@
+from dataclasses import dataclass
 from enum import Enum
+from typing import Optional
 
 
 class Order(str, Enum):
@@ -7,3 +9,41 @@ class Order(str, Enum):
     helpful = "helpful"
     rating_desc = "rating-desc"
     rating_asc = "rating-asc"
+
+
+class Backend(str, Enum):
+    torch = "torch"
+    quantized = "quantized"
+    onnx = "onnx"
+
+
+class DaemonAction(str, Enum):
+    start = "start"
+    stop = "stop"
+    status = "status"
+
+
+class JobKind(str, Enum):
+    scrape = "scrape"
+    analyze = "analyze"
+    summarize = "summarize"
+
+
+class JobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+    cancelled = "cancelled"
+
+
+@dataclass(frozen=True)
+class Review:
+    """
+    A single scraped review.
+    """
+
+    id: str
+    text: str
+    rating: Optional[float] = None
+    submitted_at: Optional[str] = None
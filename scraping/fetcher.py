@@ -0,0 +1,156 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, Iterator, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from utils.deadline import wait
+from utils.metrics import timed
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """
+    A thread-safe limiter that spaces requests to at most `rate` per second.
+    """
+
+    def __init__(self, rate: Optional[float] = None):
+        """
+        Args:
+            rate (Optional[float]): Maximum number of requests per second. Unlimited if None.
+        """
+        self._interval = 1 / rate if rate else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Block until another request may be sent.
+        """
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self._interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+class PageFetcher:
+    """
+    A shared fetch layer for the scrapers: pooled keep-alive connections, a bounded
+    pool of worker threads, rate limiting, and retries with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        rate_limit: Optional[float] = None,
+        timeout: float = 30,
+    ):
+        """
+        Args:
+            max_workers (int): Maximum number of requests in flight. Defaults to 4.
+            max_retries (int): Number of retries after a failed request. Defaults to 3.
+            backoff (float): Delay before the first retry in seconds, doubled on every further retry. Defaults to 0.5.
+            rate_limit (Optional[float]): Maximum number of requests per second. Unlimited if None.
+            timeout (float): Timeout of a single request in seconds. Defaults to 30.
+        """
+        self._max_workers = max_workers
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._timeout = timeout
+        self._rate_limiter = RateLimiter(rate_limit)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def get(self, url: str, params: Optional[dict] = None) -> dict:
+        """
+        Fetch a JSON document, retrying connection errors, timeouts, 429 and 5xx responses.
+
+        Args:
+            url (str): The URL to fetch.
+            params (Optional[dict]): Query parameters.
+
+        Returns:
+            dict: The decoded JSON response.
+
+        Raises:
+            requests.RequestException: If the request still fails after all retries.
+        """
+        for attempt in range(self._max_retries + 1):
+            self._rate_limiter.acquire()
+            retry_after = None
+            try:
+                with timed("scrape.request"):
+                    response = self._session.get(
+                        url, params=params, timeout=self._timeout
+                    )
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response.json()
+                if attempt == self._max_retries:
+                    response.raise_for_status()
+                retry_after = response.headers.get("Retry-After")
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self._max_retries:
+                    raise
+
+            delay = self._backoff * 2**attempt * (1 + random.random() / 2)
+            if retry_after is not None and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            time.sleep(delay)
+
+    def submit(self, url: str, params: Optional[dict] = None) -> Future:
+        """
+        Fetch a JSON document in the background, see `get`.
+
+        Returns:
+            Future: A future that resolves to the decoded JSON response.
+        """
+        return self._executor.submit(self.get, url, params)
+
+    def get_many(
+        self, url: str, params: Iterable[dict], prefetch: Optional[int] = None
+    ) -> Iterator[dict]:
+        """
+        Fetch many pages of the same URL concurrently, yielding them in order.
+
+        Up to `prefetch` pages are kept in flight ahead of the consumer. Pages that
+        have not started when the consumer stops iterating, or when the current
+        deadline (see `utils.deadline`) expires, are cancelled.
+
+        Args:
+            url (str): The URL to fetch.
+            params (Iterable[dict]): Query parameters of every page, in order.
+            prefetch (Optional[int]): Number of pages fetched ahead. Defaults to `max_workers`.
+
+        Yields:
+            dict: The decoded JSON response of every page.
+        """
+        prefetch = prefetch or self._max_workers
+        pending = deque()
+        params = iter(params)
+        try:
+            for page_params in params:
+                pending.append(self.submit(url, page_params))
+                if len(pending) >= prefetch:
+                    break
+            while pending:
+                result = wait(pending.popleft())
+                next_params = next(params, None)
+                if next_params is not None:
+                    pending.append(self.submit(url, next_params))
+                yield result
+        finally:
+            for future in pending:
+                future.cancel()
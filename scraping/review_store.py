@@ -0,0 +1,131 @@
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional, Set
+from dotenv import load_dotenv
+from model.model import Review
+from scraping.scraper import normalize_timestamp
+
+DEFAULT_STORE_PATH = Path.home() / ".cache" / "review-analyzer" / "reviews.sqlite"
+
+
+class ReviewStore:
+    """
+    A local SQLite store of scraped reviews, keyed by product id and review id.
+    """
+
+    def __init__(self, path: Path = DEFAULT_STORE_PATH):
+        """
+        Args:
+            path (Path): Location of the SQLite file.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS reviews ("
+            "product_id TEXT NOT NULL, review_id TEXT NOT NULL, text TEXT NOT NULL, "
+            "rating REAL, submitted_at TEXT, scraped_at REAL NOT NULL, "
+            "PRIMARY KEY (product_id, review_id))"
+        )
+        # Dates used to be stored as the provider returned them (e.g. "9/1/2023"),
+        # which does not sort chronologically.
+        rows = self._connection.execute(
+            "SELECT DISTINCT submitted_at FROM reviews WHERE submitted_at LIKE '%/%'"
+        ).fetchall()
+        self._connection.executemany(
+            "UPDATE reviews SET submitted_at = ? WHERE submitted_at = ?",
+            [(normalize_timestamp(value), value) for (value,) in rows],
+        )
+        self._connection.commit()
+
+    @classmethod
+    def from_env(cls) -> "ReviewStore":
+        """
+        Build a store at REVIEW_STORE_PATH, or at the default location if it is not set.
+
+        Returns:
+            ReviewStore: The review store.
+        """
+        load_dotenv()
+        return cls(Path(os.getenv("REVIEW_STORE_PATH", str(DEFAULT_STORE_PATH))))
+
+    def known_ids(self, product_id: str) -> Set[str]:
+        """
+        Args:
+            product_id (str): The product id.
+
+        Returns:
+            Set[str]: Ids of the stored reviews of the product.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT review_id FROM reviews WHERE product_id = ?", (product_id,)
+            ).fetchall()
+        return {review_id for (review_id,) in rows}
+
+    def add(self, product_id: str, reviews: Iterable[Review]) -> int:
+        """
+        Store reviews of a product, updating reviews that are already stored.
+
+        Args:
+            product_id (str): The product id.
+            reviews (Iterable[Review]): The reviews to store.
+
+        Returns:
+            int: Number of reviews that were not stored before.
+        """
+        now = time.time()
+        rows = [
+            (
+                product_id,
+                review.id,
+                review.text,
+                review.rating,
+                normalize_timestamp(review.submitted_at),
+                now,
+            )
+            for review in reviews
+        ]
+        with self._lock:
+            (before,) = self._connection.execute(
+                "SELECT COUNT(*) FROM reviews WHERE product_id = ?", (product_id,)
+            ).fetchone()
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO reviews "
+                "(product_id, review_id, text, rating, submitted_at, scraped_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            (after,) = self._connection.execute(
+                "SELECT COUNT(*) FROM reviews WHERE product_id = ?", (product_id,)
+            ).fetchone()
+            self._connection.commit()
+        return after - before
+
+    def reviews(self, product_id: str, limit: Optional[int] = None) -> List[Review]:
+        """
+        Get the stored reviews of a product, newest first by submission date (ISO-8601).
+
+        Args:
+            product_id (str): The product id.
+            limit (Optional[int]): Maximum number of reviews to return. All if None.
+
+        Returns:
+            List[Review]: The stored reviews.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT review_id, text, rating, submitted_at FROM reviews "
+                "WHERE product_id = ? ORDER BY submitted_at DESC, scraped_at DESC "
+                "LIMIT ?",
+                (product_id, -1 if limit is None else limit),
+            ).fetchall()
+        return [
+            Review(id=review_id, text=text, rating=rating, submitted_at=submitted_at)
+            for review_id, text, rating, submitted_at in rows
+        ]
@@ -1,5 +1,7 @@
+import hashlib
+from datetime import datetime
 from abc import ABC, abstractmethod
-from typing import Generator
+from typing import Generator, Optional
 
 
 class Scraper(ABC):
@@ -9,7 +11,11 @@ class Scraper(ABC):
 
     @abstractmethod
     def extract_reviews(
-        self, url: str, count: int = 100, sort: str = "relevancy"
+        self,
+        url: str,
+        count: int = 100,
+        sort: str = "relevancy",
+        prefetch: bool = True,
     ) -> Generator:
         """
         Extract reviews from a given product URL.
@@ -18,8 +24,53 @@ class Scraper(ABC):
             url (str): The product URL to scrape reviews from.
             count (int): Number of reviews to extract. Default is 100.
             sort (str): Sorting method for the reviews. Default is "relevancy".
+            prefetch (bool): Whether to fetch later pages ahead of consumption. Turn it off
+                when the caller is likely to stop early, so that no page request is wasted. Default is True.
 
         Yields:
-            str: The review content.
+            Review: The review id, text, rating and submission date.
         """
         pass
+
+
+def fallback_review_id(*parts: Optional[str]) -> str:
+    """
+    Derive a stable review id for providers that do not return one.
+
+    Args:
+        *parts (Optional[str]): Fields that together identify the review, e.g. author, date and text.
+
+    Returns:
+        str: A hex digest of the fields.
+    """
+    payload = "\x1f".join("" if part is None else str(part) for part in parts)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+# Date formats used by the review providers, e.g. SerpApi's "9/1/2023".
+_TIMESTAMP_FORMATS = ("%m/%d/%Y", "%m/%d/%Y %H:%M:%S", "%b %d, %Y", "%B %d, %Y")
+
+
+def normalize_timestamp(value: Optional[str]) -> Optional[str]:
+    """
+    Convert a provider's review date to ISO-8601, so that dates sort chronologically as text.
+
+    Args:
+        value (Optional[str]): The date as returned by the provider.
+
+    Returns:
+        Optional[str]: The date in ISO-8601, or `value` unchanged if its format is not known.
+    """
+    if not value:
+        return value
+    value = value.strip()
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).isoformat()
+    except ValueError:
+        pass
+    for timestamp_format in _TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(value, timestamp_format).isoformat()
+        except ValueError:
+            continue
+    return value
@@ -1,9 +1,10 @@
-from rich import print
-from serpapi import Client
+import math
 import os
-from typing import Generator
+from typing import Generator, Iterator, Optional
 from dotenv import load_dotenv
-from scraping.scraper import Scraper
+from scraping.fetcher import PageFetcher
+from model.model import Review
+from scraping.scraper import Scraper, fallback_review_id, normalize_timestamp
 from utils.utils import extract_walmart_product_id
 
 
@@ -12,17 +13,35 @@ class SerpapiScraper(Scraper):
     A class to scrape product reviews from Walmart using the SerpApi API.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        base_url: str = "https://serpapi.com/search.json",
+        fetcher: Optional[PageFetcher] = None,
+    ):
+        """
+        Args:
+            base_url (str): The SerpApi search endpoint. Can point at a local stand-in for testing.
+            fetcher (Optional[PageFetcher]): The fetch layer to use. Defaults to one allowing 4 concurrent requests.
+        """
         load_dotenv()
         self._api_key = os.getenv("SERPAPI_API_KEY")
-        self._client = Client(api_key=self._api_key)
+        self._base_url = base_url
+        self._fetcher = fetcher or PageFetcher(max_workers=4, rate_limit=10)
 
     def extract_reviews(
-        self, url: str, count: int = 100, sort: str = "relevancy"
+        self,
+        url: str,
+        count: int = 100,
+        sort: str = "relevancy",
+        prefetch: bool = True,
     ) -> Generator:
         """
         Implementation specific to Walmart products using the SerpApi API.
         See base class for full documentation.
+
+        The first page is fetched on its own to learn the page size, after which the
+        remaining pages are fetched concurrently, ahead of consumption. Without
+        `prefetch`, every next page is only fetched once the previous one is consumed.
         """
 
         product_id = extract_walmart_product_id(url)
@@ -33,21 +52,74 @@ class SerpapiScraper(Scraper):
             "sort": sort,
         }
 
-        search = self._client.search(params)
-        response = search.as_dict()
-        reviews = response["reviews"]
+        response = self._fetcher.get(self._base_url, {**params, "page": 1})
+        if "error" in response:
+            raise ValueError(response["error"])
+        reviews = response.get("reviews", [])
+
+        for review in reviews[:count]:
+            yield self._to_review(review)
+        count -= len(reviews)
+        if count <= 0 or not response.get("serpapi_pagination", {}).get("next"):
+            return
 
-        for review in reviews:
-            yield review["text"]
-            count -= 1
-            if count == 0:
+        if reviews and prefetch:
+            # Pages past the product's last review are billed too, so the plan is
+            # capped by its review count when the response has it.
+            total = self._total_reviews(response)
+            wanted = count if total is None else min(count, total - len(reviews))
+            if wanted <= 0:
                 return
+            last_page = 1 + math.ceil(wanted / len(reviews))
+            pages = self._fetcher.get_many(
+                self._base_url,
+                ({**params, "page": page} for page in range(2, last_page + 1)),
+            )
+        else:
+            # Without prefetching, or when an empty first page says nothing about the
+            # page size, the next pages are followed one at a time.
+            pages = self._next_pages(params)
+        for response in pages:
+            if "error" in response:
+                raise ValueError(response["error"])
+            reviews = response.get("reviews", [])
+            for review in reviews[:count]:
+                yield self._to_review(review)
+            count -= len(reviews)
+            if (
+                count <= 0
+                or not reviews
+                or not response.get("serpapi_pagination", {}).get("next")
+            ):
+                return
+
+    def _next_pages(self, params: dict) -> Iterator[dict]:
+        page = 2
+        while True:
+            yield self._fetcher.get(self._base_url, {**params, "page": page})
+            page += 1
+
+    @staticmethod
+    def _total_reviews(response: dict) -> Optional[int]:
+        total = response.get("product_results", {}).get("reviews")
+        if isinstance(total, int):
+            return total
+        ratings = response.get("reviews_results", {}).get("ratings")
+        if ratings:
+            return sum(rating.get("count", 0) for rating in ratings)
+        return None
 
-        next_page = search.next_page()
-        while next_page and count > 0:
-            response = next_page.as_dict()
-            reviews = response["reviews"]
-            for review in reviews:
-                yield review["text"]
-                count -= 1
-            next_page = next_page.next_page()
+    @staticmethod
+    def _to_review(review: dict) -> Review:
+        submitted_at = review.get("review_submission_time")
+        return Review(
+            id=str(
+                review.get("review_id")
+                or fallback_review_id(
+                    review.get("user_nickname"), submitted_at, review["text"]
+                )
+            ),
+            text=review["text"],
+            rating=review.get("rating"),
+            submitted_at=normalize_timestamp(submitted_at),
+        )
@@ -1,8 +1,10 @@
 import os
-import requests
-from typing import Generator
+from typing import Generator, Optional
 from dotenv import load_dotenv
-from scraping.scraper import Scraper
+from scraping.fetcher import PageFetcher
+from model.model import Review
+from scraping.scraper import Scraper, fallback_review_id, normalize_timestamp
+from utils.deadline import wait
 from utils.utils import extract_walmart_product_id
 
 
@@ -11,18 +13,34 @@ class ZenrowsScraper(Scraper):
     A class to scrape product reviews from Walmart using the ZenRows API.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        base_url: str = "https://ecommerce.api.zenrows.com/v1/targets/walmart/reviews/",
+        fetcher: Optional[PageFetcher] = None,
+    ):
+        """
+        Args:
+            base_url (str): The ZenRows reviews endpoint. Can point at a local stand-in for testing.
+            fetcher (Optional[PageFetcher]): The fetch layer to use. Defaults to one allowing 2 concurrent requests.
+        """
         load_dotenv()
         self._api_key = os.getenv("ZENROWS_API_KEY")
-        self._base_url = "https://ecommerce.api.zenrows.com/v1/targets/walmart/reviews/"
-        self._session = requests.Session()
+        self._base_url = base_url
+        self._fetcher = fetcher or PageFetcher(max_workers=2, rate_limit=5)
 
     def extract_reviews(
-        self, url: str, count: int = 100, sort: str = "relevancy"
+        self,
+        url: str,
+        count: int = 100,
+        sort: str = "relevancy",
+        prefetch: bool = True,
     ) -> Generator:
         """
         Implementation specific to Walmart products using the ZenRows API.
         See base class for full documentation.
+
+        With `prefetch`, each next page is requested in the background while the current
+        one is consumed.
         """
 
         params = {
@@ -30,21 +48,40 @@ class ZenrowsScraper(Scraper):
             "sort": sort,
         }
         product_id = extract_walmart_product_id(url)
-        response = self._session.get(
-            f"{self._base_url}{product_id}", params=params
-        ).json()
+        response = self._fetcher.get(f"{self._base_url}{product_id}", params)
         review_count = min(count, response["review_count"])
-        for review in response["product_reviews_list"]:
-            yield review["review_content"]
-            review_count -= 1
-            if review_count == 0:
-                return
 
-        next_page = response["pagination"].get("next_page")
-        while next_page and review_count > 0:
-            params["url"] = next_page
-            response = self._session.get(self._base_url, params=params).json()
-            for review in response["product_reviews_list"]:
-                yield review["review_content"]
-                review_count -= 1
+        while True:
             next_page = response["pagination"].get("next_page")
+            reviews = response["product_reviews_list"][:review_count]
+            review_count -= len(reviews)
+            has_next = bool(next_page) and review_count > 0
+            next_response = (
+                self._fetcher.submit(self._base_url, {**params, "url": next_page})
+                if has_next and prefetch
+                else None
+            )
+            for review in reviews:
+                yield self._to_review(review)
+            if not has_next:
+                return
+            if next_response is None:
+                next_response = self._fetcher.submit(
+                    self._base_url, {**params, "url": next_page}
+                )
+            response = wait(next_response)
+
+    @staticmethod
+    def _to_review(review: dict) -> Review:
+        submitted_at = review.get("review_date") or review.get("review_submission_time")
+        return Review(
+            id=str(
+                review.get("review_id")
+                or fallback_review_id(
+                    review.get("reviewer_name"), submitted_at, review["review_content"]
+                )
+            ),
+            text=review["review_content"],
+            rating=review.get("rating"),
+            submitted_at=normalize_timestamp(submitted_at),
+        )
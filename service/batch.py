@@ -0,0 +1,257 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+from analyzing.aspect_index import AspectIndex
+from service.pipeline import DONE, next_batch, put
+from service.registry import registry
+from service.stats import AspectSentimentStats, SentimentStats
+from utils.deadline import check_deadline
+from utils.metrics import QUEUE_DEPTH, timed
+from utils.utils import extract_walmart_product_id
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def unique_products(urls: Iterable[str]) -> Dict[str, str]:
+    """
+    Deduplicate product URLs by their Walmart product id.
+
+    Args:
+        urls (Iterable[str]): Product URLs, possibly several per product.
+
+    Returns:
+        Dict[str, str]: The first URL of every product by product id, in input order.
+
+    Raises:
+        ValueError: If a URL contains no product id.
+    """
+    products = {}
+    for url in urls:
+        try:
+            product_id = extract_walmart_product_id(url)
+        except AttributeError:
+            raise ValueError(f"No Walmart product id in '{url}'.")
+        products.setdefault(product_id, url)
+    return products
+
+
+def _produce(
+    product_id: str,
+    url: str,
+    count: int,
+    sort: str,
+    reviews: queue.Queue,
+    stop: threading.Event,
+) -> None:
+    scraped = []
+    try:
+        with timed("scrape"):
+            for review in registry.get("scraper").extract_reviews(url, count, sort):
+                scraped.append(review)
+                if not put(reviews, (product_id, review), stop):
+                    return
+        registry.get("review_store").add(product_id, scraped)
+        put(reviews, (product_id, DONE), stop)
+    except Exception as e:
+        put(reviews, (product_id, e), stop)
+
+
+def analyze_products(
+    urls: Iterable[str],
+    count: int = 100,
+    sort: str = "relevancy",
+    aspects: Optional[List[str]] = None,
+    synonyms: Optional[Dict[str, List[str]]] = None,
+    batch_size: int = 32,
+    concurrency: int = 4,
+    max_wait: float = 0.5,
+    queue_size: int = 1024,
+) -> tuple[Dict[str, dict], "pd.DataFrame"]:
+    """
+    Scrape and analyze many products at once.
+
+    Products are scraped concurrently, at most `concurrency` at a time and admitted in
+    input order, so the scraper's provider never serves more than that many products and
+    every product gets its turn. Reviews of all products go into one queue and are
+    analyzed together in shared batches as they arrive, overlapping scraping with
+    inference. A product whose scrape fails is reported with its error and does not
+    affect the others.
+
+    Args:
+        urls (Iterable[str]): Product URLs. URLs of the same product are only scraped once.
+        count (int): Number of reviews to scrape per product. Defaults to 100.
+        sort (str): Sorting method for reviews. Defaults to "relevancy".
+        aspects (Optional[List[str]]): Aspects to analyze. Performs general sentiment analysis if not provided.
+        synonyms (Optional[Dict[str, List[str]]]): Alternative terms that also count as a mention of an aspect.
+        batch_size (int): Maximum number of reviews per batch. Defaults to 32.
+        concurrency (int): Maximum number of products scraped at the same time. Defaults to 4.
+        max_wait (float): Seconds a batch waits for more reviews. Defaults to 0.5.
+        queue_size (int): Maximum number of scraped reviews waiting for analysis. Defaults to 1024.
+
+    Returns:
+        tuple[Dict[str, dict], pd.DataFrame]: A tuple containing:
+            - For every product id, in input order, its "url", its "reviews" (DataFrame
+              with "review" and "review_id" columns), its "results" (as returned by
+              `analyze_general_sentiment` or, indexed by the row of "reviews",
+              `analyze_aspect_based_sentiment`), its "stats" and its "error", if any
+            - The comparison table, see `comparison_table`
+
+    Raises:
+        ValueError: If a URL contains no product id.
+    """
+    import pandas as pd
+
+    products = unique_products(urls)
+    index = AspectIndex(aspects, synonyms) if aspects else None
+    analyzer = registry.get(
+        "aspect_based_sentiment_analyzer" if aspects else "sentiment_analyzer"
+    )
+
+    scraped: Dict[str, list] = {product_id: [] for product_id in products}
+    rows: Dict[str, list] = {product_id: [] for product_id in products}
+    errors: Dict[str, str] = {}
+
+    reviews: queue.Queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+    for product_id, url in products.items():
+        executor.submit(_produce, product_id, url, count, sort, reviews, stop)
+
+    try:
+        remaining = len(products)
+        while remaining:
+            check_deadline()
+            with timed("stream.wait"):
+                batch = next_batch(reviews, batch_size, max_wait)
+            QUEUE_DEPTH.labels("batch").set(reviews.qsize())
+
+            pending = []
+            for product_id, item in batch:
+                if item is DONE:
+                    remaining -= 1
+                elif isinstance(item, Exception):
+                    errors[product_id] = str(item)
+                    remaining -= 1
+                else:
+                    # Position of the review within its product.
+                    pending.append((product_id, len(scraped[product_id])))
+                    scraped[product_id].append(item)
+            if not pending:
+                continue
+            texts = [scraped[product_id][row].text for product_id, row in pending]
+
+            if index is None:
+                sentiments = analyzer.analyze_sentiments(texts, batch_size=batch_size)
+                for (product_id, row), sentiment in zip(pending, sentiments):
+                    rows[product_id].append(
+                        (row, None, sentiment["label"], sentiment["score"])
+                    )
+            else:
+                for position, aspect, sentiment in analyzer.analyze_sentiments(
+                    texts, index, batch_size=batch_size
+                ):
+                    product_id, row = pending[position]
+                    rows[product_id].append(
+                        (row, aspect, sentiment["label"].upper(), sentiment["score"])
+                    )
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    results = {}
+    for product_id, url in products.items():
+        reviews_df = pd.DataFrame(
+            [(review.text, review.id) for review in scraped[product_id]],
+            columns=["review", "review_id"],
+        )
+        product_rows = rows[product_id]
+        if index is None:
+            results_df = reviews_df.copy()
+            results_df["label"] = [None] * len(results_df)
+            results_df["score"] = [None] * len(results_df)
+            for row, _, label, score in product_rows:
+                results_df.at[row, "label"] = label
+                results_df.at[row, "score"] = round(score, 5)
+            stats = SentimentStats()
+            stats.update(results_df)
+            positive, negative, most_positive, most_negative = stats.general()
+            product_stats = {
+                "positive_count": positive,
+                "negative_count": negative,
+                "most_positive_review": most_positive,
+                "most_negative_review": most_negative,
+            }
+        else:
+            results_df = pd.DataFrame(
+                [
+                    (reviews_df.at[row, "review"], aspect, label, round(score, 5))
+                    for row, aspect, label, score in product_rows
+                ],
+                columns=["review", "aspect", "label", "score"],
+                index=[row for row, _, _, _ in product_rows],
+            )
+            results_df.sort_values(
+                by=["aspect", "label", "score"],
+                ascending=[True, True, False],
+                inplace=True,
+            )
+            stats = AspectSentimentStats()
+            stats.update(results_df)
+            product_stats = stats.aspects()
+
+        results[product_id] = {
+            "url": url,
+            "reviews": reviews_df,
+            "results": results_df,
+            "stats": product_stats,
+            "error": errors.get(product_id),
+        }
+    return results, comparison_table(results, aspects)
+
+
+def comparison_table(
+    results: Dict[str, dict], aspects: Optional[List[str]] = None
+) -> "pd.DataFrame":
+    """
+    Compare the sentiment of several products side by side.
+
+    Args:
+        results (Dict[str, dict]): Per-product results as returned by `analyze_products`.
+        aspects (Optional[List[str]]): The analyzed aspects, if any.
+
+    Returns:
+        pd.DataFrame: One row per product with its "product_id" and number of "reviews", plus
+            "positive", "negative" and "positive_share" for general analysis, or
+            "<aspect> mentions" and "<aspect> positive_share" for every aspect.
+    """
+    import pandas as pd
+
+    def share(positive: int, total: int) -> Optional[float]:
+        return round(positive / total, 3) if total else None
+
+    table = []
+    for product_id, product in results.items():
+        row = {"product_id": product_id, "reviews": len(product["reviews"])}
+        stats = product["stats"]
+        if not aspects:
+            row["positive"] = stats["positive_count"]
+            row["negative"] = stats["negative_count"]
+            row["positive_share"] = share(
+                stats["positive_count"],
+                stats["positive_count"] + stats["negative_count"],
+            )
+        else:
+            for aspect in aspects:
+                aspect_stats = stats.get(aspect, {})
+                mentions = sum(
+                    aspect_stats.get(key, 0)
+                    for key in ("positive_count", "neutral_count", "negative_count")
+                )
+                row[f"{aspect} mentions"] = mentions
+                row[f"{aspect} positive_share"] = share(
+                    aspect_stats.get("positive_count", 0), mentions
+                )
+        table.append(row)
+    return pd.DataFrame(table)
@@ -0,0 +1,313 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+from dotenv import load_dotenv
+from analyzing.aspect_based_sentiment_analyzer import AspectPairScorer
+from utils.metrics import CACHE_LOOKUPS
+from utils.utils import normalize_text
+
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "review-analyzer" / "results.sqlite"
+
+# Share of `max_entries` evicted at once when the SQLite store is full, so that its
+# entries are only counted again after about that many writes.
+EVICTION_SLACK = 0.1
+
+
+class ResultCache:
+    """
+    A two-level cache of model results: an in-process LRU in front of a SQLite store.
+
+    Entries are keyed by a hash of the normalized text, the model name and the aspect
+    (if any), and are evicted by age (`ttl`) and by count (`max_entries`). In memory the
+    least recently used entries are evicted first. On disk eviction is first in, first
+    out: hits do not renew an entry, so that lookups stay read-only.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = DEFAULT_CACHE_PATH,
+        max_entries: int = 1_000_000,
+        memory_entries: int = 10_000,
+        ttl: Optional[float] = None,
+    ):
+        """
+        Args:
+            path (Optional[Path]): Location of the SQLite store. Only the in-process LRU is used if None.
+            max_entries (int): Maximum number of entries kept on disk. Defaults to 1,000,000.
+            memory_entries (int): Maximum number of entries kept in memory. Defaults to 10,000.
+            ttl (Optional[float]): Seconds after which an entry expires. Entries never expire if None.
+        """
+        self._max_entries = max_entries
+        self._memory_entries = memory_entries
+        self._ttl = ttl
+        self._memory: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+        self._path = None
+        self._connection = None
+        self._pid = None
+        # Upper bound on the number of entries on disk, None until counted.
+        self._count: Optional[int] = None
+        if path is not None:
+            self._path = Path(path)
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            self._connect()
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS results_created ON results (created)"
+            )
+            self._connection.commit()
+
+    def _connect(self) -> None:
+        # A SQLite connection must not be used across a fork, so a forked child
+        # (e.g. a preforked API worker) opens its own. Called with the lock held.
+        if self._path is None or self._pid == os.getpid():
+            return
+        self._connection = sqlite3.connect(self._path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._pid = os.getpid()
+        self._count = None
+
+    @classmethod
+    def from_env(cls) -> Optional["ResultCache"]:
+        """
+        Build a cache from the RESULT_CACHE_* environment variables.
+
+        RESULT_CACHE_DISABLED turns caching off, RESULT_CACHE_PATH sets the SQLite file
+        ("" keeps the cache in memory only), and RESULT_CACHE_MAX_ENTRIES,
+        RESULT_CACHE_MEMORY_ENTRIES and RESULT_CACHE_TTL (seconds) set the limits.
+
+        Returns:
+            Optional[ResultCache]: The cache, or None if caching is disabled.
+        """
+        load_dotenv()
+        if os.getenv("RESULT_CACHE_DISABLED", "").lower() in ("1", "true", "yes"):
+            return None
+        path = os.getenv("RESULT_CACHE_PATH", str(DEFAULT_CACHE_PATH))
+        ttl = os.getenv("RESULT_CACHE_TTL")
+        return cls(
+            path=Path(path) if path else None,
+            max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 1_000_000)),
+            memory_entries=int(os.getenv("RESULT_CACHE_MEMORY_ENTRIES", 10_000)),
+            ttl=float(ttl) if ttl else None,
+        )
+
+    @staticmethod
+    def key(text: str, model_name: str, aspect: Optional[str] = None) -> str:
+        """
+        Compute the cache key of a model result.
+
+        Args:
+            text (str): The analyzed text.
+            model_name (str): Name of the model that produced the result.
+            aspect (Optional[str]): The aspect the text was analyzed for, if any.
+
+        Returns:
+            str: A hex digest identifying the result.
+        """
+        payload = "\x1f".join([model_name, aspect or "", normalize_text(text)])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self._ttl is not None and now - created > self._ttl
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        Look up several keys at once.
+
+        Args:
+            keys (Iterable[str]): The keys to look up.
+
+        Returns:
+            Dict[str, Any]: The cached values of the keys that were found.
+        """
+        keys = list(dict.fromkeys(keys))
+        now = time.time()
+        found = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                entry = self._memory.get(key)
+                if entry is not None and not self._expired(entry[0], now):
+                    self._memory.move_to_end(key)
+                    found[key] = entry[1]
+                else:
+                    missing.append(key)
+
+            self._connect()
+            if missing and self._connection is not None:
+                for start in range(0, len(missing), 500):
+                    chunk = missing[start : start + 500]
+                    rows = self._connection.execute(
+                        "SELECT key, value, created FROM results WHERE key IN "
+                        f"({','.join('?' * len(chunk))})",
+                        chunk,
+                    ).fetchall()
+                    for key, value, created in rows:
+                        if self._expired(created, now):
+                            continue
+                        found[key] = json.loads(value)
+                        self._remember(key, created, found[key])
+
+            self._hits += len(found)
+            self._misses += len(keys) - len(found)
+        CACHE_LOOKUPS.labels("hit").inc(len(found))
+        CACHE_LOOKUPS.labels("miss").inc(len(keys) - len(found))
+        return found
+
+    def put_many(self, items: Dict[str, Any]) -> None:
+        """
+        Store several values at once.
+
+        Args:
+            items (Dict[str, Any]): JSON-serializable values by key.
+        """
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            for key, value in items.items():
+                self._remember(key, now, value)
+            if self._connection is None:
+                return
+            self._connect()
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO results (key, value, created) VALUES (?, ?, ?)",
+                [(key, json.dumps(value), now) for key, value in items.items()],
+            )
+            self._evict(now, len(items))
+            self._connection.commit()
+
+    def _remember(self, key: str, created: float, value: Any) -> None:
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now: float, written: int) -> None:
+        # Counting the entries scans the whole table, so it only happens when the
+        # running estimate exceeds the limit. The estimate counts replaced entries as
+        # new ones and misses writes of other processes, which are bounded by the slack.
+        if self._count is not None:
+            self._count += written
+        if self._ttl is not None:
+            expired = self._connection.execute(
+                "DELETE FROM results WHERE created < ?", (now - self._ttl,)
+            ).rowcount
+            if self._count is not None:
+                self._count -= expired
+        if self._count is not None and self._count <= self._max_entries:
+            return
+        (count,) = self._connection.execute("SELECT COUNT(*) FROM results").fetchone()
+        if count > self._max_entries:
+            keep = self._max_entries - int(self._max_entries * EVICTION_SLACK)
+            self._connection.execute(
+                "DELETE FROM results WHERE key IN "
+                "(SELECT key FROM results ORDER BY created LIMIT ?)",
+                (count - keep,),
+            )
+            count = keep
+        self._count = count
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: Number of cache hits and misses since the cache was created.
+        """
+        with self._lock:
+            return {"hits": self._hits, "misses": self._misses}
+
+
+# Changes whenever scoring changes the result for the same text, so that results
+# scored the old way are not served again; e.g. "windowed-v1" since long reviews are
+# scored in overlapping windows instead of truncated.
+SCORING_VERSION = "windowed-v1"
+
+
+def _model_id(analyzer) -> str:
+    # Backends may drift slightly from eager torch, so their results are kept apart.
+    backend = getattr(analyzer, "backend", "torch")
+    return f"{analyzer.model_name}@{backend}#{SCORING_VERSION}"
+
+
+class CachedSentimentAnalyzer:
+    """
+    Drop-in replacement for `SentimentAnalyzer` that only runs the model on uncached reviews.
+    """
+
+    def __init__(self, analyzer, cache: ResultCache):
+        self._analyzer = analyzer
+        self._cache = cache
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._analyzer, name)
+
+    def analyze_sentiments(
+        self, prompts: List[str], batch_size: int = 32, *args, **kwargs
+    ) -> List[dict]:
+        """
+        See `SentimentAnalyzer.analyze_sentiments`. Results are only cached for default pipeline arguments.
+        """
+        if args or kwargs:
+            return self._analyzer.analyze_sentiments(
+                prompts, batch_size, *args, **kwargs
+            )
+
+        keys = [self._cache.key(prompt, _model_id(self)) for prompt in prompts]
+        cached = self._cache.get_many(keys)
+        missing = {
+            key: prompt for key, prompt in zip(keys, prompts) if key not in cached
+        }
+        if missing:
+            results = self._analyzer.analyze_sentiments(
+                list(missing.values()), batch_size
+            )
+            computed = dict(zip(missing, results))
+            self._cache.put_many(computed)
+            cached.update(computed)
+        return [cached[key] for key in keys]
+
+
+class CachedAspectBasedSentimentAnalyzer(AspectPairScorer):
+    """
+    Drop-in replacement for `AspectBasedSentimentAnalyzer` that only runs the model on uncached pairs.
+    """
+
+    def __init__(self, analyzer, cache: ResultCache):
+        self._analyzer = analyzer
+        self._cache = cache
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._analyzer, name)
+
+    def score_pairs(
+        self, pairs: List[tuple[str, str]], batch_size: int = 32, *args, **kwargs
+    ) -> List[dict[str, float]]:
+        """
+        See `AspectBasedSentimentAnalyzer.score_pairs`. Results are only cached for default pipeline arguments.
+        """
+        if args or kwargs:
+            return self._analyzer.score_pairs(pairs, batch_size, *args, **kwargs)
+
+        keys = [
+            self._cache.key(text, _model_id(self), aspect) for text, aspect in pairs
+        ]
+        cached = self._cache.get_many(keys)
+        missing = {key: pair for key, pair in zip(keys, pairs) if key not in cached}
+        if missing:
+            results = self._analyzer.score_pairs(list(missing.values()), batch_size)
+            computed = dict(zip(missing, results))
+            self._cache.put_many(computed)
+            cached.update(computed)
+        return [cached[key] for key in keys]
@@ -0,0 +1,390 @@
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+
+DEFAULT_SOCKET_PATH = Path.home() / ".cache" / "review-analyzer" / "daemon.sock"
+DEFAULT_IDLE_TIMEOUT = 15 * 60
+
+_MAIN = Path(__file__).resolve().parent.parent / "main.py"
+
+# Environment variables that change the results of commands. The daemon applies its
+# own, so it only runs commands for clients whose values match.
+SETTINGS = (
+    "ANALYZER_BACKEND",
+    "SENTIMENT_BACKEND",
+    "ASPECT_BACKEND",
+    "SUMMARIZER_BACKEND",
+    "BACKEND_OVERRIDE",
+    "CASCADE_THRESHOLD",
+    "DEDUP_DISABLED",
+    "DEDUP_THRESHOLD",
+    "RESULT_CACHE_DISABLED",
+    "RESULT_CACHE_PATH",
+    "RESULT_CACHE_TTL",
+    "RESULT_CACHE_MAX_ENTRIES",
+    "RESULT_CACHE_MEMORY_ENTRIES",
+)
+
+
+class DaemonError(Exception):
+    """
+    Raised when the daemon cannot be started or fails to run a command.
+    """
+
+
+def socket_path() -> Path:
+    """
+    Returns:
+        Path: Location of the daemon's Unix socket, DAEMON_SOCKET_PATH if set.
+    """
+    load_dotenv()
+    return Path(os.getenv("DAEMON_SOCKET_PATH", str(DEFAULT_SOCKET_PATH)))
+
+
+def settings() -> Dict[str, Optional[str]]:
+    """
+    Returns:
+        Dict[str, Optional[str]]: The values of the `SETTINGS` variables in this process, None if unset.
+    """
+    load_dotenv()
+    return {name: os.getenv(name) for name in SETTINGS}
+
+
+def _analyze(args: dict) -> Any:
+    from service.service import (
+        aspect_based_sentiment_analysis,
+        general_sentiment_analysis,
+    )
+
+    if args.get("aspects"):
+        return aspect_based_sentiment_analysis(
+            Path(args["source"]),
+            Path(args["destination"]),
+            args["aspects"],
+            args["batch_size"],
+            args.get("synonyms"),
+            args.get("chunk_size"),
+        )
+    return general_sentiment_analysis(
+        Path(args["source"]),
+        Path(args["destination"]),
+        args["batch_size"],
+        args.get("chunk_size"),
+    )
+
+
+def _summarize(args: dict) -> Any:
+    from service.service import summarize_reviews
+
+    return summarize_reviews(Path(args["source"]), budget=args.get("budget"))
+
+
+# Commands the daemon runs on behalf of the CLI, with JSON arguments.
+COMMANDS: Dict[str, Callable[[dict], Any]] = {
+    "analyze": _analyze,
+    "summarize": _summarize,
+}
+
+
+def _counters() -> Dict[str, Optional[Dict[str, int]]]:
+    from service.registry import registry
+
+    cache = registry.get("result_cache")
+    deduplicator = registry.get("deduplicator")
+    return {
+        "cache": cache.stats() if cache is not None else None,
+        "dedup": deduplicator.stats() if deduplicator is not None else None,
+    }
+
+
+def _difference(
+    before: Optional[Dict[str, int]], after: Optional[Dict[str, int]]
+) -> Optional[Dict[str, int]]:
+    if before is None or after is None:
+        return None
+    return {key: after[key] - before[key] for key in after}
+
+
+class ReviewDaemon:
+    """
+    A background process that keeps the models loaded and runs CLI commands for
+    clients connecting to its Unix socket, so that repeated CLI invocations skip
+    loading the models.
+
+    Clients send one JSON request per connection, {"command": ..., "args": {...},
+    "settings": {...}}, and receive one JSON response. Commands run one at a time, and
+    only if the client's `settings()` match the daemon's; otherwise the response lists
+    the differing variables under "mismatch". The daemon exits after `idle_timeout`
+    seconds without a request.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        idle_timeout: Optional[float] = DEFAULT_IDLE_TIMEOUT,
+    ):
+        """
+        Args:
+            path (Optional[Path]): Location of the Unix socket. Defaults to `socket_path()`.
+            idle_timeout (Optional[float]): Seconds without a request after which the daemon exits. Runs until stopped if None. Defaults to 15 minutes.
+        """
+        self._path = Path(path) if path is not None else socket_path()
+        self._idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._server: Optional[socketserver.ThreadingUnixStreamServer] = None
+        self._stopping = threading.Event()
+        self._started = time.time()
+        self._last_request = time.monotonic()
+        self._active = 0
+        self._requests = 0
+        self._settings = settings()
+
+    @classmethod
+    def from_env(cls) -> "ReviewDaemon":
+        """
+        Build a daemon from the DAEMON_SOCKET_PATH and DAEMON_IDLE_TIMEOUT (seconds, 0 to never exit) environment variables.
+
+        Returns:
+            ReviewDaemon: The daemon.
+        """
+        load_dotenv()
+        idle_timeout = float(os.getenv("DAEMON_IDLE_TIMEOUT", DEFAULT_IDLE_TIMEOUT))
+        return cls(idle_timeout=idle_timeout or None)
+
+    def serve(self) -> None:
+        """
+        Load and warm up the models, then serve requests until stopped or idle.
+
+        Raises:
+            DaemonError: If another daemon is already listening on the socket.
+        """
+        from service.registry import registry
+        from service.warmup import warm_up
+
+        # Checked before loading the models, which takes long, and again after, in
+        # case another daemon started in the meantime.
+        self._check_socket()
+        warm_up(registry)
+        self._check_socket()
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                daemon._handle(self.rfile, self.wfile)
+
+        self._server = socketserver.ThreadingUnixStreamServer(str(self._path), Handler)
+        self._server.daemon_threads = True
+        os.chmod(self._path, 0o600)
+        self._started = time.time()
+        self._last_request = time.monotonic()
+        threading.Thread(target=self._watch_idle, daemon=True).start()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._stopping.set()
+            self._server.server_close()
+            self._path.unlink(missing_ok=True)
+
+    def _check_socket(self) -> None:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        if self._path.exists():
+            if request("status", path=self._path) is not None:
+                raise DaemonError(f"A daemon is already listening on {self._path}.")
+            # Left behind by a daemon that did not shut down cleanly.
+            self._path.unlink()
+
+    def stop(self) -> None:
+        """
+        Stop serving. Safe to call from a request handler.
+        """
+        self._stopping.set()
+        if self._server is not None:
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+
+    def status(self) -> dict:
+        """
+        Returns:
+            dict: The daemon's "pid", "socket", "uptime" and "idle" seconds, number of
+                commands run ("requests"), "idle_timeout" and the names of the loaded "models".
+        """
+        from service.registry import registry
+        from service.warmup import WARM_MODELS
+
+        with self._lock:
+            idle = 0.0 if self._active else time.monotonic() - self._last_request
+            requests = self._requests
+        return {
+            "pid": os.getpid(),
+            "socket": str(self._path),
+            "uptime": round(time.time() - self._started, 1),
+            "idle": round(idle, 1),
+            "requests": requests,
+            "idle_timeout": self._idle_timeout,
+            "models": [name for name in WARM_MODELS if registry.is_loaded(name)],
+        }
+
+    def _handle(self, rfile, wfile) -> None:
+        line = rfile.readline()
+        if not line:
+            return
+        try:
+            response = self._respond(json.loads(line))
+        except Exception as e:
+            response = {"error": f"{type(e).__name__}: {e}"}
+        wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+
+    def _respond(self, message: dict) -> dict:
+        command = message.get("command")
+        if command == "status":
+            return self.status()
+        if command == "stop":
+            self.stop()
+            return {"stopping": True}
+        if command not in COMMANDS:
+            raise ValueError(f"Unknown command '{command}'.")
+        mismatch = self._mismatch(message.get("settings", {}))
+        if mismatch:
+            return {"mismatch": mismatch}
+
+        # Only commands count as activity, so polling the status does not keep the
+        # daemon alive.
+        with self._lock:
+            self._active += 1
+        try:
+            # The models are shared, so commands run one after another, and the cache
+            # and deduplication counters of every run can be told apart.
+            with self._run_lock:
+                before = _counters()
+                result = COMMANDS[command](message.get("args", {}))
+                after = _counters()
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._requests += 1
+                self._last_request = time.monotonic()
+        return {
+            "result": result,
+            **{key: _difference(before[key], after[key]) for key in after},
+        }
+
+    def _mismatch(self, client: Dict[str, Optional[str]]) -> List[str]:
+        # Settings the client did not send are taken to match.
+        return [
+            name
+            for name in SETTINGS
+            if name in client and client[name] != self._settings[name]
+        ]
+
+    def _watch_idle(self) -> None:
+        if self._idle_timeout is None:
+            return
+        while not self._stopping.wait(min(self._idle_timeout, 5)):
+            with self._lock:
+                idle = not self._active and (
+                    time.monotonic() - self._last_request >= self._idle_timeout
+                )
+            if idle:
+                self.stop()
+
+
+def request(
+    command: str,
+    args: Optional[dict] = None,
+    path: Optional[Path] = None,
+    timeout: Optional[float] = None,
+) -> Optional[dict]:
+    """
+    Send a command to the daemon.
+
+    Args:
+        command (str): "status", "stop" or one of `COMMANDS`.
+        args (Optional[dict]): JSON-serializable arguments of the command. Paths must be absolute.
+        path (Optional[Path]): Location of the Unix socket. Defaults to `socket_path()`.
+        timeout (Optional[float]): Seconds to wait for the response. Waits indefinitely if None.
+
+    Returns:
+        Optional[dict]: The daemon's response, or None if no daemon is running (or it
+            exited before responding) or it was started with other `SETTINGS` than this
+            process has, in which case the caller should do the work itself.
+
+    Raises:
+        DaemonError: If the daemon failed to run the command.
+    """
+    path = Path(path) if path is not None else socket_path()
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(str(path))
+    except (FileNotFoundError, ConnectionRefusedError):
+        client.close()
+        return None
+
+    message = {"command": command, "args": args or {}}
+    if command in COMMANDS:
+        message["settings"] = settings()
+    with client:
+        client.settimeout(timeout)
+        client.sendall((json.dumps(message) + "\n").encode("utf-8"))
+        with client.makefile("rb") as file:
+            line = file.readline()
+    if not line:
+        return None
+    response = json.loads(line)
+    if "error" in response:
+        raise DaemonError(response["error"])
+    if "mismatch" in response:
+        return None
+    return response
+
+
+def start_daemon(idle_timeout: Optional[float] = None, wait: float = 600) -> dict:
+    """
+    Start the daemon as a detached background process and wait until it is ready.
+
+    Its output goes to a ".log" file next to the socket.
+
+    Args:
+        idle_timeout (Optional[float]): Seconds without a request after which the daemon exits, 0 to run until stopped. Read from the environment if None, see `ReviewDaemon.from_env`.
+        wait (float): Seconds to wait for the models to load. Defaults to 10 minutes.
+
+    Returns:
+        dict: The daemon's status, see `ReviewDaemon.status`.
+
+    Raises:
+        DaemonError: If the daemon exits or is not ready in time.
+    """
+    path = socket_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    log = path.with_suffix(".log")
+    command = [sys.executable, str(_MAIN), "daemon", "start", "--foreground"]
+    if idle_timeout is not None:
+        command += ["--idle-timeout", str(idle_timeout)]
+    with open(log, "ab") as output:
+        process = subprocess.Popen(
+            command,
+            cwd=_MAIN.parent,
+            stdin=subprocess.DEVNULL,
+            stdout=output,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise DaemonError(f"The daemon exited, see {log}.")
+        status = request("status", path=path, timeout=5)
+        if status is not None and status["pid"] == process.pid:
+            return status
+        time.sleep(0.5)
+    process.terminate()
+    raise DaemonError(f"The daemon was not ready after {wait:g} seconds, see {log}.")
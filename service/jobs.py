@@ -0,0 +1,402 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+from model.model import JobKind, JobStatus
+
+DEFAULT_QUEUE_PATH = Path.home() / ".cache" / "review-analyzer" / "jobs.sqlite"
+
+# Reviews analyzed between progress updates and cancellation checks.
+ANALYZE_CHUNK_SIZE = 256
+
+Progress = Callable[[int, int], None]
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a running job once it has been cancelled.
+    """
+
+
+def _scrape(params: dict, progress: Progress) -> dict:
+    from service.service import scrape_reviews
+
+    count = params["count"]
+    reviews = scrape_reviews(
+        params["url"],
+        count,
+        params.get("sort", "relevancy"),
+        params.get("incremental", False),
+        progress=lambda scraped: progress(scraped, count),
+    )
+    return {"reviews": [review.text for review in reviews]}
+
+
+def _analyze(params: dict, progress: Progress) -> dict:
+    import pandas as pd
+    from analyzing.aspect_index import AspectIndex
+    from service.service import _score_aspects, _score_general, group_aspect_results
+    from service.stats import AspectSentimentStats, SentimentStats
+
+    reviews_df = pd.DataFrame(params["reviews"], columns=["review"])
+    aspects = params.get("aspects")
+    index = AspectIndex(aspects, params.get("synonyms")) if aspects else None
+    stats = AspectSentimentStats() if aspects else SentimentStats()
+
+    results = []
+    progress(0, len(reviews_df))
+    for start in range(0, len(reviews_df), ANALYZE_CHUNK_SIZE):
+        chunk = reviews_df.iloc[start : start + ANALYZE_CHUNK_SIZE]
+        if index is not None:
+            results_df = _score_aspects(chunk, index, batch_size=32)
+            results.extend(group_aspect_results(chunk, results_df))
+        else:
+            results_df = _score_general(chunk, batch_size=32)
+            columns = ["review", "label", "score"]
+            if "tier" in results_df:
+                columns.append("tier")
+            results.extend(
+                dict(zip(columns, row))
+                for row in results_df[columns].itertuples(index=False)
+            )
+        stats.update(results_df)
+        progress(start + len(chunk), len(reviews_df))
+
+    if index is not None:
+        return {
+            "analysis_type": "aspect-based",
+            "aspects_analyzed": aspects,
+            "results": results,
+            "stats": stats.aspects(),
+        }
+    positive, negative, most_positive, most_negative = stats.general()
+    return {
+        "analysis_type": "general",
+        "results": results,
+        "stats": {
+            "positive_count": positive,
+            "negative_count": negative,
+            "most_positive_review": most_positive,
+            "most_negative_review": most_negative,
+        },
+    }
+
+
+def _summarize(params: dict, progress: Progress) -> dict:
+    from service.service import summarize
+
+    progress(0, 1)
+    summary = summarize(params["reviews"], params.get("budget"))
+    progress(1, 1)
+    return {"summary": summary}
+
+
+HANDLERS: Dict[str, Callable[[dict, Progress], dict]] = {
+    JobKind.scrape.value: _scrape,
+    JobKind.analyze.value: _analyze,
+    JobKind.summarize.value: _summarize,
+}
+
+
+class JobQueue:
+    """
+    A persistent queue of scrape, analyze and summarize jobs, run by a pool of worker threads.
+
+    Jobs, their progress and their results are kept in SQLite, so several processes can
+    share a queue and queued jobs survive a restart. Jobs that were still running when
+    their process stopped are queued again and rerun from the start.
+    """
+
+    def __init__(
+        self,
+        path: Path = DEFAULT_QUEUE_PATH,
+        workers: int = 2,
+        retention: Optional[float] = 7 * 24 * 3600,
+        poll_interval: float = 1.0,
+    ):
+        """
+        Args:
+            path (Path): Location of the SQLite file.
+            workers (int): Number of jobs run at the same time. Defaults to 2.
+            retention (Optional[float]): Seconds finished jobs are kept for. Kept forever if None. Defaults to a week.
+            poll_interval (float): Seconds between checks for jobs submitted by other processes. Defaults to 1.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._workers = workers
+        self._retention = retention
+        self._poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, params TEXT NOT NULL, "
+            "status TEXT NOT NULL, progress REAL NOT NULL DEFAULT 0, "
+            "result TEXT, error TEXT, pid INTEGER, "
+            "created REAL NOT NULL, started REAL, finished REAL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)"
+        )
+        self._connection.commit()
+
+    @classmethod
+    def from_env(cls) -> "JobQueue":
+        """
+        Build a queue from the JOB_QUEUE_PATH, JOB_WORKERS and JOB_RETENTION (seconds) environment variables.
+
+        Returns:
+            JobQueue: The job queue.
+        """
+        load_dotenv()
+        retention = os.getenv("JOB_RETENTION")
+        return cls(
+            path=Path(os.getenv("JOB_QUEUE_PATH", str(DEFAULT_QUEUE_PATH))),
+            workers=int(os.getenv("JOB_WORKERS", 2)),
+            retention=float(retention) if retention else 7 * 24 * 3600,
+        )
+
+    def start(self) -> None:
+        """
+        Requeue jobs interrupted by a restart, drop expired jobs and start the workers.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, pid FROM jobs WHERE status = ?", (JobStatus.running.value,)
+            ).fetchall()
+            orphaned = [
+                job_id
+                for job_id, pid in rows
+                if pid == os.getpid() or not _is_alive(pid)
+            ]
+            self._connection.executemany(
+                "UPDATE jobs SET status = ?, progress = 0, pid = NULL WHERE id = ?",
+                [(JobStatus.queued.value, job_id) for job_id in orphaned],
+            )
+            if self._retention is not None:
+                self._connection.execute(
+                    "DELETE FROM jobs WHERE finished < ?",
+                    (time.time() - self._retention,),
+                )
+            self._connection.commit()
+
+        self._stopping.clear()
+        self._threads = [
+            threading.Thread(target=self._work, daemon=True)
+            for _ in range(self._workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the workers once their current jobs finish. Jobs still running after
+        `timeout` are left to be rerun by the next `start`.
+
+        Args:
+            timeout (Optional[float]): Seconds to wait for every worker.
+        """
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def submit(self, kind: JobKind, params: dict) -> dict:
+        """
+        Queue a job.
+
+        Args:
+            kind (JobKind): What the job does.
+            params (dict): JSON-serializable arguments of the job.
+
+        Returns:
+            dict: The job, see `get`.
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO jobs (id, kind, params, status, created) VALUES (?, ?, ?, ?, ?)",
+                (
+                    job_id,
+                    JobKind(kind).value,
+                    json.dumps(params),
+                    JobStatus.queued.value,
+                    time.time(),
+                ),
+            )
+            self._connection.commit()
+        with self._wakeup:
+            self._wakeup.notify()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """
+        Look up a job.
+
+        Args:
+            job_id (str): The job id.
+
+        Returns:
+            Optional[dict]: The job's "id", "kind", "status", "progress" (0 to 1), "error",
+                "created_at", "started_at" and "finished_at", or None if there is no such job.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT id, kind, status, progress, error, created, started, finished "
+                "FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = [
+            "id",
+            "kind",
+            "status",
+            "progress",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        return dict(zip(keys, row))
+
+    def result(self, job_id: str) -> Optional[Any]:
+        """
+        Args:
+            job_id (str): The job id.
+
+        Returns:
+            Optional[Any]: The result of a succeeded job, or None if the job has not succeeded.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT result FROM jobs WHERE id = ? AND status = ?",
+                (job_id, JobStatus.succeeded.value),
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued or running job. A running job stops at its next progress update.
+
+        Args:
+            job_id (str): The job id.
+
+        Returns:
+            bool: True if the job was cancelled, False if it had already finished or does not exist.
+        """
+        with self._lock:
+            cursor = self._connection.execute(
+                "UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status IN (?, ?)",
+                (
+                    JobStatus.cancelled.value,
+                    time.time(),
+                    job_id,
+                    JobStatus.queued.value,
+                    JobStatus.running.value,
+                ),
+            )
+            self._connection.commit()
+        return cursor.rowcount > 0
+
+    def _claim(self) -> Optional[tuple[str, str, dict]]:
+        with self._lock:
+            row = self._connection.execute(
+                "UPDATE jobs SET status = ?, pid = ?, started = ? WHERE id = "
+                "(SELECT id FROM jobs WHERE status = ? ORDER BY created LIMIT 1) "
+                "RETURNING id, kind, params",
+                (
+                    JobStatus.running.value,
+                    os.getpid(),
+                    time.time(),
+                    JobStatus.queued.value,
+                ),
+            ).fetchone()
+            self._connection.commit()
+        if row is None:
+            return None
+        job_id, kind, params = row
+        return job_id, kind, json.loads(params)
+
+    def _progress(self, job_id: str) -> Progress:
+        last = [-1.0]
+
+        def update(done: int, total: int) -> None:
+            fraction = min(done / total, 1.0) if total else 1.0
+            # Write at most every percent to keep the database quiet on long jobs.
+            if fraction - last[0] < 0.01 and fraction < 1.0:
+                return
+            last[0] = fraction
+            with self._lock:
+                cursor = self._connection.execute(
+                    "UPDATE jobs SET progress = ? WHERE id = ? AND status = ?",
+                    (fraction, job_id, JobStatus.running.value),
+                )
+                self._connection.commit()
+            if cursor.rowcount == 0:
+                raise JobCancelled(job_id)
+
+        return update
+
+    def _finish(
+        self,
+        job_id: str,
+        status: JobStatus,
+        result: Optional[Any] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        with self._lock:
+            self._connection.execute(
+                "UPDATE jobs SET status = ?, progress = MAX(progress, ?), result = ?, "
+                "error = ?, finished = ? WHERE id = ? AND status = ?",
+                (
+                    status.value,
+                    1.0 if status == JobStatus.succeeded else 0.0,
+                    json.dumps(result) if result is not None else None,
+                    error,
+                    time.time(),
+                    job_id,
+                    JobStatus.running.value,
+                ),
+            )
+            self._connection.commit()
+
+    def _work(self) -> None:
+        while not self._stopping.is_set():
+            job = self._claim()
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(self._poll_interval)
+                continue
+
+            job_id, kind, params = job
+            try:
+                result = HANDLERS[kind](params, self._progress(job_id))
+            except JobCancelled:
+                continue
+            except Exception as e:
+                self._finish(job_id, JobStatus.failed, error=str(e))
+            else:
+                self._finish(job_id, JobStatus.succeeded, result=result)
+
+
+def _is_alive(pid: Optional[int]) -> bool:
+    if pid is None:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,212 @@
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
+from analyzing.aspect_index import AspectIndex
+from service.stats import AspectSentimentStats, SentimentStats
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def _init_worker(threads: int) -> None:
+    # Pin the intra-op thread count before torch is imported so that the workers
+    # together do not oversubscribe the cores.
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[variable] = str(threads)
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+
+
+def _general_shard(
+    reviews_df: "pd.DataFrame", batch_size: int
+) -> tuple["pd.DataFrame", SentimentStats]:
+    from service.service import _score_general
+
+    results_df = _score_general(reviews_df, batch_size)
+    stats = SentimentStats()
+    stats.update(results_df)
+    return results_df, stats
+
+
+def _aspect_shard(
+    reviews_df: "pd.DataFrame", index: AspectIndex, batch_size: int
+) -> tuple["pd.DataFrame", AspectSentimentStats]:
+    from service.service import _score_aspects
+
+    results_df = _score_aspects(reviews_df, index, batch_size)
+    stats = AspectSentimentStats()
+    stats.update(results_df)
+    return results_df, stats
+
+
+def _summarize_shard(reviews: List[str]) -> str:
+    from service.service import summarize
+
+    return summarize(reviews)
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    threads = max(1, (os.cpu_count() or workers) // workers)
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(threads,),
+    )
+
+
+def _shards(reviews_df: "pd.DataFrame", count: int) -> List["pd.DataFrame"]:
+    size = max(1, math.ceil(len(reviews_df) / count))
+    return [
+        reviews_df.iloc[start : start + size]
+        for start in range(0, len(reviews_df), size)
+    ]
+
+
+def _chunks(
+    source: Path, chunk_size: Optional[int]
+) -> Iterator[tuple[int, "pd.DataFrame"]]:
+    import pandas as pd
+
+    if chunk_size is None:
+        yield 0, pd.read_csv(source)
+    else:
+        yield from enumerate(pd.read_csv(source, chunksize=chunk_size))
+
+
+def _append(results_df: "pd.DataFrame", destination: Path, position: int) -> None:
+    results_df.to_csv(
+        destination,
+        index=False,
+        mode="w" if position == 0 else "a",
+        header=position == 0,
+    )
+
+
+def parallel_general_sentiment_analysis(
+    source: Path,
+    destination: Path,
+    workers: int,
+    batch_size: int = 32,
+    chunk_size: Optional[int] = None,
+) -> tuple[int, int, str, str]:
+    """
+    Multi-process version of `general_sentiment_analysis`.
+
+    Reviews (or every chunk of `chunk_size` reviews) are split into contiguous shards
+    that are scored by a pool of `workers` processes, each of which loads the model once
+    and uses its share of the CPU cores. Shard outputs are written in input order.
+
+    Args:
+        source (Path): Path to the CSV file containing reviews.
+        destination (Path): Path to save the updated CSV file with sentiment analysis results.
+        workers (int): Number of worker processes.
+        batch_size (int): Number of reviews per forward pass. Defaults to 32.
+        chunk_size (Optional[int]): Number of rows to process at a time. The whole file at once if None.
+
+    Returns:
+        tuple[int, int, str, str]: The statistics as returned by `general_sentiment_analysis`.
+    """
+    import pandas as pd
+
+    stats = SentimentStats()
+    with _pool(workers) as pool:
+        for position, reviews_df in _chunks(source, chunk_size):
+            futures = [
+                pool.submit(_general_shard, shard, batch_size)
+                for shard in _shards(reviews_df, workers * 4)
+            ]
+            results = [future.result() for future in futures]
+            for _, shard_stats in results:
+                stats.merge(shard_stats)
+            results_df = (
+                pd.concat([shard_df for shard_df, _ in results])
+                if results
+                else reviews_df.assign(label=[], score=[])
+            )
+            _append(results_df, destination, position)
+    return stats.general()
+
+
+def parallel_aspect_based_sentiment_analysis(
+    source: Path,
+    destination: Path,
+    aspects: List[str],
+    workers: int,
+    batch_size: int = 32,
+    synonyms: Optional[Dict[str, List[str]]] = None,
+    chunk_size: Optional[int] = None,
+) -> dict[str, dict]:
+    """
+    Multi-process version of `aspect_based_sentiment_analysis`.
+
+    Shards are scored as in `parallel_general_sentiment_analysis`, then their results are
+    merged and sorted exactly as a single process would sort them, and their per-aspect
+    statistics are combined.
+
+    Args:
+        source (Path): Path to the CSV file containing reviews.
+        destination (Path): Path to save the updated CSV file with sentiment analysis results.
+        aspects (List[str]): List of aspects to analyze in the reviews.
+        workers (int): Number of worker processes.
+        batch_size (int): Number of (review, aspect) pairs per forward pass. Defaults to 32.
+        synonyms (Optional[Dict[str, List[str]]]): Alternative terms that also count as a mention of an aspect.
+        chunk_size (Optional[int]): Number of rows to process at a time. The whole file at once if None.
+
+    Returns:
+        dict[str, dict]: The statistics as returned by `aspect_based_sentiment_analysis`.
+    """
+    import pandas as pd
+
+    index = AspectIndex(aspects, synonyms)
+    stats = AspectSentimentStats()
+    with _pool(workers) as pool:
+        for position, reviews_df in _chunks(source, chunk_size):
+            futures = [
+                pool.submit(_aspect_shard, shard, index, batch_size)
+                for shard in _shards(reviews_df, workers * 4)
+            ]
+            results = [future.result() for future in futures]
+            for _, shard_stats in results:
+                stats.merge(shard_stats)
+            results_df = pd.concat(
+                [shard_df for shard_df, _ in results]
+                or [pd.DataFrame(columns=["review", "aspect", "label", "score"])]
+            )
+            results_df.sort_values(
+                by=["aspect", "label", "score"],
+                ascending=[True, True, False],
+                kind="stable",
+                inplace=True,
+            )
+            _append(results_df, destination, position)
+    return stats.aspects()
+
+
+def parallel_summarize(reviews: List[str], workers: int) -> str:
+    """
+    Multi-process version of `summarize`.
+
+    Every worker summarizes a contiguous shard of the reviews, and the shard summaries
+    are then summarized into one.
+
+    Args:
+        reviews (List[str]): The reviews to summarize.
+        workers (int): Number of worker processes.
+
+    Returns:
+        str: Summary of the reviews.
+    """
+    size = max(1, math.ceil(len(reviews) / workers))
+    shards = [reviews[start : start + size] for start in range(0, len(reviews), size)]
+    with _pool(workers) as pool:
+        summaries = list(pool.map(_summarize_shard, shards))
+        if len(summaries) == 1:
+            return summaries[0]
+        return pool.submit(_summarize_shard, summaries).result()
@@ -0,0 +1,172 @@
+import queue
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+from analyzing.aspect_index import AspectIndex
+from service.registry import registry
+from utils.metrics import QUEUE_DEPTH, timed
+from utils.utils import extract_walmart_product_id
+
+# Put into a review queue after the last review.
+DONE = object()
+
+
+def put(reviews: queue.Queue, item, stop: threading.Event) -> bool:
+    """
+    Put an item into a bounded queue, waiting while it is full.
+
+    Args:
+        reviews (queue.Queue): The queue.
+        item: The item to put.
+        stop (threading.Event): Gives up waiting once set, e.g. when the consumer is gone.
+
+    Returns:
+        bool: True if the item was put, False if `stop` was set first.
+    """
+    while not stop.is_set():
+        try:
+            reviews.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _produce(
+    url: str,
+    count: int,
+    sort: str,
+    reviews: queue.Queue,
+    stop: threading.Event,
+) -> None:
+    scraped = []
+    try:
+        for review in registry.get("scraper").extract_reviews(url, count, sort):
+            scraped.append(review)
+            if not put(reviews, review, stop):
+                return
+        registry.get("review_store").add(extract_walmart_product_id(url), scraped)
+        put(reviews, DONE, stop)
+    except Exception as e:
+        put(reviews, e, stop)
+
+
+def next_batch(reviews: queue.Queue, batch_size: int, max_wait: float) -> List:
+    """
+    Take the next micro-batch from a queue.
+
+    Args:
+        reviews (queue.Queue): The queue.
+        batch_size (int): Maximum number of items in the batch.
+        max_wait (float): Seconds to wait for more items after the first one has arrived.
+
+    Returns:
+        List: At least one item. `DONE` can only be the last.
+    """
+    batch = [reviews.get()]
+    deadline = time.monotonic() + max_wait
+    while len(batch) < batch_size and batch[-1] is not DONE:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(reviews.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+
+def stream_analysis(
+    url: str,
+    count: int = 100,
+    sort: str = "relevancy",
+    aspects: Optional[List[str]] = None,
+    synonyms: Optional[Dict[str, List[str]]] = None,
+    batch_size: int = 16,
+    max_wait: float = 0.5,
+    queue_size: int = 256,
+) -> Iterator[dict]:
+    """
+    Scrape reviews and analyze them while scraping is still in progress.
+
+    Scraped reviews go into a bounded queue and are analyzed in micro-batches as
+    they arrive, so the first results are available after about one page of latency.
+    A batch is run once it holds `batch_size` reviews or its first review has waited
+    `max_wait` seconds. Closing the iterator stops the scrape.
+
+    Args:
+        url (str): The product URL to scrape reviews from.
+        count (int): Number of reviews to scrape. Defaults to 100.
+        sort (str): Sorting method for reviews. Defaults to "relevancy".
+        aspects (Optional[List[str]]): Aspects to analyze. Performs general sentiment analysis if not provided.
+        synonyms (Optional[Dict[str, List[str]]]): Alternative terms that also count as a mention of an aspect.
+        batch_size (int): Maximum number of reviews per micro-batch. Defaults to 16.
+        max_wait (float): Seconds a micro-batch waits for more reviews. Defaults to 0.5.
+        queue_size (int): Maximum number of scraped reviews waiting for analysis. Defaults to 256.
+
+    Yields:
+        dict: For general analysis, the "review", "review_id", "label" and "score" of each review,
+            and the "tier" that labeled it if the sentiment analyzer is a cascade.
+            For aspect-based analysis, the "review", "review_id" and per-aspect "details" of each
+            review that mentions at least one aspect.
+    """
+    index = AspectIndex(aspects, synonyms) if aspects else None
+    analyzer = registry.get(
+        "aspect_based_sentiment_analyzer" if aspects else "sentiment_analyzer"
+    )
+
+    reviews: queue.Queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    producer = threading.Thread(
+        target=_produce, args=(url, count, sort, reviews, stop), daemon=True
+    )
+    producer.start()
+
+    try:
+        done = False
+        while not done:
+            with timed("stream.wait"):
+                batch = next_batch(reviews, batch_size, max_wait)
+            QUEUE_DEPTH.labels("stream").set(reviews.qsize())
+            for item in batch:
+                if isinstance(item, Exception):
+                    raise item
+            done = batch[-1] is DONE
+            batch = [item for item in batch if item is not DONE]
+            if not batch:
+                continue
+            texts = [review.text for review in batch]
+
+            if index is None:
+                for review, sentiment in zip(
+                    batch, analyzer.analyze_sentiments(texts, batch_size=batch_size)
+                ):
+                    result = {
+                        "review": review.text,
+                        "review_id": review.id,
+                        "label": sentiment["label"].upper(),
+                        "score": round(sentiment["score"], 5),
+                    }
+                    if "tier" in sentiment:
+                        result["tier"] = sentiment["tier"]
+                    yield result
+            else:
+                details = {}
+                for position, aspect, sentiment in analyzer.analyze_sentiments(
+                    texts, index, batch_size=batch_size
+                ):
+                    details.setdefault(position, []).append(
+                        {
+                            "aspect": aspect,
+                            "label": sentiment["label"].upper(),
+                            "score": round(sentiment["score"], 5),
+                        }
+                    )
+                for position, review_details in details.items():
+                    yield {
+                        "review": batch[position].text,
+                        "review_id": batch[position].id,
+                        "details": review_details,
+                    }
+    finally:
+        stop.set()
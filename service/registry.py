@@ -0,0 +1,203 @@
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set
+
+
+class ModelRegistry:
+    """
+    A registry of named models (and other expensive objects) that are built on first use.
+
+    Factories are registered up front, but nothing is constructed, and none of the
+    heavy libraries behind it are imported, until `get` asks for it.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._wrappers: Dict[str, Set[str]] = {}
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        """
+        Register a factory under a name, discarding any instance already built for it.
+
+        Args:
+            name (str): The name to register the factory under.
+            factory (Callable[[], Any]): A callable that builds the object.
+        """
+        self._factories[name] = factory
+        self._locks.setdefault(name, threading.Lock())
+        self._instances.pop(name, None)
+        self._wrappers.pop(name, None)
+
+    def wrap(
+        self, name: str, wrapper: Callable[[Any], Any], key: Optional[str] = None
+    ) -> bool:
+        """
+        Wrap the object registered under a name, e.g. to add batching or caching.
+
+        The wrapped object is still built lazily, on first use. An object that has
+        already been built is wrapped in place rather than built again.
+
+        Args:
+            name (str): The name of the object to wrap.
+            wrapper (Callable[[Any], Any]): A callable that takes the object and returns its replacement.
+            key (Optional[str]): Identifies the wrapper, so that wrapping the same object with it again, e.g. on every start of the API, does nothing. Always wraps if None.
+
+        Returns:
+            bool: True if the object was wrapped, False if it already was with `key`.
+
+        Raises:
+            KeyError: If no factory is registered under `name`.
+        """
+        if name not in self._factories:
+            raise KeyError(f"No model registered under '{name}'.")
+        with self._locks[name]:
+            applied = self._wrappers.setdefault(name, set())
+            if key is not None and key in applied:
+                return False
+            factory = self._factories[name]
+            self._factories[name] = lambda: wrapper(factory())
+            if name in self._instances:
+                self._instances[name] = wrapper(self._instances[name])
+            if key is not None:
+                applied.add(key)
+        return True
+
+    def get(self, name: str) -> Any:
+        """
+        Get the object registered under a name, building it if this is its first use.
+
+        Args:
+            name (str): The name of the object.
+
+        Returns:
+            Any: The object built by the registered factory.
+
+        Raises:
+            KeyError: If no factory is registered under `name`.
+        """
+        if name in self._instances:
+            return self._instances[name]
+        if name not in self._factories:
+            raise KeyError(f"No model registered under '{name}'.")
+        with self._locks[name]:
+            if name not in self._instances:
+                self._instances[name] = self._factories[name]()
+        return self._instances[name]
+
+    def is_loaded(self, name: str) -> bool:
+        """
+        Check whether the object registered under a name has been built.
+
+        Args:
+            name (str): The name of the object.
+
+        Returns:
+            bool: True if the object has been built.
+        """
+        return name in self._instances
+
+    def names(self) -> List[str]:
+        """
+        List the registered names.
+
+        Returns:
+            List[str]: The registered names.
+        """
+        return list(self._factories)
+
+
+# Set by the CLI's `--backend`, which wins over the backends configured in `.env`.
+# Passed through the environment so that worker processes pick it up too.
+BACKEND_OVERRIDE = "BACKEND_OVERRIDE"
+
+
+def _backend(variable: str) -> str:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    return (
+        os.getenv(BACKEND_OVERRIDE)
+        or os.getenv(variable)
+        or os.getenv("ANALYZER_BACKEND", "torch")
+    )
+
+
+def _build_scraper():
+    from scraping.serpapi_scraper import SerpapiScraper
+
+    return SerpapiScraper()
+
+
+def _build_review_store():
+    from scraping.review_store import ReviewStore
+
+    return ReviewStore.from_env()
+
+
+def _build_result_cache():
+    from service.cache import ResultCache
+
+    return ResultCache.from_env()
+
+
+def _build_deduplicator():
+    from analyzing.dedup import ReviewDeduplicator
+
+    return ReviewDeduplicator.from_env()
+
+
+def _build_job_queue():
+    from service.jobs import JobQueue
+
+    return JobQueue.from_env()
+
+
+def _build_summarizer():
+    from analyzing.summarizer import Summarizer
+
+    return Summarizer(backend=_backend("SUMMARIZER_BACKEND"))
+
+
+def _build_sentiment_analyzer():
+    from analyzing.sentiment_analyzer import SentimentAnalyzer
+    from service.cache import CachedSentimentAnalyzer
+
+    analyzer = SentimentAnalyzer(backend=_backend("SENTIMENT_BACKEND"))
+    cache = registry.get("result_cache")
+    if cache is not None:
+        analyzer = CachedSentimentAnalyzer(analyzer, cache)
+    # Opt-in: CASCADE_THRESHOLD lets a lexicon label the clear-cut reviews.
+    threshold = os.getenv("CASCADE_THRESHOLD")
+    if threshold:
+        from analyzing.cascade import CascadeSentimentAnalyzer
+
+        analyzer = CascadeSentimentAnalyzer(analyzer, float(threshold))
+    return analyzer
+
+
+def _build_aspect_based_sentiment_analyzer():
+    from analyzing.aspect_based_sentiment_analyzer import AspectBasedSentimentAnalyzer
+    from service.cache import CachedAspectBasedSentimentAnalyzer
+
+    analyzer = AspectBasedSentimentAnalyzer(backend=_backend("ASPECT_BACKEND"))
+    cache = registry.get("result_cache")
+    return (
+        CachedAspectBasedSentimentAnalyzer(analyzer, cache)
+        if cache is not None
+        else analyzer
+    )
+
+
+registry = ModelRegistry()
+registry.register("scraper", _build_scraper)
+registry.register("review_store", _build_review_store)
+registry.register("result_cache", _build_result_cache)
+registry.register("job_queue", _build_job_queue)
+registry.register("deduplicator", _build_deduplicator)
+registry.register("summarizer", _build_summarizer)
+registry.register("sentiment_analyzer", _build_sentiment_analyzer)
+registry.register(
+    "aspect_based_sentiment_analyzer", _build_aspect_based_sentiment_analyzer
+)
@@ -0,0 +1,265 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Union
+from analyzing.aspect_based_sentiment_analyzer import AspectPairScorer
+from service.registry import ModelRegistry
+from utils.deadline import (
+    Deadline,
+    DeadlineExceeded,
+    JointDeadline,
+    current_deadline,
+    wait,
+)
+from utils.metrics import QUEUE_DEPTH
+
+
+class MicroBatcher:
+    """
+    Collects work submitted from many threads into batches and runs each batch
+    through a single handler call on a dedicated worker thread.
+
+    Submissions that arrive within `max_wait` seconds of the first one waiting are
+    merged, up to `max_batch_size` items, and every caller gets back exactly the
+    results for its own items. If a merged batch fails, every submission in it is
+    rerun on its own, so a caller only gets an exception its own items cause.
+
+    A batch runs under the deadlines of its callers (see `utils.deadline`), and stops
+    at its next deadline check once all of them have expired.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 64,
+        max_wait: float = 0.005,
+        name: Optional[str] = None,
+    ):
+        """
+        Args:
+            handler (Callable[[List[Any]], List[Any]]): Function that maps a list of items to a list of results of the same length.
+            max_batch_size (int): Number of items after which a batch is run without waiting further. Defaults to 64.
+            max_wait (float): Seconds to wait for more submissions after the first one. Defaults to 0.005.
+            name (Optional[str]): Name under which the queue depth is reported in the metrics. Not reported if None.
+        """
+        self._handler = handler
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+        # Set explicitly rather than with `set_function`, which Prometheus'
+        # multiprocess mode does not support.
+        self._depth = QUEUE_DEPTH.labels(name) if name is not None else None
+
+    def _ensure_started(self) -> None:
+        # Threads do not survive a fork, so a child process starts its own worker.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                threading.Thread(target=self._run, daemon=True).start()
+                self._pid = os.getpid()
+
+    def submit(self, items: List[Any]) -> Future:
+        """
+        Submit items to be processed in the next batch.
+
+        Args:
+            items (List[Any]): The items to process.
+
+        Returns:
+            Future: A future that resolves to the list of results for `items`.
+        """
+        self._ensure_started()
+        future = Future()
+        if not items:
+            future.set_result([])
+        else:
+            # The batch runs on the worker thread, so it carries the caller's deadline.
+            self._queue.put((items, future, current_deadline()))
+            self._report_depth()
+        return future
+
+    def queue_depth(self) -> int:
+        """
+        Returns:
+            int: Number of submissions waiting to be batched.
+        """
+        return self._queue.qsize()
+
+    def _report_depth(self) -> None:
+        if self._depth is not None:
+            self._depth.set(self._queue.qsize())
+
+    def _collect(self) -> List[tuple[List[Any], Future]]:
+        batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self._max_wait
+        while size < self._max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                submission = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(submission)
+            size += len(submission[0])
+        self._report_depth()
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = []
+            for items, future, deadline in self._collect():
+                if not future.set_running_or_notify_cancel():
+                    continue
+                if deadline is not None and deadline.expired():
+                    future.set_exception(
+                        DeadlineExceeded("The deadline passed while queued.")
+                    )
+                    continue
+                batch.append((items, future, deadline))
+            if not batch:
+                continue
+            deadlines = [deadline for _, _, deadline in batch]
+            try:
+                results = self._call(
+                    [item for items, _, _ in batch for item in items],
+                    (None if None in deadlines else JointDeadline(deadlines)),
+                )
+            except DeadlineExceeded as e:
+                # Every caller's deadline has expired.
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                    continue
+                # One submission's bad input should not fail the others merged with
+                # it, so every submission is retried on its own.
+                for items, future, deadline in batch:
+                    try:
+                        future.set_result(self._call(items, deadline))
+                    except Exception as e:
+                        future.set_exception(e)
+                continue
+            start = 0
+            for items, future, _ in batch:
+                future.set_result(results[start : start + len(items)])
+                start += len(items)
+
+    def _call(self, items: List[Any], deadline: Optional[Deadline]) -> List[Any]:
+        # The handler's deadline checks stop the batch once no caller waits for it.
+        if deadline is None:
+            return self._handler(items)
+        return deadline.run(self._handler, items)
+
+
+class BatchedSentimentAnalyzer:
+    """
+    Drop-in replacement for `SentimentAnalyzer` that routes work through a `MicroBatcher`.
+    """
+
+    def __init__(self, analyzer, **batcher_kwargs):
+        self._analyzer = analyzer
+        self._batcher = MicroBatcher(
+            self._analyzer.analyze_sentiments, name="sentiment", **batcher_kwargs
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._analyzer, name)
+
+    def analyze_sentiments(self, prompts: List[str], *args, **kwargs) -> List[dict]:
+        """
+        See `SentimentAnalyzer.analyze_sentiments`. Batching arguments are decided by the batcher.
+        """
+        return wait(self._batcher.submit(prompts))
+
+
+class BatchedAspectBasedSentimentAnalyzer(AspectPairScorer):
+    """
+    Drop-in replacement for `AspectBasedSentimentAnalyzer` that routes work through a `MicroBatcher`.
+    """
+
+    def __init__(self, analyzer, **batcher_kwargs):
+        self._analyzer = analyzer
+        self._batcher = MicroBatcher(
+            self._analyzer.score_pairs, name="aspect", **batcher_kwargs
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._analyzer, name)
+
+    def score_pairs(
+        self, pairs: List[tuple[str, str]], *args, **kwargs
+    ) -> List[dict[str, float]]:
+        """
+        See `AspectBasedSentimentAnalyzer.score_pairs`. Batching arguments are decided by the batcher.
+        """
+        return wait(self._batcher.submit(pairs))
+
+
+class BatchedSummarizer:
+    """
+    Drop-in replacement for `Summarizer` that routes work through a `MicroBatcher`.
+    """
+
+    def __init__(self, summarizer, **batcher_kwargs):
+        self._summarizer = summarizer
+        self._batcher = MicroBatcher(
+            self._summarizer.summarize_batch, name="summarizer", **batcher_kwargs
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._summarizer, name)
+
+    def summarize(self, prompt: Union[str, List[str]], *args, **kwargs) -> str:
+        """
+        See `Summarizer.summarize`.
+        """
+        return wait(self._batcher.submit([prompt]))[0]
+
+
+def install_batching(
+    registry: ModelRegistry,
+    max_batch_size: int = 64,
+    max_wait: float = 0.005,
+    max_summary_batch_size: int = 4,
+) -> None:
+    """
+    Wrap the analyzers in a registry so that concurrent callers share batched forward passes.
+    Analyzers that already are wrapped, e.g. by an earlier start of the API, are left as they are.
+
+    Args:
+        registry (ModelRegistry): The registry whose analyzers should be wrapped.
+        max_batch_size (int): Number of reviews or pairs gathered into one sentiment batch. Defaults to 64.
+        max_wait (float): Seconds a batch waits for more work after its first submission. Defaults to 0.005.
+        max_summary_batch_size (int): Number of summaries gathered into one batch. Defaults to 4.
+    """
+    registry.wrap(
+        "sentiment_analyzer",
+        lambda analyzer: BatchedSentimentAnalyzer(
+            analyzer, max_batch_size=max_batch_size, max_wait=max_wait
+        ),
+        key="batching",
+    )
+    registry.wrap(
+        "aspect_based_sentiment_analyzer",
+        lambda analyzer: BatchedAspectBasedSentimentAnalyzer(
+            analyzer, max_batch_size=max_batch_size, max_wait=max_wait
+        ),
+        key="batching",
+    )
+    registry.wrap(
+        "summarizer",
+        lambda summarizer: BatchedSummarizer(
+            summarizer, max_batch_size=max_summary_batch_size, max_wait=max_wait
+        ),
+        key="batching",
+    )
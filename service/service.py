@@ -1,16 +1,68 @@
 from pathlib import Path
-from typing import List
-import pandas as pd
-from analyzing.aspect_based_sentiment_analyzer import AspectBasedSentimentAnalyzer
-from analyzing.sentiment_analyzer import SentimentAnalyzer
-from analyzing.summarizer import Summarizer
-from scraping.serpapi_scraper import SerpapiScraper
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+from analyzing.aspect_index import AspectIndex
+from model.model import Order, Review
+from service.registry import registry
+from service.stats import AspectSentimentStats, SentimentStats
+from utils.metrics import count_items, timed, timed_iter
+from utils.utils import extract_walmart_product_id
 
-scraper = SerpapiScraper()
+if TYPE_CHECKING:
+    import pandas as pd
 
-summarizer = Summarizer()
-sentiment_analyzer = SentimentAnalyzer()
-aspect_based_sentiment_analyzer = AspectBasedSentimentAnalyzer()
+
+def scrape_reviews(
+    url: str,
+    count: int = 100,
+    sort: str = "relevancy",
+    incremental: bool = False,
+    progress: Optional[Callable[[int], None]] = None,
+) -> List[Review]:
+    """
+    Scrape reviews from a given URL and record them in the local review store.
+
+    In incremental mode reviews are scraped newest first and paging stops at the first
+    review that is already stored, so refreshing a product only fetches its new reviews.
+
+    Args:
+        url (str): The product URL to scrape reviews from
+        count (int): Number of reviews to scrape. Defaults to 100.
+        sort (str): Sorting method for reviews. Ignored in incremental mode. Defaults to "relevancy".
+        incremental (bool): Whether to only scrape reviews newer than the stored ones. Defaults to False.
+        progress (Optional[Callable[[int], None]]): Called with the number of reviews scraped so far
+            after every review. An exception raised by it aborts the scrape.
+
+    Returns:
+        List[Review]: The scraped reviews or, in incremental mode, the newest `count` stored reviews.
+    """
+    product_id = extract_walmart_product_id(url)
+    store = registry.get("review_store")
+    scraper = registry.get("scraper")
+
+    known_ids = store.known_ids(product_id) if incremental else set()
+    # Paging stops early in incremental mode, so pages are not fetched ahead.
+    generator = scraper.extract_reviews(
+        url,
+        count,
+        Order.submission_desc.value if incremental else sort,
+        prefetch=not incremental,
+    )
+    reviews = []
+    with timed("scrape"):
+        try:
+            for review in generator:
+                if review.id in known_ids:
+                    break
+                reviews.append(review)
+                if progress is not None:
+                    progress(len(reviews))
+        finally:
+            generator.close()
+    count_items("scrape", len(reviews))
+
+    with timed("store.write", len(reviews)):
+        store.add(product_id, reviews)
+    return store.reviews(product_id, limit=count) if incremental else reviews
 
 
 def reviews_to_csv(
@@ -18,7 +70,8 @@ def reviews_to_csv(
     count: int = 100,
     sort: str = "relevancy",
     destination: Path = None,
-) -> pd.DataFrame:
+    incremental: bool = False,
+) -> "pd.DataFrame":
     """
     Scrape reviews from a given URL and save them to a CSV file.
 
@@ -27,9 +80,10 @@ def reviews_to_csv(
         count (int): Number of reviews to scrape. Defaults to 100.
         sort (str): Sorting method for reviews. Defaults to "relevancy".
         destination (Path): Path where the CSV file will be saved. Defaults to "reviews.csv".
+        incremental (bool): Whether to only scrape reviews newer than the stored ones, see `scrape_reviews`. Defaults to False.
 
     Returns:
-        pd.DataFrame: DataFrame containing the scraped reviews.
+        pd.DataFrame: DataFrame containing the scraped reviews with their ids, ratings and submission dates.
 
     Example:
         >>> reviews_df = reviews_to_csv(
@@ -39,40 +93,245 @@ def reviews_to_csv(
         ...     destination=Path("product_reviews.csv")
         ... )
     """
-    generator = scraper.extract_reviews(url, count, sort)
-    reviews = pd.DataFrame(generator)
-    reviews.columns = ["review"]
+    import pandas as pd
+
+    reviews = pd.DataFrame(
+        [
+            {
+                "review": review.text,
+                "review_id": review.id,
+                "rating": review.rating,
+                "submitted_at": review.submitted_at,
+            }
+            for review in scrape_reviews(url, count, sort, incremental)
+        ],
+        columns=["review", "review_id", "rating", "submitted_at"],
+    )
 
     if destination is not None:
-        reviews.to_csv(destination, index=False)
+        with timed("csv.write", len(reviews)):
+            reviews.to_csv(destination, index=False)
     return reviews
 
 
-def summarize_reviews(source: Path) -> str:
+def summarize(reviews: List[str], budget: Optional[int] = None) -> str:
+    """
+    Summarize a list of reviews.
+
+    Args:
+        reviews (List[str]): The reviews to summarize.
+        budget (Optional[int]): If given, only a representative subset of the reviews'
+            sentences of at most this many tokens is summarized, see `Summarizer.select`.
+
+    Returns:
+        str: Summary of the reviews.
+    """
+    summarizer = registry.get("summarizer")
+    if budget is not None:
+        reviews = summarizer.select(reviews, budget)
+    return summarizer.summarize(reviews)
+
+
+def summarize_reviews(
+    source: Path, workers: int = 1, budget: Optional[int] = None
+) -> str:
     """
     Summarize the reviews.
 
     Args:
         source (Path): Path to the CSV file containing reviews.
+        workers (int): Number of processes to spread the work over, see `service.parallel`. Not used with a `budget`. Defaults to 1.
+        budget (Optional[int]): If given, only a representative subset of the reviews'
+            sentences of at most this many tokens is summarized, see `Summarizer.select`.
 
     Returns:
         str: Summary of the reviews.
     """
-    reviews = pd.read_csv(source)["review"].to_list()
-    summary = summarizer.summarize(reviews)
-    return summary
+    import pandas as pd
+
+    with timed("csv.read"):
+        reviews = pd.read_csv(source)["review"].to_list()
+    # A budgeted summary is a single short pass, which gains nothing from workers.
+    if workers > 1 and budget is None:
+        from service.parallel import parallel_summarize
+
+        return parallel_summarize(reviews, workers)
+    return summarize(reviews, budget)
+
+
+def _representatives(reviews: List[str]) -> List[int]:
+    deduplicator = registry.get("deduplicator")
+    if deduplicator is None:
+        return list(range(len(reviews)))
+    return deduplicator.representatives(reviews)
+
+
+def _score_aspects(
+    reviews_df: "pd.DataFrame", index: AspectIndex, batch_size: int
+) -> "pd.DataFrame":
+    import pandas as pd
+
+    reviews = reviews_df["review"].tolist()
+    representatives = _representatives(reviews)
+    with timed("aspect.match", len(reviews)):
+        matches = index.pairs(reviews)
+
+    # A duplicate reuses its representative's score for an aspect both of them
+    # mention; near duplicates that differ in their aspects are scored themselves.
+    matched = set(matches)
+    sources = [
+        (
+            representatives[position]
+            if (representatives[position], aspect) in matched
+            else position
+        )
+        for position, aspect in matches
+    ]
+    pairs = list(dict.fromkeys(zip(sources, (aspect for _, aspect in matches))))
+    sentiments = dict(
+        zip(
+            pairs,
+            registry.get("aspect_based_sentiment_analyzer").score_pairs(
+                [(reviews[source], aspect) for source, aspect in pairs], batch_size
+            ),
+        )
+    )
+    analysis = [
+        (position, aspect, sentiments[source, aspect])
+        for (position, aspect), source in zip(matches, sources)
+    ]
+
+    results_df = pd.DataFrame(
+        [
+            {
+                "review": reviews[position],
+                "aspect": aspect,
+                "label": sentiment["label"].upper(),
+                "score": round(sentiment["score"], 5),
+            }
+            for position, aspect, sentiment in analysis
+        ],
+        columns=["review", "aspect", "label", "score"],
+        index=reviews_df.index[[position for position, _, _ in analysis]],
+    )
+    results_df.sort_values(
+        by=["aspect", "label", "score"], ascending=[True, True, False], inplace=True
+    )
+    results_df.attrs["collapsed"] = len(reviews) - len(set(representatives))
+    return results_df
+
+
+def _score_general(reviews_df: "pd.DataFrame", batch_size: int) -> "pd.DataFrame":
+    reviews_df = reviews_df.copy()
+
+    reviews = reviews_df["review"].tolist()
+    representatives = _representatives(reviews)
+    unique = list(dict.fromkeys(representatives))
+    results = dict(
+        zip(
+            unique,
+            registry.get("sentiment_analyzer").analyze_sentiments(
+                [reviews[position] for position in unique], batch_size=batch_size
+            ),
+        )
+    )
+
+    reviews_df["label"] = [results[position]["label"] for position in representatives]
+    reviews_df["score"] = [
+        round(results[position]["score"], 5) for position in representatives
+    ]
+    # Only a cascade (see `analyzing.cascade`) reports which tier labeled a review.
+    if any("tier" in result for result in results.values()):
+        reviews_df["tier"] = [results[position]["tier"] for position in representatives]
+    reviews_df.attrs["collapsed"] = len(reviews) - len(unique)
+    return reviews_df
+
+
+def analyze_aspect_based_sentiment(
+    reviews_df: "pd.DataFrame",
+    aspects: List[str],
+    batch_size: int = 32,
+    synonyms: Optional[Dict[str, List[str]]] = None,
+) -> tuple["pd.DataFrame", dict[str, dict]]:
+    """
+    Analyze sentiment of in-memory reviews for specific aspects.
+
+    Duplicate and near-duplicate reviews are only scored once, see `analyzing.dedup`.
+    The number of reviews collapsed this way is in the `attrs["collapsed"]` of the
+    returned DataFrame.
+
+    Args:
+        reviews_df (pd.DataFrame): DataFrame with a "review" column.
+        aspects (List[str]): List of aspects to analyze in the reviews.
+        batch_size (int): Number of (review, aspect) pairs per forward pass. Defaults to 32.
+        synonyms (Optional[Dict[str, List[str]]]): Alternative terms that also count as a mention of an aspect.
+
+    Returns:
+        tuple[pd.DataFrame, dict[str, dict]]: A tuple containing:
+            - DataFrame with "review", "aspect", "label" and "score" columns, one row per
+              mentioned aspect, indexed by the row of `reviews_df` the review came from
+            - Per-aspect statistics as returned by `aspect_based_sentiment_analysis`
+    """
+    results_df = _score_aspects(reviews_df, AspectIndex(aspects, synonyms), batch_size)
+    stats = AspectSentimentStats()
+    with timed("stats.aggregate"):
+        stats.update(results_df)
+    return results_df, stats.aspects()
+
+
+def group_aspect_results(
+    reviews_df: "pd.DataFrame", results_df: "pd.DataFrame"
+) -> List[dict]:
+    """
+    Group aspect-based results by the review they belong to.
+
+    Args:
+        reviews_df (pd.DataFrame): The analyzed DataFrame with a "review" column.
+        results_df (pd.DataFrame): Results as returned by `analyze_aspect_based_sentiment`.
+
+    Returns:
+        List[dict]: One dictionary per review that mentions an aspect, in the order of
+            `reviews_df`, with the "review" and the "aspect", "label" and "score" "details".
+    """
+    details = {}
+    for index, aspect, label, score in results_df[
+        ["aspect", "label", "score"]
+    ].itertuples():
+        details.setdefault(index, []).append(
+            {"aspect": aspect, "label": label, "score": score}
+        )
+    return [
+        {"review": review, "details": details[index]}
+        for index, review in reviews_df["review"].items()
+        if index in details
+    ]
 
 
 def aspect_based_sentiment_analysis(
-    source: Path, destination: Path, aspects: List[str]
+    source: Path,
+    destination: Path,
+    aspects: List[str],
+    batch_size: int = 32,
+    synonyms: Optional[Dict[str, List[str]]] = None,
+    chunk_size: Optional[int] = None,
+    workers: int = 1,
 ) -> dict[str, List[tuple[str, str, float]]]:
     """
     Analyze sentiment of reviews for specific aspects.
 
+    With `chunk_size`, the source is read and scored `chunk_size` rows at a time and
+    every chunk's results are appended to the destination right away, so memory use
+    does not grow with the size of the file. Results are then sorted within each
+    chunk rather than across the whole file.
+
     Args:
         source (Path): Path to the CSV file containing reviews.
         destination (Path): Path to save the updated CSV file with sentiment analysis results.
         aspects (List[str]): List of aspects to analyze in the reviews.
+        batch_size (int): Number of (review, aspect) pairs per forward pass. Defaults to 32.
+        synonyms (Optional[Dict[str, List[str]]]): Alternative terms that also count as a mention of an aspect.
+        chunk_size (Optional[int]): Number of rows to process at a time. The whole file at once if None.
+        workers (int): Number of processes to spread the work over, see `service.parallel`. Defaults to 1.
 
     Returns:
         dict[str, List[tuple[str, str, float]]]: A dictionary where:
@@ -82,70 +341,90 @@ def aspect_based_sentiment_analysis(
                 - sentiment label (str)
                 - sentiment score (float)
     """
-    reviews_df = pd.read_csv(source)
-    results_df = pd.DataFrame()
-
-    for _, row in reviews_df.iterrows():
-        review = row["review"]
-        analysis = aspect_based_sentiment_analyzer.analyze_sentiment(review, aspects)
-
-        for result in analysis:
-            if result and isinstance(result, tuple):
-                aspect, sentiment = result
-                results_df = pd.concat(
-                    [
-                        results_df,
-                        pd.DataFrame(
-                            [
-                                {
-                                    "review": review,
-                                    "aspect": aspect,
-                                    "label": sentiment["label"].upper(),
-                                    "score": round(sentiment["score"], 5),
-                                }
-                            ]
-                        ),
-                    ]
-                )
+    import pandas as pd
+
+    if workers > 1:
+        from service.parallel import parallel_aspect_based_sentiment_analysis
+
+        return parallel_aspect_based_sentiment_analysis(
+            source, destination, aspects, workers, batch_size, synonyms, chunk_size
+        )
+
+    if chunk_size is None:
+        with timed("csv.read"):
+            reviews_df = pd.read_csv(source)
+        results_df, result = analyze_aspect_based_sentiment(
+            reviews_df, aspects, batch_size, synonyms
+        )
+        with timed("csv.write", len(results_df)):
+            results_df.to_csv(destination, index=False)
+        return result
+
+    index = AspectIndex(aspects, synonyms)
+    stats = AspectSentimentStats()
+    for position, reviews_df in enumerate(
+        timed_iter("csv.read", pd.read_csv(source, chunksize=chunk_size))
+    ):
+        results_df = _score_aspects(reviews_df, index, batch_size)
+        with timed("stats.aggregate"):
+            stats.update(results_df)
+        with timed("csv.write", len(results_df)):
+            results_df.to_csv(
+                destination,
+                index=False,
+                mode="w" if position == 0 else "a",
+                header=position == 0,
+            )
+    return stats.aspects()
+
+
+def analyze_general_sentiment(
+    reviews_df: "pd.DataFrame", batch_size: int = 32
+) -> tuple["pd.DataFrame", tuple[int, int, str, str]]:
+    """
+    Analyze sentiment of in-memory reviews.
 
-    results_df.sort_values(
-        by=["aspect", "label", "score"], ascending=[True, True, False], inplace=True
-    )
+    Duplicate and near-duplicate reviews are only scored once, see `analyzing.dedup`.
+    The number of reviews collapsed this way is in the `attrs["collapsed"]` of the
+    returned DataFrame.
 
-    result = {}
-    for aspect_name, group in results_df.groupby("aspect"):
-        positive_reviews = group[group["label"] == "POSITIVE"]
-        negative_reviews = group[group["label"] == "NEGATIVE"]
-
-        result[aspect_name] = {
-            "positive_count": len(positive_reviews),
-            "neutral_count": len(group[group["label"] == "NEUTRAL"]),
-            "negative_count": len(negative_reviews),
-            "most_positive_review": (
-                positive_reviews.iloc[positive_reviews["score"].argmax()]["review"]
-                if not positive_reviews.empty
-                else None
-            ),
-            "most_negative_review": (
-                negative_reviews.iloc[negative_reviews["score"].argmax()]["review"]
-                if not negative_reviews.empty
-                else None
-            ),
-        }
+    Args:
+        reviews_df (pd.DataFrame): DataFrame with a "review" column.
+        batch_size (int): Number of reviews per forward pass. Defaults to 32.
 
-    results_df.to_csv(destination, index=False)
-    return result
+    Returns:
+        tuple[pd.DataFrame, tuple[int, int, str, str]]: A tuple containing:
+            - Copy of `reviews_df` with "label" and "score" columns added, in the same row order,
+              and a "tier" column if the sentiment analyzer is a cascade
+            - Statistics as returned by `general_sentiment_analysis`
+    """
+    reviews_df = _score_general(reviews_df, batch_size)
+    stats = SentimentStats()
+    with timed("stats.aggregate"):
+        stats.update(reviews_df)
+    return reviews_df, stats.general()
 
 
 def general_sentiment_analysis(
-    source: Path, destination: Path
+    source: Path,
+    destination: Path,
+    batch_size: int = 32,
+    chunk_size: Optional[int] = None,
+    workers: int = 1,
 ) -> tuple[int, int, str, str]:
     """
     Analyze sentiment of reviews and save results back to CSV.
 
+    With `chunk_size`, the source is read and scored `chunk_size` rows at a time and
+    every chunk's results are appended to the destination right away, so memory use
+    does not grow with the size of the file.
+
     Args:
         source (Path): Path to the CSV file containing reviews.
         destination (Path): Path to save the updated CSV file with sentiment analysis results.
+        batch_size (int): Number of reviews per forward pass. Defaults to 32.
+        chunk_size (Optional[int]): Number of rows to process at a time. The whole file at once if None.
+        workers (int): Number of processes to spread the work over, see `service.parallel`. Defaults to 1.
 
     Returns:
         tuple[int, int, str, str]: A tuple containing:
@@ -154,31 +433,35 @@ def general_sentiment_analysis(
             - Most positive review (highest positive sentiment score)
             - Most negative review (highest negative sentiment score)
     """
-    reviews_df = pd.read_csv(source)
-
-    results = reviews_df["review"].apply(sentiment_analyzer.analyze_sentiment)
-
-    reviews_df["label"] = results.apply(lambda x: x[0]["label"])
-    reviews_df["score"] = results.apply(lambda x: round(x[0]["score"], 5))
-
-    positive_df = reviews_df[reviews_df["label"] == "POSITIVE"]
-    negative_df = reviews_df[reviews_df["label"] == "NEGATIVE"]
-
-    positive_count = len(positive_df)
-    negative_count = len(negative_df)
-
-    most_positive_review = (
-        positive_df.loc[positive_df["score"].idxmax(), "review"]
-        if not positive_df.empty
-        else ""
-    )
-
-    most_negative_review = (
-        negative_df.loc[negative_df["score"].idxmax(), "review"]
-        if not negative_df.empty
-        else ""
-    )
-
-    reviews_df.to_csv(destination, index=False)
-
-    return positive_count, negative_count, most_positive_review, most_negative_review
+    import pandas as pd
+
+    if workers > 1:
+        from service.parallel import parallel_general_sentiment_analysis
+
+        return parallel_general_sentiment_analysis(
+            source, destination, workers, batch_size, chunk_size
+        )
+
+    if chunk_size is None:
+        with timed("csv.read"):
+            reviews_df = pd.read_csv(source)
+        reviews_df, stats = analyze_general_sentiment(reviews_df, batch_size)
+        with timed("csv.write", len(reviews_df)):
+            reviews_df.to_csv(destination, index=False)
+        return stats
+
+    stats = SentimentStats()
+    for position, reviews_df in enumerate(
+        timed_iter("csv.read", pd.read_csv(source, chunksize=chunk_size))
+    ):
+        reviews_df = _score_general(reviews_df, batch_size)
+        with timed("stats.aggregate"):
+            stats.update(reviews_df)
+        with timed("csv.write", len(reviews_df)):
+            reviews_df.to_csv(
+                destination,
+                index=False,
+                mode="w" if position == 0 else "a",
+                header=position == 0,
+            )
+    return stats.general()
@@ -0,0 +1,127 @@
+from typing import TYPE_CHECKING, Dict, Optional
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class SentimentStats:
+    """
+    Running per-label statistics of sentiment results: the number of results and the
+    highest-scoring review of every label.
+
+    Statistics can be updated chunk by chunk and merged, so they never require the full
+    result set to be in memory.
+    """
+
+    def __init__(self):
+        self._counts: Dict[str, int] = {}
+        self._best: Dict[str, tuple[float, str]] = {}
+
+    def update(self, results_df: "pd.DataFrame") -> None:
+        """
+        Add results to the statistics.
+
+        Args:
+            results_df (pd.DataFrame): DataFrame with "review", "label" and "score" columns.
+        """
+        for label, group in results_df.groupby("label", sort=False):
+            self._counts[label] = self._counts.get(label, 0) + len(group)
+            position = group["score"].to_numpy().argmax()
+            self._offer(
+                label, group["score"].iat[position], group["review"].iat[position]
+            )
+
+    def merge(self, other: "SentimentStats") -> None:
+        """
+        Add the statistics of results accumulated elsewhere, e.g. in another process.
+
+        Args:
+            other (SentimentStats): The statistics to add.
+        """
+        for label, count in other._counts.items():
+            self._counts[label] = self._counts.get(label, 0) + count
+        for label, (score, review) in other._best.items():
+            self._offer(label, score, review)
+
+    def _offer(self, label: str, score: float, review: str) -> None:
+        # Ties keep the review seen first, like idxmax does.
+        if label not in self._best or score > self._best[label][0]:
+            self._best[label] = (score, review)
+
+    def count(self, label: str) -> int:
+        """
+        Args:
+            label (str): The sentiment label.
+
+        Returns:
+            int: Number of results with the label.
+        """
+        return self._counts.get(label, 0)
+
+    def most(self, label: str) -> Optional[str]:
+        """
+        Args:
+            label (str): The sentiment label.
+
+        Returns:
+            Optional[str]: The review with the highest score for the label, or None if there is none.
+        """
+        best = self._best.get(label)
+        return best[1] if best is not None else None
+
+    def general(self) -> tuple[int, int, str, str]:
+        """
+        Returns:
+            tuple[int, int, str, str]: The statistics as returned by `general_sentiment_analysis`.
+        """
+        return (
+            self.count("POSITIVE"),
+            self.count("NEGATIVE"),
+            self.most("POSITIVE") or "",
+            self.most("NEGATIVE") or "",
+        )
+
+
+class AspectSentimentStats:
+    """
+    Running `SentimentStats` for every aspect.
+    """
+
+    def __init__(self):
+        self._aspects: Dict[str, SentimentStats] = {}
+
+    def update(self, results_df: "pd.DataFrame") -> None:
+        """
+        Add results to the statistics.
+
+        Args:
+            results_df (pd.DataFrame): DataFrame with "review", "aspect", "label" and "score" columns.
+        """
+        for aspect, group in results_df.groupby("aspect", sort=False):
+            self._aspects.setdefault(aspect, SentimentStats()).update(group)
+
+    def merge(self, other: "AspectSentimentStats") -> None:
+        """
+        Add the statistics of results accumulated elsewhere, e.g. in another process.
+
+        Args:
+            other (AspectSentimentStats): The statistics to add.
+        """
+        for aspect, stats in other._aspects.items():
+            self._aspects.setdefault(aspect, SentimentStats()).merge(stats)
+
+    def aspects(self) -> dict[str, dict]:
+        """
+        Returns:
+            dict[str, dict]: The statistics as returned by `aspect_based_sentiment_analysis`.
+        """
+        return {
+            aspect: {
+                "positive_count": stats.count("POSITIVE"),
+                "neutral_count": stats.count("NEUTRAL"),
+                "negative_count": stats.count("NEGATIVE"),
+                "most_positive_review": stats.most("POSITIVE"),
+                "most_negative_review": stats.most("NEGATIVE"),
+            }
+            for aspect, stats in sorted(self._aspects.items())
+        }
@@ -0,0 +1,58 @@
+import logging
+import threading
+from service.registry import ModelRegistry
+
+# Models loaded and warmed before the API reports itself ready.
+WARM_MODELS = ["sentiment_analyzer", "aspect_based_sentiment_analyzer", "summarizer"]
+
+_ready = threading.Event()
+_logger = logging.getLogger(__name__)
+
+
+def warm_up(registry: ModelRegistry, share: bool = False) -> None:
+    """
+    Build every model in `WARM_MODELS` and run a sample input through it, then mark
+    the process as ready.
+
+    Args:
+        registry (ModelRegistry): The registry to build the models from.
+        share (bool): Move the weights into shared memory, for processes forked afterwards. Defaults to False.
+    """
+    for name in WARM_MODELS:
+        model = registry.get(name)
+        # Stub models used in tests and benchmarks have nothing to warm up.
+        if hasattr(model, "warm_up"):
+            model.warm_up(share=share)
+    _ready.set()
+
+
+def warm_up_in_background(registry: ModelRegistry) -> threading.Thread:
+    """
+    Run `warm_up` on a background thread. A failure is logged and leaves the process
+    not ready.
+
+    Args:
+        registry (ModelRegistry): The registry to build the models from.
+
+    Returns:
+        threading.Thread: The started thread.
+    """
+
+    def run() -> None:
+        try:
+            warm_up(registry)
+        except Exception:
+            _logger.exception("Model warmup failed.")
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def is_ready() -> bool:
+    """
+    Returns:
+        bool: True once every model has been warmed up in this process, or in the
+            parent it was forked from.
+    """
+    return _ready.is_set()
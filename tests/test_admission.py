@@ -0,0 +1,57 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from api.admission import AdmissionController, EndpointLimits
+from service.scheduler import MicroBatcher
+from utils.deadline import wait
+from test_scheduler import Rounds
+
+
+class Client:
+    def __init__(self, disconnected: bool = False):
+        self.disconnected = disconnected
+
+    async def is_disconnected(self) -> bool:
+        return self.disconnected
+
+
+def test_timed_out_batched_work_holds_its_slot_until_it_stops():
+    handler = Rounds(rounds=6, seconds=0.2)
+    batcher = MicroBatcher(handler)
+    admission = AdmissionController(
+        {"summarize": EndpointLimits(max_in_flight=1, timeout=0.3)}
+    )
+
+    async def scenario():
+        with pytest.raises(HTTPException) as timed_out:
+            await admission.run(
+                Client(), "summarize", lambda: wait(batcher.submit(["a"]))
+            )
+        assert timed_out.value.status_code == 504
+        # The abandoned batch still runs, so the endpoint stays saturated.
+        assert admission.in_flight("summarize") == 1
+        with pytest.raises(HTTPException) as busy:
+            await admission.run(Client(), "summarize", lambda: None)
+        assert busy.value.status_code == 503
+        while admission.in_flight("summarize"):
+            await asyncio.sleep(0.05)
+
+    asyncio.run(scenario())
+    assert not handler.running.is_set()
+    assert handler.done < handler.rounds
+
+
+def test_oversized_requests_are_rejected():
+    admission = AdmissionController({"analyze": EndpointLimits(max_reviews=2)})
+    with pytest.raises(HTTPException) as rejected:
+        asyncio.run(admission.run(Client(), "analyze", lambda: None, reviews=["a"] * 3))
+    assert rejected.value.status_code == 413
+
+
+def test_disconnect_cancels_the_work():
+    handler = Rounds(rounds=20, seconds=0.05)
+    admission = AdmissionController({"analyze": EndpointLimits(timeout=10)})
+    with pytest.raises(HTTPException) as disconnected:
+        asyncio.run(admission.run(Client(disconnected=True), "analyze", handler, ["a"]))
+    assert disconnected.value.status_code == 499
+    assert handler.done < handler.rounds
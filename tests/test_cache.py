@@ -0,0 +1,27 @@
+from service.cache import ResultCache
+
+
+def test_counts_entries_only_when_full(tmp_path):
+    cache = ResultCache(tmp_path / "results.sqlite", max_entries=100, memory_entries=0)
+    statements = []
+    cache._connection.set_trace_callback(statements.append)
+    for number in range(250):
+        cache.put_many({f"key{number}": number})
+
+    (count,) = cache._connection.execute("SELECT COUNT(*) FROM results").fetchone()
+    assert count <= 100
+    assert sum("COUNT(*)" in statement for statement in statements) <= 25
+    assert cache.get_many(["key249"]) == {"key249": 249}
+    assert cache.get_many(["key0"]) == {}
+
+
+def test_evicts_the_oldest_entries_on_disk(tmp_path):
+    cache = ResultCache(tmp_path / "results.sqlite", max_entries=10, memory_entries=0)
+    for number in range(10):
+        cache.put_many({f"key{number}": number})
+    # A hit does not renew an entry on disk.
+    assert cache.get_many(["key0"]) == {"key0": 0}
+    cache.put_many({"key10": 10})
+
+    assert cache.get_many(["key0"]) == {}
+    assert cache.get_many(["key10"]) == {"key10": 10}
@@ -0,0 +1,41 @@
+import socketserver
+import threading
+import pytest
+import service.daemon as daemon_module
+from service.daemon import COMMANDS, DaemonError, ReviewDaemon, request
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    # Serves commands on a socket without loading any models.
+    monkeypatch.setenv("CASCADE_THRESHOLD", "0.9")
+    monkeypatch.setattr(daemon_module, "_counters", lambda: {"cache": None})
+    monkeypatch.setitem(COMMANDS, "analyze", lambda args: args["value"] * 2)
+    monkeypatch.setitem(COMMANDS, "summarize", lambda args: 1 / 0)
+    path = tmp_path / "daemon.sock"
+    daemon = ReviewDaemon(path, idle_timeout=None)
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            daemon._handle(self.rfile, self.wfile)
+
+    server = socketserver.ThreadingUnixStreamServer(str(path), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield path
+    server.shutdown()
+    server.server_close()
+
+
+def test_runs_commands_with_matching_settings(daemon):
+    response = request("analyze", {"value": 21}, path=daemon)
+    assert response["result"] == 42
+
+
+def test_falls_back_when_settings_differ(daemon, monkeypatch):
+    monkeypatch.setenv("CASCADE_THRESHOLD", "0.8")
+    assert request("analyze", {"value": 21}, path=daemon) is None
+
+
+def test_raises_when_a_command_fails(daemon):
+    with pytest.raises(DaemonError, match="ZeroDivisionError"):
+        request("summarize", path=daemon)
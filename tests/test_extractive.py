@@ -0,0 +1,34 @@
+from analyzing.extractive import select_sentences
+
+
+def count_words(texts):
+    return [len(text.split()) for text in texts]
+
+
+def test_returns_texts_that_fit_the_budget():
+    texts = ["Great battery life. Sturdy case.", "Buttons are sticky."]
+    assert select_sentences(texts, 100, count_words) == texts
+
+
+def test_picks_sentences_within_the_budget():
+    texts = [
+        f"The battery lasts about {day} days on a single charge." for day in range(50)
+    ]
+    picked = select_sentences(texts, 40, count_words)
+    assert picked
+    assert sum(count_words(picked)) + len(picked) <= 40
+
+
+def test_falls_back_to_short_sentences():
+    texts = [f"Love it {word}!" for word in ["so", "a", "lot", "really", "here"]] * 3
+    texts += [f"Great buy number{number}!" for number in range(40)]
+    picked = select_sentences(texts, 20, count_words, min_words=4)
+    assert picked
+    assert sum(count_words(picked)) + len(picked) <= 20
+
+
+def test_truncates_a_sentence_over_the_budget():
+    texts = [" ".join(["word"] * 200) + f" end{number}" for number in range(3)]
+    picked = select_sentences(texts, 10, count_words)
+    assert len(picked) == 1
+    assert 0 < count_words(picked)[0] <= 9
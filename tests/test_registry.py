@@ -0,0 +1,37 @@
+from service.registry import ModelRegistry
+from service.scheduler import BatchedSentimentAnalyzer, install_batching
+
+
+class Stub:
+    def analyze_sentiments(self, prompts, batch_size=32):
+        return [{"label": "POSITIVE", "score": 1.0} for _ in prompts]
+
+
+def make_registry():
+    registry = ModelRegistry()
+    for name in ["sentiment_analyzer", "aspect_based_sentiment_analyzer", "summarizer"]:
+        registry.register(name, Stub)
+    return registry
+
+
+def test_installs_batching_once():
+    registry = make_registry()
+    install_batching(registry)
+    install_batching(registry)
+
+    analyzer = registry.get("sentiment_analyzer")
+    assert isinstance(analyzer, BatchedSentimentAnalyzer)
+    assert isinstance(analyzer._analyzer, Stub)
+    install_batching(registry)
+    assert registry.get("sentiment_analyzer") is analyzer
+    assert analyzer.analyze_sentiments(["Great"]) == [
+        {"label": "POSITIVE", "score": 1.0}
+    ]
+
+
+def test_registering_again_drops_the_wrappers():
+    registry = make_registry()
+    install_batching(registry)
+    registry.register("sentiment_analyzer", Stub)
+    assert isinstance(registry.get("sentiment_analyzer"), Stub)
+    assert registry.wrap("sentiment_analyzer", lambda analyzer: analyzer, "batching")
@@ -0,0 +1,83 @@
+import threading
+import time
+import pytest
+from service.scheduler import MicroBatcher
+from utils.deadline import Deadline, DeadlineExceeded, check_deadline, wait
+
+
+class Rounds:
+    """
+    A handler that works in rounds, checking the deadline between them like the summarizer.
+    """
+
+    def __init__(self, rounds: int = 6, seconds: float = 0.1):
+        self.rounds = rounds
+        self.seconds = seconds
+        self.done = 0
+        self.running = threading.Event()
+
+    def __call__(self, items):
+        self.running.set()
+        try:
+            for _ in range(self.rounds):
+                check_deadline()
+                time.sleep(self.seconds)
+                self.done += 1
+            return [item.upper() for item in items]
+        finally:
+            self.running.clear()
+
+
+def test_results_go_to_their_callers():
+    batcher = MicroBatcher(lambda items: [item.upper() for item in items])
+    futures = [batcher.submit([f"a{i}", f"b{i}"]) for i in range(5)]
+    assert [future.result() for future in futures] == [
+        [f"A{i}", f"B{i}"] for i in range(5)
+    ]
+
+
+def test_failure_only_reaches_the_failing_submission():
+    def handler(items):
+        time.sleep(0.05)
+        if "bad" in items:
+            raise ValueError("bad item")
+        return [item.upper() for item in items]
+
+    batcher = MicroBatcher(handler, max_wait=0.05)
+    good, bad = batcher.submit(["a"]), batcher.submit(["bad"])
+    assert good.result() == ["A"]
+    with pytest.raises(ValueError):
+        bad.result()
+
+
+def test_expired_deadline_stops_the_batch_on_the_worker_thread():
+    handler = Rounds()
+    batcher = MicroBatcher(handler)
+    with pytest.raises(DeadlineExceeded):
+        Deadline(0.25).run(lambda: wait(batcher.submit(["a"])))
+    # The caller only returns once the batch has stopped at a deadline check.
+    assert not handler.running.is_set()
+    assert handler.done < handler.rounds
+
+
+def test_batch_runs_on_while_a_merged_caller_still_waits():
+    handler = Rounds(rounds=4)
+    batcher = MicroBatcher(handler, max_wait=0.05)
+    results = {}
+
+    def call(name, timeout):
+        try:
+            results[name] = Deadline(timeout).run(lambda: wait(batcher.submit([name])))
+        except DeadlineExceeded:
+            results[name] = "expired"
+
+    threads = [
+        threading.Thread(target=call, args=("short", 0.15)),
+        threading.Thread(target=call, args=("long", 10)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {"short": "expired", "long": ["LONG"]}
+    assert handler.done == handler.rounds
@@ -0,0 +1,175 @@
+"""
+Deadlines for work that runs on a worker thread.
+
+The caller creates a `Deadline` and runs the work with `Deadline.run`. The work does
+not need to know about it: long-running loops call `check_deadline` between steps, and
+waits on futures go through `wait`. Both raise `DeadlineExceeded` once the deadline
+has passed or has been cancelled, e.g. because the client that asked for the work has
+disconnected. Outside `Deadline.run` they do nothing, so CLI and batch work is unaffected.
+"""
+
+import time
+import threading
+from concurrent.futures import Future
+from contextvars import ContextVar
+from typing import Any, Callable, Iterable, Optional
+
+# How often a wait on a future checks whether its deadline has been cancelled.
+_POLL_INTERVAL = 0.1
+
+_current: ContextVar[Optional["Deadline"]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised inside work whose deadline has passed or has been cancelled.
+    """
+
+
+class Deadline:
+    """
+    A point in time after which work should stop, which can also be cancelled early.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        """
+        Args:
+            timeout (Optional[float]): Seconds from now until the deadline. Never expires if None.
+        """
+        self._expires = time.monotonic() + timeout if timeout is not None else None
+        self._cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        """
+        Expire the deadline now.
+        """
+        self._cancelled.set()
+
+    def remaining(self) -> Optional[float]:
+        """
+        Returns:
+            Optional[float]: Seconds left, 0 if expired or cancelled, None if there is no time limit.
+        """
+        if self._cancelled.is_set():
+            return 0.0
+        if self._expires is None:
+            return None
+        return max(0.0, self._expires - time.monotonic())
+
+    def expired(self) -> bool:
+        """
+        Returns:
+            bool: True if the deadline has passed or has been cancelled.
+        """
+        return self.remaining() == 0.0
+
+    def check(self) -> None:
+        """
+        Raises:
+            DeadlineExceeded: If the deadline has passed or has been cancelled.
+        """
+        if self.expired():
+            raise DeadlineExceeded("The deadline has passed or the work was cancelled.")
+
+    def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Call a function with this deadline as the current one.
+
+        Args:
+            func (Callable[..., Any]): The function to call.
+            *args: Positional arguments of the function.
+            **kwargs: Keyword arguments of the function.
+
+        Returns:
+            Any: What the function returns.
+
+        Raises:
+            DeadlineExceeded: If the deadline has already passed, or the function checks it after it passed.
+        """
+        self.check()
+        token = _current.set(self)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.reset(token)
+
+
+class JointDeadline(Deadline):
+    """
+    A deadline shared by work done for several callers at once, e.g. a merged batch.
+    It only expires once the deadlines of all callers have.
+    """
+
+    def __init__(self, deadlines: Iterable[Deadline]):
+        """
+        Args:
+            deadlines (Iterable[Deadline]): The deadlines of the callers.
+        """
+        super().__init__()
+        self._deadlines = list(deadlines)
+
+    def remaining(self) -> Optional[float]:
+        if self._cancelled.is_set():
+            return 0.0
+        remaining = [deadline.remaining() for deadline in self._deadlines]
+        if not remaining or None in remaining:
+            return None
+        return max(remaining)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """
+    Returns:
+        Optional[Deadline]: The deadline of the current work, None outside `Deadline.run`.
+    """
+    return _current.get()
+
+
+def check_deadline() -> None:
+    """
+    Stop the current work if its deadline has passed or has been cancelled.
+
+    Raises:
+        DeadlineExceeded: If the current deadline has passed or has been cancelled.
+    """
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.check()
+
+
+def wait(future: Future) -> Any:
+    """
+    Wait for a future's result within the current deadline.
+
+    Args:
+        future (Future): The future to wait for.
+
+    Returns:
+        Any: The future's result.
+
+    Raises:
+        DeadlineExceeded: If the deadline passes or is cancelled first. The future is
+            cancelled, so work that has not started yet is skipped. Work that is
+            already running is waited for until it stops, at its own next deadline
+            check, so that the caller only returns once nothing runs on its behalf.
+    """
+    deadline = _current.get()
+    if deadline is None:
+        return future.result()
+    while True:
+        remaining = deadline.remaining()
+        timeout = (
+            _POLL_INTERVAL if remaining is None else min(remaining, _POLL_INTERVAL)
+        )
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            if deadline.expired():
+                if not future.cancel():
+                    try:
+                        future.result()
+                    except Exception:
+                        pass
+                raise DeadlineExceeded(
+                    "The deadline has passed or the work was cancelled."
+                )
@@ -0,0 +1,214 @@
+"""
+Always-on instrumentation of the scrapers, analyzers and service functions.
+
+Metrics live in the default Prometheus registry, so the API can expose them as they
+are, and `stage_summary` turns them into a table for the CLI. Recording a sample is
+a few dictionary lookups and a lock, cheap next to anything worth timing.
+
+Preforked API workers (see `api.server`) use Prometheus' multiprocess mode instead:
+every process writes its samples to files in PROMETHEUS_MULTIPROC_DIR, which must be
+set before this module is imported, and `exposed_registry` adds them up.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, TypeVar
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram
+
+T = TypeVar("T")
+
+STAGE_SECONDS = Histogram(
+    "review_analyzer_stage_seconds",
+    "Time spent in each processing stage",
+    ["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+)
+BATCH_SIZE = Histogram(
+    "review_analyzer_batch_size",
+    "Number of items per model forward pass",
+    ["model"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+TOKENS = Counter(
+    "review_analyzer_tokens_total", "Number of tokens run through a model", ["model"]
+)
+ITEMS = Counter(
+    "review_analyzer_items_total", "Number of items processed per stage", ["stage"]
+)
+QUEUE_DEPTH = Gauge(
+    "review_analyzer_queue_depth",
+    "Number of items waiting in a queue",
+    ["queue"],
+    multiprocess_mode="livesum",
+)
+CACHE_LOOKUPS = Counter(
+    "review_analyzer_cache_lookups_total", "Result cache lookups", ["result"]
+)
+REJECTIONS = Counter(
+    "review_analyzer_rejections_total",
+    "API requests turned away or abandoned by admission control",
+    ["endpoint", "reason"],
+)
+
+
+@contextmanager
+def timed(stage: str, items: Optional[int] = None) -> Iterator[None]:
+    """
+    Record the time spent in a stage.
+
+    Args:
+        stage (str): Name of the stage, e.g. "sentiment.forward".
+        items (Optional[int]): Number of items the stage processes, if meaningful.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+        if items is not None:
+            ITEMS.labels(stage).inc(items)
+
+
+def timed_iter(stage: str, iterable: Iterable[T]) -> Iterator[T]:
+    """
+    Record the time spent producing every item of an iterable, e.g. reading a CSV in chunks.
+
+    Args:
+        stage (str): Name of the stage.
+        iterable (Iterable[T]): The iterable to time.
+
+    Yields:
+        T: The items of `iterable`.
+    """
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+        yield item
+
+
+def count_items(stage: str, items: int) -> None:
+    """
+    Record items processed by a stage whose count is only known after it is timed.
+
+    Args:
+        stage (str): Name of the stage.
+        items (int): Number of items.
+    """
+    ITEMS.labels(stage).inc(items)
+
+
+def observe_batch(model: str, size: int, tokens: Optional[int] = None) -> None:
+    """
+    Record a model forward pass.
+
+    Args:
+        model (str): Name of the model.
+        size (int): Number of items in the batch.
+        tokens (Optional[int]): Number of tokens in the batch, if known.
+    """
+    BATCH_SIZE.labels(model).observe(size)
+    if tokens is not None:
+        TOKENS.labels(model).inc(tokens)
+
+
+def multiprocess_enabled() -> bool:
+    """
+    Returns:
+        bool: Whether metrics are shared between processes through PROMETHEUS_MULTIPROC_DIR.
+    """
+    return "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+
+def exposed_registry() -> CollectorRegistry:
+    """
+    Returns:
+        CollectorRegistry: The registry to expose, which in multiprocess mode adds up
+            the metrics of all processes, and is otherwise the default registry.
+    """
+    if not multiprocess_enabled():
+        return REGISTRY
+    from prometheus_client.multiprocess import MultiProcessCollector
+
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry)
+    return registry
+
+
+def cache_lookups() -> Dict[str, int]:
+    """
+    Returns:
+        Dict[str, int]: Number of result cache "hits" and "misses" recorded by every
+            process that shares the metrics (see `exposed_registry`).
+    """
+    counts = {"hits": 0, "misses": 0}
+    for family in exposed_registry().collect():
+        if family.name != "review_analyzer_cache_lookups":
+            continue
+        for sample in family.samples:
+            if sample.name.endswith("_total"):
+                key = "hits" if sample.labels["result"] == "hit" else "misses"
+                counts[key] += int(sample.value)
+    return counts
+
+
+def _samples(metric) -> Dict[tuple, float]:
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in metric.collect()
+        for sample in family.samples
+    }
+
+
+def stage_summary() -> List[dict]:
+    """
+    Summarize the stage timings recorded so far in this process.
+
+    Returns:
+        List[dict]: One dictionary per stage with its "stage" name, number of "calls",
+            "total_seconds", "mean_seconds" and "items" (0 if not counted).
+    """
+    timings = _samples(STAGE_SECONDS)
+    items = _samples(ITEMS)
+    summary = []
+    for (name, labels), count in sorted(timings.items()):
+        if not name.endswith("_count") or not count:
+            continue
+        total = timings[(name[: -len("_count")] + "_sum", labels)]
+        stage = dict(labels)["stage"]
+        summary.append(
+            {
+                "stage": stage,
+                "calls": int(count),
+                "total_seconds": total,
+                "mean_seconds": total / count,
+                "items": int(items.get(("review_analyzer_items_total", labels), 0)),
+            }
+        )
+    return summary
+
+
+def tokens_per_second() -> Dict[str, float]:
+    """
+    Returns:
+        Dict[str, float]: Tokens per second of "<model>.forward" time for every model
+            that reports tokens.
+    """
+    tokens = _samples(TOKENS)
+    timings = _samples(STAGE_SECONDS)
+    rates = {}
+    for (name, labels), count in tokens.items():
+        if name != "review_analyzer_tokens_total":
+            continue
+        model = dict(labels)["model"]
+        seconds = timings.get(
+            ("review_analyzer_stage_seconds_sum", (("stage", f"{model}.forward"),)), 0
+        )
+        if seconds:
+            rates[model] = count / seconds
+    return rates
@@ -1,5 +1,6 @@
 import re
-import pandas as pd
+import unicodedata
+from typing import Dict, List
 
 
 def extract_walmart_product_id(url: str) -> str:
@@ -18,6 +19,28 @@ def extract_walmart_product_id(url: str) -> str:
     return product_id
 
 
+def parse_synonyms(values: List[str]) -> Dict[str, List[str]]:
+    """
+    Parse aspect synonyms given as "aspect=term" strings.
+
+    Args:
+        values (List[str]): Strings of the form "aspect=term". An aspect may appear several times.
+
+    Returns:
+        Dict[str, List[str]]: A dictionary mapping every aspect to its synonyms.
+
+    Raises:
+        ValueError: If a value is not of the form "aspect=term".
+    """
+    synonyms = {}
+    for value in values:
+        aspect, separator, term = value.partition("=")
+        if not separator or not aspect.strip() or not term.strip():
+            raise ValueError(f"Synonym '{value}' must be of the form 'aspect=term'.")
+        synonyms.setdefault(aspect.strip(), []).append(term.strip())
+    return synonyms
+
+
 def get_analysis_stats(
     positive_count: int,
     negative_count: int,
@@ -38,6 +61,8 @@ def get_analysis_stats(
     Returns:
         str: Formatted string with the analysis results.
     """
+    import pandas as pd
+
     positive = "[bold green]positive[/bold green]"
     neutral = "[bold grey78]neutral[/bold grey78]"
     negative = "[bold red]negative[/bold red]"
@@ -66,3 +91,79 @@ def get_analysis_stats(
     )
 
     return stats
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize a review so that trivially different copies are treated as the same text.
+
+    Args:
+        text (str): The text to normalize.
+
+    Returns:
+        str: The text in NFKC form with runs of whitespace collapsed.
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def get_cache_stats(hits: int, misses: int) -> str:
+    """
+    Format result cache counters for display.
+
+    Args:
+        hits (int): Number of results served from the cache.
+        misses (int): Number of results that had to be computed.
+
+    Returns:
+        str: Formatted string with the cache counters.
+    """
+    total = hits + misses
+    hit_rate = f" ({hits / total:.0%} hit rate)" if total else ""
+    return (
+        f"[bold blue]Cache:[/bold blue] [bold green]{hits}[/bold green] hits, "
+        f"[bold red]{misses}[/bold red] misses{hit_rate}"
+    )
+
+
+def get_dedup_stats(reviews: int, collapsed: int) -> str:
+    """
+    Format deduplication counters for display.
+
+    Args:
+        reviews (int): Number of reviews checked for duplicates.
+        collapsed (int): Number of reviews that reused the result of a duplicate.
+
+    Returns:
+        str: Formatted string with the deduplication counters.
+    """
+    return (
+        f"[bold blue]Duplicates:[/bold blue] {collapsed} of {reviews} reviews "
+        "collapsed into an identical or near-identical review"
+    )
+
+
+def get_stage_stats(stages: List[dict], tokens_per_second: Dict[str, float]) -> str:
+    """
+    Format stage timings for display.
+
+    Args:
+        stages (List[dict]): Stage timings as returned by `utils.metrics.stage_summary`.
+        tokens_per_second (Dict[str, float]): Model throughputs as returned by `utils.metrics.tokens_per_second`.
+
+    Returns:
+        str: Formatted string with one line per stage and per model.
+    """
+    lines = ["[bold blue]Stage timings:[/bold blue]"]
+    for stage in stages:
+        throughput = (
+            f", {stage['items']} items ({stage['items'] / stage['total_seconds']:.1f}/s)"
+            if stage["items"] and stage["total_seconds"]
+            else ""
+        )
+        lines.append(
+            f"  {stage['stage']}: {stage['total_seconds']:.3f}s in {stage['calls']} calls "
+            f"(mean {stage['mean_seconds'] * 1000:.1f}ms){throughput}"
+        )
+    for model, rate in tokens_per_second.items():
+        lines.append(f"[bold blue]{model} throughput:[/bold blue] {rate:.0f} tokens/s")
+    return "\n".join(lines)